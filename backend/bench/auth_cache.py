@@ -0,0 +1,106 @@
+# bench/auth_cache.py
+"""
+Authenticated requests with and without the user cache in auth.py.
+
+In process: get_current_user calls per second for one token. Over HTTP:
+requests/sec on /users/me/ (authentication only) and /pc_playlist_files
+(authentication plus the endpoint's own query) from one uvicorn worker,
+and the server's CPU time per request, which the client sharing the
+machine does not skew.
+"without cache" keeps nothing in the cache, so every request decodes the
+token and loads the user row in a new session, as before the cache.
+
+    python -m bench.auth_cache [requests] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+from bench.common import BACKEND_DIR, create_user, describe, serve, use_temp_environment
+
+CALLS = 5000
+
+
+class NoCache(dict):
+    """Stands in for the TTLCache: every lookup misses."""
+
+    def __setitem__(self, key, value):
+        pass
+
+
+def app_factory():
+    import main
+    from my_package import auth
+    if os.environ.get("BENCH_USER_CACHE") == "off":
+        auth._user_cache = NoCache()
+
+    async def cpu_time():
+        return time.process_time()
+
+    main.app.add_api_route("/bench/cpu", cpu_time)
+    # Ahead of main.py's catch-all route
+    main.app.router.routes.insert(0, main.app.router.routes.pop())
+    return main.app
+
+
+def in_process(token):
+    from my_package import auth
+    cache = auth._user_cache
+    print(f"get_current_user, {CALLS} calls in process:")
+    for label, replacement in (("without cache", NoCache()), ("with cache   ", cache)):
+        auth._user_cache = replacement
+
+        async def calls():
+            started = time.perf_counter()
+            for _ in range(CALLS):
+                await auth.get_current_user(token)
+            return time.perf_counter() - started
+
+        seconds = asyncio.run(calls())
+        print(f"  {label}: {CALLS / seconds:8.0f} calls/s ({seconds / CALLS * 1e6:6.1f} us per call)")
+    auth._user_cache = cache
+
+
+async def measure(base_url, path, token, requests, concurrency):
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, limits=httpx.Limits(max_connections=concurrency)) as client:
+        (await client.get(path, headers=headers)).raise_for_status()
+
+        async def one():
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        cpu_before = (await client.get("/bench/cpu")).json()
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        total = time.perf_counter() - started
+        cpu = (await client.get("/bench/cpu")).json() - cpu_before
+        return latencies, total, cpu / requests
+
+
+async def over_http(env, token, requests, concurrency):
+    print(f"HTTP, {requests} requests per endpoint, {concurrency} concurrent:")
+    for label, setting in (("without cache", "off"), ("with cache   ", "on")):
+        with serve("bench.auth_cache:app_factory", dict(env, BENCH_USER_CACHE=setting)) as base_url:
+            for path in ("/users/me/", "/pc_playlist_files/bench"):
+                latencies, total, cpu = await measure(base_url, path, token, requests, concurrency)
+                print(f"  {label} {path:24} {requests / total:7.1f} req/s  server CPU {cpu * 1000:5.2f} ms/request  "
+                      f"{describe(latencies)}")
+
+
+if __name__ == "__main__":
+    env = use_temp_environment()
+    sys.path.insert(0, BACKEND_DIR)
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    token = create_user()
+    in_process(token)
+    asyncio.run(over_http(env, token, requests, concurrency))
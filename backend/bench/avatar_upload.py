@@ -0,0 +1,129 @@
+# bench/avatar_upload.py
+"""
+Event-loop latency while a 20 MB photo is uploaded as an avatar. A ping
+request goes out every PING_INTERVAL, one at a time, before and during
+the upload; its latency is how long the server's event loop was busy.
+
+"before" is the original handler: File(...) upload read whole with
+`await file.read()`, then decoded and re-encoded with Pillow on the event
+loop. "after" is the app's /upload_user_picture (streamed, size-capped,
+decoded at reduced scale in the avatar worker pool).
+
+    python -m bench.avatar_upload [megabytes]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.common import BACKEND_DIR, create_user, describe, serve, use_temp_environment
+
+PING_INTERVAL = 0.02
+
+
+def build_photo(megabytes):
+    """A noisy JPEG of about `megabytes`, the size of a phone photo at high quality."""
+    path = os.path.join(tempfile.gettempdir(), f"pi-mpd-bench-photo-{megabytes}.jpg")
+    if not os.path.exists(path):
+        from PIL import Image
+        target = megabytes * 1024 * 1024
+        # Noise barely compresses; one encode tells how many bytes a pixel
+        # takes, the second hits the size
+        width = 2000
+        for _ in range(2):
+            height = width * 3 // 4
+            Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).save(path + ".tmp.jpg", quality=95)
+            width = int(width * (target / os.path.getsize(path + ".tmp.jpg")) ** 0.5)
+        os.replace(path + ".tmp.jpg", path)
+    return path
+
+
+def add_ping(app):
+    async def ping():
+        return {"ok": True}
+
+    app.add_api_route("/bench/ping", ping)
+    # Ahead of main.py's catch-all route
+    app.router.routes.insert(0, app.router.routes.pop())
+    return app
+
+
+def before_app():
+    import io
+    from fastapi import FastAPI, File, UploadFile
+    from PIL import Image
+    app = FastAPI()
+
+    @app.post("/upload_user_picture")
+    async def upload_user_picture(file: UploadFile = File(...)):
+        save_path = os.path.join(os.environ["AVATAR_DIR"], "bench.jpg")
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        image_data = await file.read()
+        with Image.open(io.BytesIO(image_data)) as img:
+            if img.mode in ('RGBA', 'P'):
+                img = img.convert('RGB')
+            img.save(save_path, 'jpeg')
+        return {"message": "Picture uploaded successfully"}
+
+    return add_ping(app)
+
+
+def after_app():
+    import main
+    return add_ping(main.app)
+
+
+async def pings(client, latencies, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        (await client.get("/bench/ping")).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(max(0.0, PING_INTERVAL - (time.perf_counter() - started)))
+
+
+async def measure(base_url, photo, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=300) as uploader:
+        idle, busy = [], []
+        stop = asyncio.Event()
+        pinging = asyncio.create_task(pings(client, idle, stop))
+        await asyncio.sleep(1)
+        stop.set()
+        await pinging
+
+        stop = asyncio.Event()
+        pinging = asyncio.create_task(pings(client, busy, stop))
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        with open(photo, "rb") as f:
+            response = await uploader.post("/upload_user_picture", headers=headers,
+                                           files={"file": ("photo.jpg", f, "image/jpeg")})
+        upload_seconds = time.perf_counter() - started
+        stop.set()
+        await pinging
+        response.raise_for_status()
+        return idle, busy, upload_seconds
+
+
+async def run(env, photo, token):
+    print(f"Upload of {os.path.getsize(photo) / 1e6:.1f} MB, a ping every {PING_INTERVAL * 1000:.0f} ms")
+    for label, factory in (("before (read whole, Pillow on the event loop)", "bench.avatar_upload:before_app"),
+                           ("after  (streamed, decoded in the worker pool)", "bench.avatar_upload:after_app")):
+        with serve(factory, env) as base_url:
+            idle, busy, upload_seconds = await measure(base_url, photo, token)
+        print(f"{label}: upload took {upload_seconds:.2f} s")
+        print(f"  ping, idle:             {describe(idle)}")
+        print(f"  ping, during upload:    {describe(busy)}")
+
+
+if __name__ == "__main__":
+    env = use_temp_environment()
+    sys.path.insert(0, BACKEND_DIR)
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    photo = build_photo(megabytes)
+    token = create_user()
+    asyncio.run(run(env, photo, token))
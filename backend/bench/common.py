@@ -0,0 +1,112 @@
+# bench/common.py
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def describe(values):
+    """'p50 12.3 ms  p99 45.6 ms  max 50.1 ms' for a list of seconds."""
+    return (f"p50 {percentile(values, 0.50) * 1000:7.1f} ms  p99 {percentile(values, 0.99) * 1000:7.1f} ms  "
+            f"max {max(values) * 1000:7.1f} ms")
+
+
+def temp_environment():
+    """Environment for app processes, with the database and caches in a temporary folder."""
+    temp_dir = tempfile.mkdtemp(prefix="pi-mpd-bench-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{temp_dir}/bench.db", PYTHONWARNINGS="ignore")
+    for name in ("TRANSCODE_CACHE_DIR", "ART_CACHE_DIR", "IMAGE_CACHE_DIR", "AVATAR_DIR"):
+        env[name] = os.path.join(temp_dir, name.lower())
+    return env
+
+
+def use_temp_environment():
+    """Points this process at a temporary database and caches, before my_package.database is imported."""
+    env = temp_environment()
+    os.environ.update(env)
+    return env
+
+
+def create_user(username="bench", password="bench-password"):
+    """Creates the tables and a user in this process's database. Returns a bearer token for it."""
+    sys.path.insert(0, BACKEND_DIR)
+    from my_package.auth import create_access_token, get_password_hash
+    from my_package.database import Base, SessionLocal, engine
+    from my_package.models import User
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(username=username, hashed_password=get_password_hash(password), settings=None))
+        db.commit()
+    return create_access_token({"sub": username})
+
+
+def import_app():
+    """
+    Imports main.py in this process, with the database and caches in a
+    temporary folder. The lifespan does not run, so MPD, the library scan
+    and the background tasks stay off unless the caller starts them.
+    """
+    for name, value in temp_environment().items():
+        os.environ.setdefault(name, value)
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    return main
+
+
+@contextmanager
+def fake_mpd(delay=0.0, queue_length=0, version="0.23.5"):
+    """A tests.fake_mpd server in its own process, like a real MPD. Yields its port."""
+    process = subprocess.Popen([sys.executable, "-m", "tests.fake_mpd", str(delay), str(queue_length), version],
+                               cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+    try:
+        yield int(process.stdout.readline())
+    finally:
+        process.kill()
+        process.wait()
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@contextmanager
+def serve(app_factory, env=None, workers=1, stderr=None):
+    """
+    Runs `module:function` (an app factory) with uvicorn in a separate
+    process, so the server's event loop and the client measuring it do not
+    share a GIL. Yields the base URL. `stderr` (a file) collects the
+    server's log and tracebacks.
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_factory, "--factory", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env or temp_environment(), stdout=subprocess.DEVNULL, stderr=stderr,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"uvicorn {app_factory} did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
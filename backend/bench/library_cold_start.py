@@ -0,0 +1,141 @@
+# bench/library_cold_start.py
+"""
+Cold start with a synthetic music tree (100k files by default).
+
+Library level: walking the tree, writing the snapshot, loading it, and the
+background reconcile against the disk. App level: seconds from starting
+uvicorn until an authenticated /pc_browse/ answers: with an empty music
+folder (imports and the rest of startup), with an empty database (full
+walk during startup) and with the snapshot the previous start wrote.
+
+The tree is created once under /tmp and reused. Its inodes are in the page
+cache, so the walk here is a lower bound for a USB disk after a reboot.
+
+    python -m bench.library_cold_start [files]
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.common import BACKEND_DIR, create_user, use_temp_environment
+
+TRACKS_PER_ALBUM = 10
+ALBUMS_PER_ARTIST = 100
+
+
+def build_tree(files):
+    root = os.path.join(tempfile.gettempdir(), f"pi-mpd-bench-library-{files}")
+    marker = os.path.join(root, ".complete")
+    if os.path.exists(marker):
+        return root
+    started = time.perf_counter()
+    for i in range(files):
+        album = os.path.join(root, f"Artist {i // (TRACKS_PER_ALBUM * ALBUMS_PER_ARTIST):04d}",
+                             f"Album {i // TRACKS_PER_ALBUM % ALBUMS_PER_ARTIST:03d}")
+        if i % TRACKS_PER_ALBUM == 0:
+            os.makedirs(album, exist_ok=True)
+        open(os.path.join(album, f"{i % TRACKS_PER_ALBUM + 1:02d} Track.flac"), "wb").close()
+    open(marker, "wb").close()
+    print(f"Created {files} files in {root} ({time.perf_counter() - started:.1f} s)")
+    return root
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    print(f"  {label:38} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    return result
+
+
+def library_level(root):
+    from my_package.database import Base, SessionLocal, engine
+    from my_package.library_index import LibraryIndex, LibrarySnapshot
+    Base.metadata.create_all(bind=engine)
+    print("Library index:")
+    timed("walk (no snapshot)", LibraryIndex(root).scan)
+    timed("walk + write snapshot", LibraryIndex(root, snapshot=LibrarySnapshot(SessionLocal)).scan)
+    index = LibraryIndex(root, snapshot=LibrarySnapshot(SessionLocal))
+    timed("load snapshot", index.load)
+    timed("reconcile, nothing changed", index.refresh)
+    os.utime(os.path.join(root, "Artist 0000", "Album 000"))
+    timed("reconcile, one folder changed", index.refresh)
+    print(f"  {len(index.files_under(''))} files in {len(index._dirs)} folders")
+    # The app-level runs start from an empty database
+    Base.metadata.drop_all(bind=engine)
+
+
+def app_factory():
+    import main
+    from my_package.library_index import LibraryIndex, LibrarySnapshot
+    music_dir = os.environ["BENCH_MUSIC_DIR"]
+    main.music_Basefolder = music_dir + "/"
+    main.library = LibraryIndex(music_dir, snapshot=LibrarySnapshot(main.SessionLocal))
+    # Reading tags of empty files only measures mutagen errors
+    main.tag_index.start = lambda: None
+    return main.app
+
+
+async def time_to_first_response(env, token):
+    port = 18000 + os.getpid() % 1000
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.library_cold_start:app_factory", "--factory",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            while True:
+                try:
+                    response = await client.get("/pc_browse/", headers={"Authorization": f"Bearer {token}"})
+                    if response.status_code == 200:
+                        return time.perf_counter() - started, len(response.json())
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                await asyncio.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def copy_database(env, suffix):
+    """The same database (with the bench user) in another file, so one run's snapshot does not leak into another."""
+    source = env["DATABASE_URL"].removeprefix("sqlite:///")
+    target = f"{source}.{suffix}"
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+    return dict(env, DATABASE_URL=f"sqlite:///{target}")
+
+
+async def app_level(env, root, token):
+    print("App, process start to first /pc_browse/ response:")
+    runs = (
+        ("empty music folder (imports, startup)",
+         dict(copy_database(env, "empty"), BENCH_MUSIC_DIR=tempfile.mkdtemp(prefix="pi-mpd-bench-empty-"))),
+        ("empty database (walk at startup)", dict(env, BENCH_MUSIC_DIR=root)),
+        ("snapshot from the previous start", dict(env, BENCH_MUSIC_DIR=root)),
+    )
+    for label, run_env in runs:
+        seconds, folders = await time_to_first_response(run_env, token)
+        print(f"  {label:38} {seconds * 1000:9.1f} ms ({folders} folders listed)")
+
+
+if __name__ == "__main__":
+    env = use_temp_environment()
+    sys.path.insert(0, BACKEND_DIR)
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    root = build_tree(files)
+    library_level(root)
+    token = create_user()
+    asyncio.run(app_level(env, root, token))
@@ -0,0 +1,128 @@
+# bench/media_seek.py
+"""
+Seek-heavy playback of a 100 MB FLAC, the way a browser <audio> element
+fetches it: an open-ended Range request for the start, then one per seek,
+each abandoned after PLAY_BUFFER bytes when the listener seeks again, and
+finally a repeat play that revalidates with If-None-Match.
+
+Compares the /music route with the StaticFiles mount it replaced, and
+with a server that ignores Range (each seek downloads the file up to the
+new position). Reports bytes received by the client, bytes the server
+committed to in Content-Length, and time-to-first-audio (request sent
+until the first byte at the seek position arrives).
+
+    python -m bench.media_seek [seeks] [megabytes]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.common import describe, serve, temp_environment
+
+# What a player buffers after a seek before the listener moves on
+PLAY_BUFFER = 512 * 1024
+FILE_NAME = "Album/Long Track.flac"
+
+
+def build_file(megabytes):
+    root = os.path.join(tempfile.gettempdir(), f"pi-mpd-bench-media-{megabytes}")
+    path = os.path.join(root, FILE_NAME)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(b"fLaC")
+            for _ in range(megabytes):
+                f.write(os.urandom(1024 * 1024))
+        os.replace(path + ".tmp", path)
+    return root
+
+
+def app_factory():
+    import main
+    from fastapi.staticfiles import StaticFiles
+    from starlette.responses import FileResponse
+    music_dir = os.environ["BENCH_MUSIC_DIR"]
+    main.music_Basefolder = music_dir + "/"
+    # Reading tags of random bytes only measures mutagen errors
+    main.tag_index.start = lambda: None
+    main.app.mount("/static_music", StaticFiles(directory=music_dir), name="bench_static_music")
+
+    async def no_ranges(file_path: str):
+        # A plain 200 for every request, whatever the Range header says
+        return FileResponse(os.path.join(music_dir, file_path), headers={"accept-ranges": "none"})
+
+    main.app.add_api_route("/no_ranges/{file_path:path}", no_ranges)
+    # Ahead of main.py's catch-all route
+    routes = main.app.router.routes
+    routes[0:0] = [routes.pop(), routes.pop()]
+    return main.app
+
+
+async def fetch(client, url, headers, skip=0):
+    """
+    Reads the body until PLAY_BUFFER bytes past `skip`, then drops the
+    connection like a seeking player. Returns the response, seconds until
+    the first byte past `skip` (the first audio heard), bytes received and
+    the Content-Length the server committed to.
+    """
+    started = time.perf_counter()
+    first_audio, received = None, 0
+    async with client.stream("GET", url, headers=headers) as response:
+        async for chunk in response.aiter_raw():
+            received += len(chunk)
+            if first_audio is None and received > skip:
+                first_audio = time.perf_counter() - started
+            if received >= skip + PLAY_BUFFER:
+                break
+        return response, first_audio, received, int(response.headers.get("content-length", 0))
+
+
+async def playback(base_url, path, size, seeks, supports_ranges=True):
+    offsets = random.Random(1).sample(range(0, size - PLAY_BUFFER, 4096), seeks)
+    received = committed = 0
+    first_audio = []
+    # A new connection per request, as a player abandoning a request closes its socket
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=httpx.Limits(max_keepalive_connections=0)) as client:
+        # The first request after startup pays for imports and route setup
+        await client.head(path)
+        for offset in [0] + offsets:
+            if supports_ranges:
+                response, heard, got, length = await fetch(client, path, {"Range": f"bytes={offset}-"})
+            else:
+                # Everything before the seek position has to come down too
+                response, heard, got, length = await fetch(client, path, {}, skip=offset)
+            first_audio.append(heard)
+            received += got
+            committed += length
+        etag = response.headers.get("etag")
+        replay = await client.get(path, headers={"If-None-Match": etag} if etag else {})
+    return received, committed, first_audio, replay
+
+
+async def run(seeks, megabytes):
+    root = build_file(megabytes)
+    size = os.path.getsize(os.path.join(root, FILE_NAME))
+    print(f"{size / 1e6:.0f} MB FLAC, play + {seeks} seeks, {PLAY_BUFFER // 1024} KB buffered per position")
+    env = dict(temp_environment(), BENCH_MUSIC_DIR=root)
+    with serve("bench.media_seek:app_factory", env) as base_url:
+        for label, prefix, ranges in (("/music route", "/music", True),
+                                      ("StaticFiles mount (before)", "/static_music", True),
+                                      ("server without Range", "/no_ranges", False)):
+            received, committed, first_audio, replay = await playback(
+                base_url, f"{prefix}/{FILE_NAME}", size, seeks, ranges)
+            print(f"{label}:")
+            print(f"  received {received / 1e6:8.1f} MB, Content-Length total {committed / 1e6:8.1f} MB")
+            print(f"  time to first audio: play {first_audio[0] * 1000:6.1f} ms, seeks {describe(first_audio[1:])}")
+            print(f"  repeat play: {replay.status_code}, {len(replay.content) / 1e6:.1f} MB, "
+                  f"cache-control {replay.headers.get('cache-control')!r}")
+
+
+if __name__ == "__main__":
+    seeks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    megabytes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    asyncio.run(run(seeks, megabytes))
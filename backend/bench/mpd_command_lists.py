@@ -0,0 +1,46 @@
+# bench/mpd_command_lists.py
+"""
+Saving a large selection to a stored playlist: one playlistadd round trip
+per song (the old loop) against MPDClientController's command lists.
+MPD is a tests.fake_mpd process that takes MPD_DELAY per round trip.
+
+    python -m bench.mpd_command_lists [songs]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from bench.common import fake_mpd
+from my_package.mpd_controller import MPDClientController
+
+MPD_DELAY = 0.002
+
+
+def per_song(player, name, songs):
+    for uri in songs:
+        player._execute_safe(player.client.playlistadd, name, uri)
+
+
+def batched(player, name, songs):
+    player._execute_command_list("playlistadd", [(name, uri) for uri in songs])
+
+
+def run(count):
+    songs = [f"music/album {i // 12:04d}/{i % 12:02d} track.flac" for i in range(count)]
+    print(f"{count} songs, MPD {MPD_DELAY * 1000:.0f} ms per round trip")
+    with fake_mpd(MPD_DELAY) as port:
+        player = MPDClientController(port=port)
+        with contextlib.redirect_stdout(io.StringIO()):
+            player.connect()
+        for label, save in (("per song", per_song), ("batched ", batched)):
+            started = time.perf_counter()
+            save(player, label.strip(), songs)
+            elapsed = time.perf_counter() - started
+            print(f"{label}: {elapsed:7.3f} s  {count / elapsed:8.0f} songs/s")
+        with contextlib.redirect_stdout(io.StringIO()):
+            player.disconnect()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
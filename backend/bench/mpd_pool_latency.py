@@ -0,0 +1,87 @@
+# bench/mpd_pool_latency.py
+"""
+Latency of /pi_mpd_status and /pi_queue_songs under concurrent load. MPD
+is a tests.fake_mpd process that takes MPD_DELAY per round trip.
+
+"before" is the pre-pool handler shape: async endpoints calling one shared
+MPDClientController directly, so every MPD round trip blocks the event
+loop. "after" is the app's own endpoints on MPDConnectionPool.
+
+    python -m bench.mpd_pool_latency [requests] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+from bench.common import describe, fake_mpd, serve, temp_environment
+
+MPD_DELAY = 0.01
+QUEUE_LENGTH = 100
+
+
+def before_app():
+    from fastapi import FastAPI
+    from my_package.mpd_controller import MPDClientController
+    player = MPDClientController(port=int(os.environ["BENCH_MPD_PORT"]))
+    app = FastAPI()
+
+    @app.get("/pi_mpd_status")
+    async def status():
+        return player.get_status()
+
+    @app.get("/pi_queue_songs")
+    async def queue():
+        return player.queue_get_songs()
+
+    return app
+
+
+def after_app():
+    import main
+    for controller in main.mpd_pool.controllers:
+        # Connected by the first command
+        controller.port = int(os.environ["BENCH_MPD_PORT"])
+    return main.app
+
+
+async def measure(base_url, requests, concurrency):
+    latencies = {"/pi_mpd_status": [], "/pi_queue_songs": []}
+    gate = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await client.get("/pi_mpd_status") # connect before timing
+
+        async def one(i):
+            async with gate:
+                path = "/pi_mpd_status" if i % 2 else "/pi_queue_songs"
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies[path].append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return latencies, time.perf_counter() - started
+
+
+async def run(requests, concurrency):
+    print(f"{requests} requests, {concurrency} concurrent, MPD {MPD_DELAY * 1000:.0f} ms per round trip, "
+          f"queue of {QUEUE_LENGTH}")
+    with fake_mpd(MPD_DELAY, QUEUE_LENGTH) as port:
+        env = dict(temp_environment(), BENCH_MPD_PORT=str(port))
+        for label, factory in (("before (shared controller)", "bench.mpd_pool_latency:before_app"),
+                               ("after  (connection pool) ", "bench.mpd_pool_latency:after_app")):
+            with serve(factory, env) as base_url:
+                latencies, total = await measure(base_url, requests, concurrency)
+            print(f"{label}: {requests / total:6.1f} req/s")
+            for path, values in latencies.items():
+                print(f"  {path:16} {describe(values)}")
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(run(requests, concurrency))
@@ -0,0 +1,107 @@
+# bench/sqlite_contention.py
+"""
+Concurrent reads of /pc_get_playlist_List and writes to
+/pc_playlist_saveto_list against two uvicorn workers sharing one SQLite
+file, counting the requests that failed with "database is locked".
+
+"before" is SQLite's defaults (rollback journal, synchronous=FULL, no
+busy timeout); "after" is the app's own pragmas (WAL, synchronous=NORMAL,
+busy_timeout). Each run has its own database.
+
+    python -m bench.sqlite_contention [requests] [concurrency]
+"""
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.common import BACKEND_DIR, describe, serve, temp_environment
+
+WORKERS = 2
+PLAYLIST_SONGS = 200
+PLAYLISTS = 4
+
+CONFIGS = (
+    ("before (rollback journal, no busy timeout)",
+     {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_BUSY_TIMEOUT_MS": "0"}),
+    ("after  (WAL, synchronous=NORMAL, busy timeout)", {}),
+)
+
+
+def create_schema(env):
+    # Before the workers start: two workers creating the tables at once is
+    # itself enough to hit "database is locked" without a busy timeout
+    subprocess.run([sys.executable, "-c", "import main; main.Base.metadata.create_all(bind=main.engine)"],
+                   cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, check=True)
+
+
+def app_factory():
+    import main
+    # No MPD or music library here, only the user database
+    main.music_Basefolder = tempfile.mkdtemp(prefix="pi-mpd-bench-empty-") + "/"
+    return main.app
+
+
+async def login(client):
+    account = {"username": "bench", "password": "bench-password"}
+    await client.post("/register", json=dict(account, code="Happy"))
+    response = await client.post("/token", data=account)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def measure(base_url, requests, concurrency):
+    latencies = {"read": [], "write": []}
+    failures = {"read": 0, "write": 0}
+    gate = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        headers = await login(client)
+        songs = [f"Artist/Album/{i:03d} Track.flac" for i in range(PLAYLIST_SONGS)]
+
+        async def one(i):
+            kind = "write" if i % 2 else "read"
+            async with gate:
+                started = time.perf_counter()
+                try:
+                    if kind == "write":
+                        response = await client.post(f"/pc_playlist_saveto_list/bench-{i % PLAYLISTS}",
+                                                     json={"songs": songs[i % 7:]}, headers=headers)
+                    else:
+                        response = await client.get("/pc_get_playlist_List", headers=headers)
+                    failed = response.status_code != 200
+                except httpx.TransportError:
+                    # uvicorn closes the connection after an unhandled exception
+                    failed = True
+                latencies[kind].append(time.perf_counter() - started)
+                failures[kind] += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return latencies, failures, time.perf_counter() - started
+
+
+async def run(requests, concurrency):
+    print(f"{requests} requests (half reads, half writes of {PLAYLIST_SONGS} songs), {concurrency} concurrent, "
+          f"{WORKERS} workers")
+    for label, overrides in CONFIGS:
+        env = dict(temp_environment(), **overrides)
+        create_schema(env)
+        with tempfile.TemporaryFile("w+") as log:
+            with serve("bench.sqlite_contention:app_factory", env, workers=WORKERS, stderr=log) as base_url:
+                latencies, failures, total = await measure(base_url, requests, concurrency)
+            log.seek(0)
+            # One per failed request (SQLAlchemy repeats the message in its own line)
+            locked = log.read().count("sqlite3.OperationalError: database is locked")
+        print(f"{label}: {requests / total:6.1f} req/s, {locked} 'database is locked' errors")
+        for kind, values in latencies.items():
+            print(f"  {kind:5}  {describe(values)}  {failures[kind]} failed")
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    asyncio.run(run(requests, concurrency))
@@ -1,37 +1,58 @@
 # main.py
 # This script creates a FastAPI application to expose API endpoints
 # for controlling the Music Player Daemon (MPD).
-import os, io, json, uvicorn, subprocess, asyncio
+import os, json, uvicorn, subprocess, asyncio
 from functools import lru_cache
-from cachetools import TTLCache
 
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Depends, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, Depends, HTTPException, status
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from pathlib import Path
 from contextlib import asynccontextmanager
-from PIL import Image
+from PIL import UnidentifiedImageError
 from pydantic import BaseModel
 
-from my_package.mpd_controller import MPDClientController
+from my_package.mpd_pool import MPDConnectionPool
+from my_package.mpd_events import MPDEventBroadcaster
+from my_package.queue_cache import QueueCache
+from my_package.stored_playlists import StoredPlaylistPages
+from my_package.library_index import LibraryIndex, LibrarySnapshot
+from my_package.tag_index import TagIndex
+from my_package.pagination import list_response, page_response, cursor_offset, encode_cursor
+from my_package.media_files import media_response, resolve_media_path, IMMUTABLE_CACHE_CONTROL
+from my_package.transcoder import Transcoder, TranscoderBusy, TranscodeResponse, PROFILES, parse_bitrate
+from my_package.lyrics_service import LyricsService, LYRICS_PREFETCH_MAX
+from my_package.art_service import ArtService, THUMBNAIL_SIZES
+from my_package.image_pipeline import ResponsiveImageSet
+from my_package.image_utils import ImageTooLarge
+from my_package.avatar_service import read_upload, save_avatar, UploadTooLarge
+from my_package.youtube_source import YouTubeSource, ResolveError, is_video_id
+from starlette.formparsers import MultiPartException
 from my_package.database import get_db, SessionLocal, Base, engine
-from my_package.models import User, UserPlaylist
+from my_package.models import User, UserPlaylist, Schedule
+import my_package.playlist_store as playlist_store
+import my_package.podcast_store as podcast_store
 from my_package.schemas import (
     UserCreate, UserResponse, Token, UserPlaylistCreate, UserPlaylistResponse,
-    PlaylistPayload, PlaylistsListResponse, UserPasswordChange, Settings, SongRequest
+    PlaylistPayload, PlaylistsListResponse, UserPasswordChange, Settings, SongRequest,
+    PlaylistItemPayload, PlaylistMovePayload, ScheduleBase, ScheduleCreate, ScheduleResponse
 )
 from my_package.auth import (
-get_password_hash, verify_password, create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
+get_password_hash_async, verify_password_async, verify_and_update_password, create_access_token,
+    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user, invalidate_cached_user
 )
 import my_package.cron_service as cron_service
-from my_package.podcast_service import parse_rss_feed
+from my_package.podcast_service import PodcastFeedService
+from my_package.podcast_sync import download_podcasts
+from my_package.job_manager import JobManager
+from my_package.scheduler import PlaybackScheduler, DEFAULT_PLAYLIST, format_days
+from my_package.volume_fader import VolumeFader, SleepTimer, CURVES, SLEEP_FADE_SECONDS
 # ----------------------------------------------
 music_Basefolder = "/home/ubuntu/Music/"
 music_Type = [] # Will be populated at startup
@@ -57,8 +78,45 @@ pc_Playlist_List = []
 pc_Playlist_files = []
 pc_Indexmax = 1
 
-# Initialize the MPD client controller globally
-mpd_player = MPDClientController(music_base_path=music_Basefolder)
+# In-memory index of music_Basefolder, shared by the PC endpoints and MPD helpers
+library = LibraryIndex(music_Basefolder, snapshot=LibrarySnapshot(SessionLocal))
+# Searchable tag metadata for the indexed files
+tag_index = TagIndex(library, SessionLocal)
+
+# Initialize the pool of MPD connections globally. Async endpoints go through
+# mpd_pool so a slow MPD command does not block the event loop.
+MPD_POOL_SIZE = int(os.environ.get("MPD_POOL_SIZE", "4"))
+mpd_pool = MPDConnectionPool(music_base_path=music_Basefolder, size=MPD_POOL_SIZE, library=library)
+# Server-side copy of the MPD queue, updated with plchanges diffs
+queue_cache = QueueCache(mpd_pool)
+# Pages of stored playlists without re-reading the whole playlist per page
+stored_playlists = StoredPlaylistPages(mpd_pool)
+# Pushes MPD state changes to /pi_events subscribers
+mpd_events = MPDEventBroadcaster(mpd_pool, queue_cache, music_base_path=music_Basefolder)
+SSE_KEEPALIVE_SECONDS = 15
+# Fetches and caches podcast RSS feeds for /api/podcast_feed
+podcast_feeds = PodcastFeedService()
+# Long operations (podcast download, library rescan, MPD update) run here, one per type
+job_manager = JobManager()
+MPD_UPDATE_POLL_SECONDS = 2
+# Timed playback: "app" runs the schedules table in-process, "crontab" keeps
+# the old crontab entry + cron_task.py for setups that need it
+SCHEDULE_BACKEND = os.environ.get("SCHEDULE_BACKEND", "app")
+# Volume ramps for scheduled fade-ins and the sleep timer
+fader = VolumeFader(mpd_pool)
+sleep_timer = SleepTimer(mpd_pool, fader)
+scheduler = PlaybackScheduler(SessionLocal, mpd_pool, fader)
+# ffmpeg transcodes for /stream, cached on disk
+transcoder = Transcoder()
+# Parsed sidecar/embedded lyrics for the PC player
+lyrics = LyricsService(music_Basefolder)
+# Cover art thumbnails for both players, cached on disk by content hash
+art = ArtService(music_Basefolder)
+# YouTube playlist entries: stable /yt/<video id> URLs, resolved with yt-dlp on demand
+youtube = YouTubeSource(SessionLocal, mpd_pool, queue_cache)
+# The track -> thumbnail redirect may change when a cover is edited; the
+# thumbnail it points to never does
+ART_LOOKUP_CACHE_CONTROL = "public, max-age=300"
 
 MPD_PLAYMODE = ["repeat", "random", "single", "consume"]
 
@@ -67,6 +125,14 @@ class CronJobPayload(BaseModel):
     minute: int
     day_of_week: Optional[List[int]] = None
 
+class SleepTimerPayload(BaseModel):
+    minutes: int
+    fade_seconds: int = SLEEP_FADE_SECONDS
+    curve: str = "ease-out"
+
+class LyricsPrefetchPayload(BaseModel):
+    paths: List[str]
+
 class StreamRequest(BaseModel):
     stream_url: str
     title: str
@@ -85,23 +151,9 @@ class SaveSelectionPayload(BaseModel):
     songs: List[str]
 
 
-# Generate filespath base from music_Basefolder
+# Generate filespath base from music_Basefolder, read from the library index
 def genFilelist(subfolder):
-    global pc_Indexmax
-    global music_Basefolder 
-    songs = []; 
-    for path, subdirs, files in os.walk(music_Basefolder + subfolder, followlinks=True):
-        path = path[len(music_Basefolder):]
-        if path.startswith('/'):
-            path = path[1:]
-        path = path+"/"
-        if path == '/':
-            path = ''
-        files = [path + file for file in files]
-        songs = songs + files; 
-    songs = [ f for f in songs if f.lower().endswith(('.mp3', '.flac'))]
-    songs.sort()
-    return songs
+    return library.files_under(subfolder, ('.mp3', '.flac'))
 
 # --- Application Lifespan Event Handler ---
 @asynccontextmanager
@@ -112,27 +164,35 @@ async def lifespan(app: FastAPI):
     """
     print("Application startup...")
 
-    # --- START: Dynamically find music types ---
-    print(f"Scanning for music types in: {music_Basefolder}")
-    base_path = Path(music_Basefolder)
-    if base_path.is_dir():
-        subfolders = [item.name for item in base_path.iterdir() if item.is_dir()]
-        music_Type.extend(sorted(subfolders)) 
-        print(f"✅ Found music types: {music_Type}")
-    else:
-        print(f"⚠️  Warning: Music base folder not found at '{music_Basefolder}'")
-    
     # Create database tables
     Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        playlist_store.migrate_playlist_blobs(db)
+
+    # --- START: Index the library and find music types ---
+    from_snapshot = await asyncio.to_thread(library.load)
+    if from_snapshot:
+        print("Library loaded from snapshot, reconciling with the disk in the background.")
+    elif Path(music_Basefolder).is_dir():
+        print(f"Scanning music library in: {music_Basefolder}")
+        await asyncio.to_thread(library.scan)
+    else:
+        print(f"⚠️  Warning: Music base folder not found at '{music_Basefolder}'")
+    music_Type.extend(library.top_level_folders())
+    print(f"✅ Found music types: {music_Type}")
+    # A loaded snapshot is served right away and reconciled in the background
+    library.start(refresh_now=from_snapshot)
+    tag_index.start()
+    job_manager.start()
     
     # Connect to MPD
     # Note: mpd_controller now handles connection errors gracefully, 
     # so even if this initial connect fails, the app will continue.
-    mpd_player.connect()
+    await mpd_pool.connect()
 
-    if mpd_player.is_connected:
+    if mpd_pool.is_connected:
         print("MPD is connected Updating MPD database...")
-        mpd_player.update()
+        job_manager.submit("mpd_update", mpd_update_job)
         
         # Create playlists based on folder names
         #for folder_name in music_Type:
@@ -146,11 +206,28 @@ async def lifespan(app: FastAPI):
     else:
         print("⚠️  MPD not connected at startup. Features will activate when MPD becomes available.")
 
+    mpd_events.start()
+    youtube.start(mpd_events)
+    wallpapers.start()
+    if SCHEDULE_BACKEND == "app":
+        await asyncio.to_thread(migrate_cron_jobs)
+        scheduler.start()
+
     try:
         yield
     finally:
         print("Application shutdown...")
-        mpd_player.disconnect()
+        await job_manager.stop()
+        await scheduler.stop()
+        await youtube.stop()
+        sleep_timer.cancel()
+        await tag_index.stop()
+        await library.stop()
+        await mpd_events.stop()
+        await podcast_feeds.close()
+        await wallpapers.stop()
+        art.shutdown()
+        mpd_pool.disconnect()
   
 # --- FastAPI App Setup ---
 origins = [
@@ -171,6 +248,13 @@ if not NUXT_DIST_PATH.exists():
     # You might want to make this a warning instead of a crash for dev purposes
     print(f"WARNING: Nuxt build not found at {NUXT_DIST_PATH}.")
 
+# Home page wallpapers, pre-resized to WebP/AVIF variants by the image pipeline
+WALLPAPER_DIR = NUXT_DIST_PATH / "images" / "home_picture"
+if not WALLPAPER_DIR.is_dir():
+    # Fallback to local dev path if dist doesn't exist
+    WALLPAPER_DIR = Path("../frontend/public/images/home_picture/")
+wallpapers = ResponsiveImageSet(str(WALLPAPER_DIR), "/images/home_picture", "/api/images")
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="backend_static")
 if NUXT_DIST_PATH.exists():
@@ -178,7 +262,92 @@ if NUXT_DIST_PATH.exists():
     app.mount("/images", StaticFiles(directory=NUXT_DIST_PATH / "images"), name="nuxt_images")
     app.mount("/app", StaticFiles(directory=NUXT_DIST_PATH, html=True), name="nuxt_app")
     
-app.mount("/music", StaticFiles(directory="/home/ubuntu/Music"), name="music_files")
+# Music files and .lrc lyrics for the PC player. A route rather than a
+# StaticFiles mount so the cache headers and 304s are under our control.
+@app.api_route("/music/{file_path:path}", methods=["GET", "HEAD"])
+def serve_music_file(file_path: str, request: Request):
+    return media_response(request, resolve_media_path(music_Basefolder, file_path))
+
+@app.get("/stream/{file_path:path}")
+async def stream_music_file(file_path: str, request: Request, format: str = "opus", bitrate: str = "96k"):
+    """
+    A music file transcoded for slow links, e.g. /stream/a/b.flac?format=opus&bitrate=96k.
+    Streams while ffmpeg runs the first time, then serves the cached file.
+    """
+    if format not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(PROFILES)}")
+    try:
+        bitrate = parse_bitrate(bitrate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    source_path = resolve_media_path(music_Basefolder, file_path)
+    try:
+        stat_result = await asyncio.to_thread(os.stat, source_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    cache_path = transcoder.cache_path(os.path.normpath(file_path), stat_result, format, bitrate)
+    if await asyncio.to_thread(transcoder.cached, cache_path):
+        return await asyncio.to_thread(media_response, request, cache_path)
+
+    try:
+        job = await transcoder.open(source_path, cache_path, format, bitrate)
+    except TranscoderBusy:
+        raise HTTPException(status_code=503, detail="Transcoder busy, try again later.", headers={"Retry-After": "10"})
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="ffmpeg is not installed.")
+    return TranscodeResponse(job, media_type=PROFILES[format].media_type)
+
+@app.get("/api/lyrics/{file_path:path}")
+async def get_lyrics(file_path: str):
+    """
+    Lyrics for a music file as {"path", "source", "synced", "lines": [[seconds, text], ...], "meta"}.
+    source is "sidecar", "embedded" or null when the track has none.
+    """
+    resolve_media_path(music_Basefolder, file_path)
+    result = await asyncio.to_thread(lyrics.get, os.path.normpath(file_path))
+    if result is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return result
+
+def art_redirect(digest, size):
+    if digest is None:
+        raise HTTPException(status_code=404, detail="No cover art")
+    return RedirectResponse(f"/api/art/cache/{digest}-{size}.jpg", status_code=307,
+                            headers={"cache-control": ART_LOOKUP_CACHE_CONTROL})
+
+def check_art_size(size):
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(map(str, THUMBNAIL_SIZES))}")
+
+@app.get("/api/art/track/{file_path:path}")
+async def get_track_art(file_path: str, size: int = 256):
+    """Cover of a music file (embedded, or cover.jpg/folder.jpg beside it), as a redirect to its thumbnail."""
+    check_art_size(size)
+    resolve_media_path(music_Basefolder, file_path)
+    return art_redirect(await art.track_art(os.path.normpath(file_path)), size)
+
+@app.get("/api/art/mpd/{uri:path}")
+async def get_mpd_art(uri: str, size: int = 256):
+    """Cover of a song in MPD's database, read with readpicture/albumart, as a redirect to its thumbnail."""
+    check_art_size(size)
+    return art_redirect(await art.mpd_art(mpd_pool, uri), size)
+
+@app.api_route("/api/art/cache/{name}", methods=["GET", "HEAD"])
+def get_cached_art(name: str, request: Request):
+    path = art.parse_cache_name(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return media_response(request, path, cache_control=IMMUTABLE_CACHE_CONTROL)
+
+@app.post("/api/lyrics/prefetch")
+async def prefetch_lyrics(payload: LyricsPrefetchPayload):
+    """Loads lyrics for the next tracks in the queue so track changes show them at once."""
+    paths = []
+    for path in payload.paths[:LYRICS_PREFETCH_MAX]:
+        resolve_media_path(music_Basefolder, path)
+        paths.append(os.path.normpath(path))
+    return await asyncio.to_thread(lyrics.prefetch, paths)
 
 app.add_middleware(
     CORSMiddleware,
@@ -225,28 +394,36 @@ async def serve_dynamic_payload(path: str):
 async def pi_mpd_connect():
     """Forces a reconnection attempt."""
     try:
-        mpd_player.connect()
-        if mpd_player.is_connected:
+        await mpd_pool.connect()
+        if mpd_pool.is_connected:
             return {"message": "Successfully connected to MPD."}
         else:
              raise HTTPException(status_code=503, detail="Failed to connect to MPD server.")
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to MPD: {e}")
 
+async def mpd_update_job(job):
+    await mpd_pool.run("update")
+    # MPD rescans in the background; the job lasts until it reports it is done
+    while not job.is_cancelled:
+        status = await mpd_pool.run("get_status")
+        if not status or "updating_db" not in status:
+            break
+        job.report({"updating_db": status["updating_db"]})
+        await asyncio.sleep(MPD_UPDATE_POLL_SECONDS)
+
 @app.post("/pi_mpd_update")
 async def pi_mpd_update():
     """Triggers an update of the MPD database."""
-    try:
-        mpd_player.update()
-        return {"message": "MPD database update initiated."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to update MPD database: {e}")
+    job, created = job_manager.submit("mpd_update", mpd_update_job)
+    message = "MPD database update initiated." if created else "MPD database update is already running."
+    return {"message": message, "job": job.to_dict()}
 
 @app.get("/pi_mpd_status")
 async def get_pi_status():
     """Returns the current status of the MPD player."""
     # get_status() handles reconnection internally now
-    status = mpd_player.get_status()
+    status = await mpd_pool.run("get_status")
     if status is None:
         # If still None after auto-reconnect, then MPD is truly down
         raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
@@ -255,7 +432,7 @@ async def get_pi_status():
 @app.get("/pi_get_current_song_duration")
 async def get_pi_current_song_duration():
     """Returns the total duration of the currently playing song."""
-    duration = mpd_player.get_current_song_duration()
+    duration = await mpd_pool.run("get_current_song_duration")
     if duration is None:
         raise HTTPException(status_code=404, detail="Could not retrieve song duration.")
     return {"duration": duration}
@@ -263,73 +440,129 @@ async def get_pi_current_song_duration():
 @app.get("/pi_get_current_song_elapsed_time")
 async def get_pi_current_song_elapsed_time():
     """Returns the elapsed time of the currently playing song."""
-    elapsed = mpd_player.get_current_song_elapsed_time()
+    elapsed = await mpd_pool.run("get_current_song_elapsed_time")
     if elapsed is None:
         raise HTTPException(status_code=404, detail="Could not retrieve elapsed time.")
     return {"elapsed": elapsed}
 
+@app.get("/pi_events")
+async def pi_events(request: Request):
+    """
+    Server-Sent Events stream of MPD state. The first event carries the full
+    state, later events only the subsystems that changed.
+    """
+    queue = mpd_events.subscribe()
+
+    async def event_stream():
+        try:
+            snapshot = await mpd_events.snapshot()
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            mpd_events.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 ### Pi MPD Control APIs
 @app.post("/pi_play")
 async def pi_play():
-    mpd_player.play()
+    await mpd_pool.run("play")
     return {"message": "Playback started."}
     
 @app.post("/pi_playid/{song_id}")
 async def pi_playid(song_id: str):
     try:
-        mpd_player.client.playid(song_id)
+        await mpd_pool.run("playid", song_id)
         return {"message": f"Playing song with id {song_id}."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {e}")
 
 @app.post("/pi_pause")
 async def pi_pause():
-    mpd_player.pause()
+    await mpd_pool.run("pause")
     return {"message": "Playback paused/unpaused."}
 
 @app.post("/pi_stop")
 async def pi_stop():
-    mpd_player.stop()
+    await mpd_pool.run("stop")
     return {"message": "Playback stopped."}
 
 @app.post("/pi_next")
 async def pi_next():
-    mpd_player.next()
+    await mpd_pool.run("next")
     return {"message": "Skipped to the next song."}
 
 @app.post("/pi_prev")
 async def pi_prev():
-    mpd_player.prev()
+    await mpd_pool.run("prev")
     return {"message": "Skipped to the previous song."}
 
 @app.put("/pi_setvol/{volume}")
 async def pi_setvol(volume: int):
-    mpd_player.setvol(volume)
+    # A volume picked by the user wins over a fade in progress
+    fader.cancel()
+    await mpd_pool.run("setvol", volume)
     return {"message": f"Volume set to {volume}."}
 
+@app.get("/pi_sleep_timer")
+async def get_sleep_timer():
+    return sleep_timer.status()
+
+@app.put("/pi_sleep_timer")
+async def set_sleep_timer(payload: SleepTimerPayload):
+    """Pauses playback after `minutes`, fading the volume out over the last `fade_seconds`."""
+    if payload.minutes <= 0 or payload.fade_seconds < 0:
+        raise HTTPException(status_code=400, detail="minutes must be positive and fade_seconds not negative.")
+    if payload.curve not in CURVES:
+        raise HTTPException(status_code=400, detail=f"curve must be one of: {', '.join(CURVES)}")
+    sleep_timer.start(payload.minutes, payload.fade_seconds, payload.curve)
+    return sleep_timer.status()
+
+@app.delete("/pi_sleep_timer")
+async def cancel_sleep_timer():
+    sleep_timer.cancel()
+    return sleep_timer.status()
+
 @app.put("/pi_seekcur/{time}")
 async def pi_seekcur(time: float):
-    mpd_player.seekcur(time)
+    await mpd_pool.run("seekcur", time)
     return {"message": f"Seeking to {time}s in current song."}
 
 @app.put("/pi_playmode")
 async def pi_playmode(repeat: Optional[bool] = None, random: Optional[bool] = None, single: Optional[bool] = None, costume: Optional[bool] = None):
     # We can rely on the controller or direct client access (which is wrapped in controller now ideally)
-    if repeat is not None: mpd_player.repeat(1 if repeat else 0)
-    if random is not None: mpd_player.random(1 if random else 0)
-    if single is not None: mpd_player.single(1 if single else 0)
-    if costume is not None: mpd_player.costume(1 if costume else 0)
+    if repeat is not None: await mpd_pool.run("repeat", 1 if repeat else 0)
+    if random is not None: await mpd_pool.run("random", 1 if random else 0)
+    if single is not None: await mpd_pool.run("single", 1 if single else 0)
+    if costume is not None: await mpd_pool.run("costume", 1 if costume else 0)
     return {"message": "Play mode updated."}
 
 @app.post("/pi_add_and_play_stream")
 async def pi_add_and_play_stream(payload: StreamRequest, current_user: User = Depends(get_current_user)):
+    def add_and_play(player):
+        # Runs as one unit on a single connection so other clients cannot
+        # modify the queue between the clear and the play.
+        with player.lock:
+            player.queue_clearsongs()
+            song_id = player.queue_add_songid(payload.stream_url)
+            if song_id:
+                player.add_tagid(song_id, "title", payload.title)
+                player.add_tagid(song_id, "artist", payload.artist)
+            player.play()
+
     try:
-        mpd_player.queue_clearsongs()
-        song_id = mpd_player.queue_add_songid(payload.stream_url)
-        if song_id:
-            mpd_player.add_tagid(song_id, "title", payload.title)
-            mpd_player.add_tagid(song_id, "artist", payload.artist)
-        mpd_player.play()
+        await mpd_pool.batch(add_and_play)
         return {"status": "success", "message": "Stream added and is now playing."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to play stream: {e}")
@@ -340,7 +573,7 @@ async def pi_mpd_browse(path: Optional[str] = None):
     """Browses the MPD music directory."""
     browse_path = path if path else ""
     try:
-        return mpd_player.browse_directory(browse_path)
+        return await mpd_pool.run("browse_directory", browse_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to browse directory: {e}")
 
@@ -348,41 +581,57 @@ async def pi_mpd_browse(path: Optional[str] = None):
 # Define the queue OUTSIDE the functions
 #pi_queue_songs = []
 @app.get("/pi_queue_songs")
-async def pi_queue_files():
-    return mpd_player.queue_get_songs()
+async def pi_queue_files(
+    since_version: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """
+    Returns the whole queue, or with `since_version` only the entries changed
+    since that playlist version: {"version", "length", "changes"}.
+    limit/cursor page through the queue, stream=true sends NDJSON.
+    """
+    try:
+        if since_version is None:
+            _, songs = await queue_cache.get_songs()
+            return list_response(songs, limit, cursor, stream)
+        return await queue_cache.get_changes(since_version)
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.get("/pi_queue_songsid")
 async def pi_queue_filesid():
-    return mpd_player.queue_get_songsid()
+    return await mpd_pool.run("queue_get_songsid")
 @app.delete("/pi_queue_clearsongs")
 async def pi_queue_clearsongs():
-    return mpd_player.queue_clearsongs()
+    return await mpd_pool.run("queue_clearsongs")
 
 @app.post("/pi_queue_add_song")
 async def pi_queue_add_song(song: SongRequest):
-    mpd_player.queue_add_song(song.path)
+    await mpd_pool.run("queue_add_song", song.path)
     return {"message": f"Song '{song.path}' added to the queue."}
 
 @app.get("/pi_queue_add_folder/{foldername:path}")  # <--- Note the :path here
 async def pi_gen_playlist(foldername:str):
-    mpd_player.queue_add_folder(foldername)
+    await mpd_pool.run("queue_add_folder", foldername)
     return {"message": f"Folder {foldername} added."}
 
 @app.get("/pi_queue_current_song")
 async def pi_queue_current_song():
-    current_song = mpd_player.queue_current_song()
+    current_song = await mpd_pool.run("queue_current_song")
     if current_song is None:
         return {"message": "No song is currently playing."}
     return current_song
     
 @app.get("/pi_queue_loadfrom_playlist/{pi_plname}")
 async def pi_load_playlist_to_queue(pi_plname:str):
-    mpd_player.queue_loadfrom_playlist(pi_plname)
+    await mpd_pool.run("queue_loadfrom_playlist", pi_plname)
     return {"message": f"Loading '{pi_plname}'."}
     
 @app.get("/pi_queue_saveto_playlist/{pi_plname}")
 async def pi_queue_save_to_playlist(pi_plname:str):
-    mpd_player.queue_saveto_playlist(pi_plname)
+    await mpd_pool.run("queue_saveto_playlist", pi_plname)
     return {"message": "Playlist saved."}
 
 
@@ -390,12 +639,12 @@ async def pi_queue_save_to_playlist(pi_plname:str):
 ### Pi MPD Playlist APIs    
 @app.get("/pi_get_playlists_List")
 async def pi_get_playlist_List():
-    return mpd_player.get_playlist_List()
+    return await mpd_pool.run("get_playlist_List")
 
 @app.put("/pi_playlist_renamepl/{old_name}/{new_name}")
 async def pi_playlist_renamepl(old_name: str, new_name: str):
     try:
-        mpd_player.playlist_renamepl(old_name, new_name)
+        await mpd_pool.run("playlist_renamepl", old_name, new_name)
         return {"message": f"Playlist '{old_name}' renamed to '{new_name}' successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error renaming playlist: {e}")
@@ -403,25 +652,41 @@ async def pi_playlist_renamepl(old_name: str, new_name: str):
 @app.delete("/pi_playlist_rmpl/{pi_plname}")
 async def pi_playlist_rmpl(pi_plname: str):
     try:
-        mpd_player.playlist_rmpl(pi_plname)
+        await mpd_pool.run("playlist_rmpl", pi_plname)
         return {"message": f"Playlist '{pi_plname}' deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting playlist: {e}")
     
 @app.get("/pi_playlist_songs/{pi_plname}")
 async def pi_playlist_songs(pi_plname: str):
-    return mpd_player.playlist_songs(pi_plname)
+    return await mpd_pool.run("playlist_songs", pi_plname)
 
 @app.get("/pi_playlist_songsinfo/{pi_plname}")
-async def pi_playlist_songsinfo(pi_plname: str):
-    return mpd_player.playlist_songsinfo(pi_plname)
+async def pi_playlist_songsinfo(
+    pi_plname: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """
+    The songs of a stored playlist. With `limit`, one page at a time:
+    {"items": [...], "next_cursor": "..."}, or NDJSON with stream=true.
+    """
+    if limit is None:
+        songs = await mpd_pool.run("playlist_songsinfo", pi_plname)
+        return list_response(songs, limit, cursor, stream)
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    start = cursor_offset(cursor)
+    songs, more = await stored_playlists.window(pi_plname, start, limit)
+    return page_response(songs, encode_cursor(start + len(songs)) if more else None, stream)
 
 @app.delete("/pi_playlist_deletesong/{pi_plname}/{songpos}")
 async def pi_playlist_deletesong(pi_plname: str, songpos: int):
     try:
         # MPD is 0-indexed, so we might need to adjust if the user provides a 1-based index.
         # Assuming the user provides a 0-based index for now.
-        mpd_player.playlist_deletesong(pi_plname, songpos)
+        await mpd_pool.run("playlist_deletesong", pi_plname, songpos)
         return {"message": f"Song at position {songpos} deleted from playlist '{pi_plname}'."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting song from playlist: {e}")
@@ -429,7 +694,7 @@ async def pi_playlist_deletesong(pi_plname: str, songpos: int):
 @app.post("/pi_playlistdeletesong")
 async def pi_playlistdeletesong_post(payload: PlaylistDeleteSongPayload):
     try:
-        mpd_player.playlist_deletesong(payload.pi_plname, payload.songpos)
+        await mpd_pool.run("playlist_deletesong", payload.pi_plname, payload.songpos)
         return {"message": f"Song at position {payload.songpos} deleted from playlist '{payload.pi_plname}'."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting song from playlist: {e}")
@@ -437,7 +702,7 @@ async def pi_playlistdeletesong_post(payload: PlaylistDeleteSongPayload):
 @app.delete("/pi_playlist_clearsongs/{pi_plname}")
 async def pi_playlist_clearsongs(pi_plname: str):
     try:
-        mpd_player.playlist_clearsongs(pi_plname)
+        await mpd_pool.run("playlist_clearsongs", pi_plname)
         return {"message": f"Playlist '{pi_plname}' cleared."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing playlist: {e}")
@@ -445,7 +710,7 @@ async def pi_playlist_clearsongs(pi_plname: str):
 @app.post("/pi_playlist_adduri/{pi_plname}/{uri:path}")
 async def pi_playlist_adduri(pi_plname: str, uri: str):
     try:
-        mpd_player.playlist_add_song(pi_plname, uri)
+        await mpd_pool.run("playlist_add_song", pi_plname, uri)
         return {"message": f"URI '{uri}' added to playlist '{pi_plname}'."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding URI to playlist: {e}")
@@ -456,7 +721,7 @@ async def pi_playlist_add_folder(pi_plname: str, foldername: str):
         folder_for_mpd = foldername
         if foldername == 'ALL_FILES':
             folder_for_mpd = '.'
-        result = mpd_player.playlist_add_folder(pi_plname, folder_for_mpd)
+        result = await mpd_pool.run("playlist_add_folder", pi_plname, folder_for_mpd)
         if "error" in result:
              raise HTTPException(status_code=404, detail=result["error"])
         return result
@@ -464,65 +729,207 @@ async def pi_playlist_add_folder(pi_plname: str, foldername: str):
         raise HTTPException(status_code=500, detail=f"Error adding folder to playlist: {e}")
 @app.post("/playlist/add_youtube_song")
 async def add_youtube_song(payload: YouTubeAddPayload):
+    """
+    Adds a YouTube video to a MPD playlist as this app's /yt/<video id> URL
+    rather than the signed stream URL, which would expire within hours.
+    """
     try:
-        # Use yt-dlp to get the direct audio URL
-        process = await asyncio.create_subprocess_exec(
-            'yt-dlp',
-            '-f', 'bestaudio/best',
-            '--get-url',
-            '--no-playlist',  # <--- ADD THIS LINE HERE
-            payload.youtube_url,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-
-        if process.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"yt-dlp error: {stderr.decode()}")
-
-        stream_url = stdout.decode().strip()
-
-        # Add the stream URL to the playlist
-        mpd_player.playlist_add_song(payload.playlist_name, stream_url)
-
-        return {"message": f"Successfully added video from {payload.youtube_url} to playlist {payload.playlist_name}."}
-
+        stream = await youtube.add(payload.youtube_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResolveError as e:
+        raise HTTPException(status_code=500, detail=f"yt-dlp error: {e}")
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail="yt-dlp is not installed or not in PATH.")
+
+    try:
+        await mpd_pool.run("playlist_add_song", payload.playlist_name, youtube.proxy_url(stream.video_id))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing YouTube URL: {e}")
+        raise HTTPException(status_code=500, detail=f"Error adding '{stream.title}' to playlist: {e}")
+    return {
+        "message": f"Successfully added '{stream.title}' to playlist {payload.playlist_name}.",
+        "video_id": stream.video_id,
+        "title": stream.title,
+    }
+
+@app.api_route("/yt/{video_id}", methods=["GET", "HEAD"])
+async def youtube_stream(video_id: str):
+    """
+    Where MPD plays YouTube playlist entries from: redirects to a current
+    stream URL. Only videos added with /playlist/add_youtube_song are
+    resolved; MPD cannot send a token, so this is what keeps the route from
+    being an open yt-dlp resolver.
+    """
+    if not is_video_id(video_id):
+        raise HTTPException(status_code=404, detail="Not a YouTube video id")
+    try:
+        stream = await youtube.added_stream(video_id)
+    except ResolveError as e:
+        raise HTTPException(status_code=502, detail=f"yt-dlp error: {e}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="yt-dlp is not installed or not in PATH.")
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Video not added to any playlist")
+    return RedirectResponse(stream.url, status_code=302, headers={"cache-control": "no-store"})
 
 @app.post("/pi_playlist/save_selection")
 async def pi_playlist_save_selection(payload: SaveSelectionPayload):
     try:
-        result = mpd_player.pi_save_selection_to_playlist(payload.playlist_name, payload.songs)
+        result = await mpd_pool.run("pi_save_selection_to_playlist", payload.playlist_name, payload.songs)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving selection to playlist: {e}")
 
+### Schedule APIs
+def migrate_cron_jobs():
+    """Moves a crontab entry made by the old /api/cron into the default schedule."""
+    try:
+        jobs = cron_service.get_cron_jobs()
+    except Exception as e:
+        print(f"Could not read crontab: {e}")
+        return
+    if not jobs:
+        return
+    minute, hour, _, _, dow = jobs[0]["schedule"].split()
+    with SessionLocal() as db:
+        if db.query(Schedule).filter(Schedule.name == DEFAULT_PLAYLIST).first() is None:
+            db.add(Schedule(
+                name=DEFAULT_PLAYLIST, hour=int(hour), minute=int(minute),
+                days=None if dow == "*" else dow, playlist=DEFAULT_PLAYLIST,
+            ))
+            db.commit()
+    cron_service.remove_cron_job()
+    print("Moved the crontab playback job into the in-app scheduler.")
+
+def schedule_response(schedule: Schedule):
+    return ScheduleResponse(
+        id=schedule.id,
+        name=schedule.name,
+        hour=schedule.hour,
+        minute=schedule.minute,
+        day_of_week=sorted(int(day) for day in schedule.days.split(",")) if schedule.days else None,
+        playlist=schedule.playlist,
+        volume=schedule.volume,
+        fade_in_seconds=schedule.fade_in_seconds or 0,
+        enabled=schedule.enabled,
+        next_run_at=scheduler.next_run(schedule.id),
+        last_run_at=schedule.last_run_at,
+    )
+
+def apply_schedule(schedule: Schedule, payload: ScheduleBase):
+    schedule.hour = payload.hour
+    schedule.minute = payload.minute
+    schedule.days = format_days(payload.day_of_week)
+    schedule.playlist = payload.playlist
+    schedule.volume = payload.volume
+    schedule.fade_in_seconds = payload.fade_in_seconds
+    schedule.enabled = payload.enabled
+
+async def ensure_schedule_playlist(playlist: str):
+    # The default playlist is built from the music folder of the same name
+    if mpd_pool.is_connected:
+        await mpd_pool.run("create_playlist_if_not_exists", playlist, playlist)
+
+@app.get("/api/schedules", response_model=List[ScheduleResponse])
+async def list_schedules(db: Session = Depends(get_db)):
+    return [schedule_response(schedule) for schedule in db.query(Schedule).order_by(Schedule.hour, Schedule.minute)]
+
+@app.post("/api/schedules", response_model=ScheduleResponse)
+async def create_schedule(payload: ScheduleCreate, db: Session = Depends(get_db)):
+    if db.query(Schedule).filter(Schedule.name == payload.name).first():
+        raise HTTPException(status_code=409, detail=f"Schedule '{payload.name}' already exists.")
+    schedule = Schedule(name=payload.name)
+    apply_schedule(schedule, payload)
+    db.add(schedule)
+    db.commit()
+    await ensure_schedule_playlist(payload.playlist)
+    scheduler.reload()
+    return schedule_response(schedule)
+
+@app.put("/api/schedules/{schedule_id}", response_model=ScheduleResponse)
+async def update_schedule(schedule_id: int, payload: ScheduleBase, db: Session = Depends(get_db)):
+    schedule = db.get(Schedule, schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    apply_schedule(schedule, payload)
+    db.commit()
+    await ensure_schedule_playlist(payload.playlist)
+    scheduler.reload()
+    return schedule_response(schedule)
+
+@app.delete("/api/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: int, db: Session = Depends(get_db)):
+    schedule = db.get(Schedule, schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    db.delete(schedule)
+    db.commit()
+    scheduler.reload()
+    return {"message": f"Schedule '{schedule.name}' removed."}
+
+@app.post("/api/schedules/{schedule_id}/run")
+async def run_schedule_now(schedule_id: int, db: Session = Depends(get_db)):
+    schedule = db.get(Schedule, schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    scheduler.trigger(scheduler.entry(schedule))
+    return {"message": f"Schedule '{schedule.name}' started."}
+
 ### Cron Job APIs
+# Kept for the piplayer page: the single job maps onto the default schedule,
+# or onto a crontab entry when SCHEDULE_BACKEND=crontab.
 @app.get("/api/cron")
-async def get_cron_jobs():
-    return cron_service.get_cron_jobs()
+async def get_cron_jobs(db: Session = Depends(get_db)):
+    if SCHEDULE_BACKEND == "crontab":
+        return cron_service.get_cron_jobs()
+    schedule = db.query(Schedule).filter(Schedule.name == DEFAULT_PLAYLIST).first()
+    if schedule is None or not schedule.enabled:
+        return []
+    return [{
+        "schedule": f"{schedule.minute} {schedule.hour} * * {schedule.days or '*'}",
+        "command": f"play {schedule.playlist}",
+        "comment": cron_service.CRON_COMMENT,
+    }]
 
 @app.post("/api/cron")
-async def add_cron_job(payload: CronJobPayload):
+async def add_cron_job(payload: CronJobPayload, db: Session = Depends(get_db)):
     try:
-        return cron_service.add_cron_job(payload.hour, payload.minute, payload.day_of_week)
+        await ensure_schedule_playlist(DEFAULT_PLAYLIST)
+        if SCHEDULE_BACKEND == "crontab":
+            return await asyncio.to_thread(cron_service.add_cron_job, payload.hour, payload.minute, payload.day_of_week)
+        schedule = db.query(Schedule).filter(Schedule.name == DEFAULT_PLAYLIST).first()
+        if schedule is None:
+            schedule = Schedule(name=DEFAULT_PLAYLIST, playlist=DEFAULT_PLAYLIST)
+            db.add(schedule)
+        schedule.hour = payload.hour
+        schedule.minute = payload.minute
+        schedule.days = format_days(payload.day_of_week)
+        schedule.enabled = True
+        db.commit()
+        scheduler.reload()
+        return {"message": f"Playback scheduled at {payload.hour:02d}:{payload.minute:02d} on days {schedule.days or '*'}."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/cron")
-async def remove_cron_job():
-    return cron_service.remove_cron_job()
+async def remove_cron_job(db: Session = Depends(get_db)):
+    if SCHEDULE_BACKEND == "crontab":
+        return cron_service.remove_cron_job()
+    deleted = db.query(Schedule).filter(Schedule.name == DEFAULT_PLAYLIST).delete()
+    db.commit()
+    scheduler.reload()
+    return {"message": "Scheduled playback removed." if deleted else "No scheduled playback found to remove."}
 
 ### PC Player API
 @app.get("/pc_get_allfiles")
 async def pc_get_allfiles(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
     current_user: User = Depends(get_current_user)
 ):
     fileslist = genFilelist('')
-    return fileslist
+    return list_response(fileslist, limit, cursor, stream, sorted_keys=True)
 
 @app.get("/pc_get_playlist_List", response_model=PlaylistsListResponse)
 async def pc_get_playlists_list(
@@ -539,13 +946,10 @@ async def pc_playlist_files(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    user_playlist = db.query(UserPlaylist).filter(
-        UserPlaylist.user_id == current_user.id,
-        UserPlaylist.playlist_name == pc_plname
-    ).first()
+    user_playlist = playlist_store.get_playlist(db, current_user.id, pc_plname)
 
     if user_playlist:
-        return json.loads(user_playlist.playlist_data)
+        return playlist_store.get_paths(db, user_playlist.id)
     return []
 
 @app.post("/pc_playlist_saveto_list/{pc_plname}")
@@ -555,28 +959,60 @@ async def pc_playlist_saveto_list(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    user_playlist = db.query(UserPlaylist).filter(
-        UserPlaylist.user_id == current_user.id,
-        UserPlaylist.playlist_name == pc_plname
-    ).first()
-
-    playlist_data_json = json.dumps(payload.songs)
+    user_playlist = playlist_store.get_playlist(db, current_user.id, pc_plname)
+    created = user_playlist is None
+    if created:
+        user_playlist = playlist_store.get_or_create_playlist(db, current_user.id, pc_plname)
 
-    if user_playlist:
-        user_playlist.playlist_data = playlist_data_json
-        db.commit()
-        db.refresh(user_playlist)
-        return {"message": f"Playlist '{pc_plname}' updated successfully"}
-    else:
-        new_playlist = UserPlaylist(
-            user_id=current_user.id,
-            playlist_name=pc_plname,
-            playlist_data=playlist_data_json
-        )
-        db.add(new_playlist)
-        db.commit()
-        db.refresh(new_playlist)
+    playlist_store.replace_items(db, user_playlist.id, payload.songs)
+    db.commit()
+    if created:
         return {"message": f"Playlist '{pc_plname}' created successfully"}
+    return {"message": f"Playlist '{pc_plname}' updated successfully"}
+
+# Single-item edits, so toggling a favourite does not re-upload the whole list
+@app.post("/pc_playlist_items/{pc_plname}")
+async def pc_playlist_append_item(
+    pc_plname: str,
+    payload: PlaylistItemPayload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    user_playlist = playlist_store.get_or_create_playlist(db, current_user.id, pc_plname)
+    playlist_store.append_item(db, user_playlist.id, payload.path)
+    db.commit()
+    return {"message": f"'{payload.path}' added to playlist '{pc_plname}'"}
+
+@app.delete("/pc_playlist_items/{pc_plname}")
+async def pc_playlist_remove_item(
+    pc_plname: str,
+    path: Optional[str] = None,
+    position: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if (path is None) == (position is None):
+        raise HTTPException(status_code=400, detail="Give either path or position")
+    user_playlist = playlist_store.get_playlist(db, current_user.id, pc_plname)
+    if not user_playlist or not playlist_store.remove_item(db, user_playlist.id, path=path, position=position):
+        raise HTTPException(status_code=404, detail=f"Song not found in playlist '{pc_plname}'")
+    db.commit()
+    return {"message": f"Song removed from playlist '{pc_plname}'"}
+
+@app.put("/pc_playlist_items/{pc_plname}/move")
+async def pc_playlist_move_item(
+    pc_plname: str,
+    payload: PlaylistMovePayload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    user_playlist = playlist_store.get_playlist(db, current_user.id, pc_plname)
+    if not user_playlist:
+        raise HTTPException(status_code=404, detail=f"Playlist '{pc_plname}' not found")
+    if not playlist_store.move_item(db, user_playlist.id, payload.from_position, payload.to_position):
+        raise HTTPException(status_code=400, detail="Position out of range")
+    db.commit()
+    return {"message": f"Song moved in playlist '{pc_plname}'"}
 
 @app.delete("/pc_playlist_rmpl/{pc_plname}")
 async def pc_playlist_rmpl(
@@ -592,6 +1028,7 @@ async def pc_playlist_rmpl(
     if not playlist_to_delete:
         raise HTTPException(status_code=404, detail=f"Playlist '{pc_plname}' not found")
 
+    playlist_store.replace_items(db, playlist_to_delete.id, [])
     db.delete(playlist_to_delete)
     db.commit()
     return {"message": f"Playlist '{pc_plname}' deleted successfully"}
@@ -603,44 +1040,25 @@ async def pc_browse(
     current_user: User = Depends(get_current_user)
 ):
     """Browses the PC music directory."""
-    base_path = Path(music_Basefolder).resolve()
-    browse_path = base_path
+    browse_path = os.path.normpath(path) if path else '.'
 
-    if path:
-        browse_path = (base_path / path).resolve()
-
-    # Security check: Ensure the resolved path is within the base music folder.
+    # Security check: Ensure the path stays within the base music folder.
     # This prevents directory traversal attacks (e.g., path = "../..")
-    try:
-        if not browse_path.is_relative_to(base_path):
-            raise HTTPException(status_code=400, detail="Invalid path")
-    except ValueError:
-        # This can happen if the paths are on different drives in Windows,
-        # or other complex scenarios. For our case, it's an invalid path.
+    if os.path.isabs(browse_path) or browse_path == '..' or browse_path.startswith('../'):
         raise HTTPException(status_code=400, detail="Invalid path")
 
-    if not browse_path.exists() or not browse_path.is_dir():
+    items = library.list_dir(browse_path)
+    if items is None:
         raise HTTPException(status_code=404, detail="Directory not found")
-
-    items = []
-    for item in sorted(browse_path.iterdir()):
-        try:
-            item_path_str = str(item.relative_to(base_path))
-        except ValueError:
-            continue
-            
-        if item.is_dir():
-            items.append({"type": "directory", "path": item_path_str, "name": item.name})
-        else:
-            if item.suffix.lower() in ['.mp3', '.flac', '.wav', '.ogg', '.m4a', '.aac']:
-                items.append({"type": "file", "path": item_path_str, "name": item.name})
     return items
 
 @app.get("/pc_gen_fileslist/{foldername}")
 async def pc_gen_fileslist(
     foldername :str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    current_user: User = Depends(get_current_user)
 ):  
     path_to_scan = foldername
     if foldername == 'ALL_FILES':
@@ -648,11 +1066,26 @@ async def pc_gen_fileslist(
             
     folderpath = path_to_scan.replace(" ", "/")
     fileslist = genFilelist(folderpath)
-    return fileslist
+    return list_response(fileslist, limit, cursor, stream, sorted_keys=True)
+
+@app.get("/api/search")
+async def search_library(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user)
+):
+    """Searches song titles, artists, albums and paths. Word prefixes and CJK substrings match."""
+    limit = max(1, min(limit, 200))
+    offset = max(0, offset)
+    try:
+        return await asyncio.to_thread(tag_index.search, q, limit, offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
 
 # --- User Management ---
 @app.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     DESIGNATED_CODE = "Happy"
     if user.code != DESIGNATED_CODE:
         raise HTTPException(status_code=400, detail="Invalid registration code")
@@ -662,7 +1095,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     default_settings = {
         "show_lyrics": True,
         "show_radio_card": True,
@@ -682,8 +1115,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
     new_playlist = UserPlaylist(
         user_id=db_user.id,
-        playlist_name="我的最愛",
-        playlist_data=json.dumps([])
+        playlist_name="我的最愛"
     )
     db.add(new_playlist)
     db.commit()
@@ -695,12 +1127,20 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     username_capitalized = form_data.username.upper()
     user = db.query(User).filter(User.username == username_capitalized).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The bcrypt cost changed since this password was hashed
+        user.hashed_password = new_hash
+        db.commit()
+        invalidate_cached_user(user.username)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -718,9 +1158,11 @@ async def update_user_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    current_user.settings = json.dumps(settings.dict())
+    # current_user is a cached, detached copy; update the row in this session
+    user = db.get(User, current_user.id)
+    user.settings = json.dumps(settings.dict())
     db.commit()
-    db.refresh(current_user)
+    invalidate_cached_user(user.username)
     return {"message": "Settings updated successfully"}
 
 @app.put("/users/password")
@@ -729,74 +1171,123 @@ async def change_password(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Current password is incorrect")
     if len(password_data.new_password) < 6:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="New password must be at least 6 characters long")
     
-    current_user.hashed_password = get_password_hash(password_data.new_password)
+    user = db.get(User, current_user.id)
+    user.hashed_password = await get_password_hash_async(password_data.new_password)
     db.commit()
-    db.refresh(current_user)
+    invalidate_cached_user(user.username)
     return {"message": "Password changed successfully"}
 
 
 
 @app.post("/upload_user_picture")
-async def upload_user_picture(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
-):
-    save_path = Path(f"../frontend/public/images/user_picture/{current_user.username}.jpg")
-    save_path.parent.mkdir(parents=True, exist_ok=True)
+async def upload_user_picture(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Multipart upload with a "file" field. Saved as square JPEGs of every
+    AVATAR_SIZES size; uploads over AVATAR_MAX_UPLOAD_MB are cut off with 413.
+    """
+    try:
+        upload = await read_upload(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
     try:
-        image_data = await file.read()
-        with Image.open(io.BytesIO(image_data)) as img:
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            img.save(save_path, 'jpeg')
+        await save_avatar(upload, current_user.username)
         return {"message": "Picture uploaded successfully"}
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="The file is not a picture.")
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading picture: {e}")
 
 @app.get("/api/wallpaper-images")
 async def get_wallpaper_images():
-    image_dir = NUXT_DIST_PATH / "images" / "home_picture"   
-    if not image_dir.is_dir():
-        # Fallback to local dev path if dist doesn't exist
-        image_dir = Path("../frontend/public/images/home_picture/")
-        if not image_dir.is_dir():
-            return []
-    
-    images = [f"/images/home_picture/{p.name}" for p in image_dir.iterdir() if p.is_file()]
-    return images
+    """
+    Home page wallpapers as [{"src", "width", "height", "blurhash", "sources": [{"type", "srcset"}]}].
+    The listing is kept in memory; images still being processed only have "src".
+    """
+    return wallpapers.listing()
+
+@app.api_route("/api/images/{name}", methods=["GET", "HEAD"])
+def get_image_variant(name: str, request: Request):
+    path = wallpapers.variant_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return media_response(request, path, cache_control=IMMUTABLE_CACHE_CONTROL)
+
+def podcast_download_job(job):
+    return download_podcasts(cancel_event=job.cancel_event, report=job.report)
 
 @app.post("/download_podcast")
 async def download_podcast(current_user: User = Depends(get_current_user)):
-    try:
-        python_executable = os.path.join(os.path.dirname(__file__), ".venv/bin/python")
-        script_path = os.path.join(os.path.dirname(__file__), "podcastdl_task.py")
-        await asyncio.create_subprocess_exec(python_executable, script_path)
-        return {"message": "Podcast download started in the background."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    job, created = job_manager.submit("podcast_download", podcast_download_job)
+    message = "Podcast download started in the background." if created else "Podcast download is already running."
+    return {"message": message, "job": job.to_dict()}
 
-# Cache for podcast feeds (30 minutes TTL)
-podcast_cache = TTLCache(maxsize=100, ttl=1800)
+@app.get("/download_podcast")
+async def download_podcast_progress(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Progress of the last podcast download run, read from the episode table:
+    episode counts by status since the run started and the downloads in flight.
+    """
+    job = job_manager.latest("podcast_download")
+    progress = podcast_store.progress(db, since=job.started_at if job else None)
+    progress["running"] = job is not None and job.is_active
+    progress["job"] = job.to_dict() if job else None
+    return progress
+
+def library_rescan_job(job, full):
+    if full:
+        library.scan()
+        return {"changed": True}
+    return {"changed": library.refresh()}
+
+@app.post("/api/library/rescan")
+async def rescan_library(full: bool = False, current_user: User = Depends(get_current_user)):
+    """Re-reads the music folder: changed directories only, or everything with full=true."""
+    job, created = job_manager.submit("library_rescan", library_rescan_job, full)
+    return {"created": created, "job": job.to_dict()}
+
+@app.get("/api/jobs")
+async def list_jobs(current_user: User = Depends(get_current_user)):
+    return [job.to_dict() for job in job_manager.list()]
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: int, current_user: User = Depends(get_current_user)):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int, current_user: User = Depends(get_current_user)):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    return job.to_dict()
 
 @app.get("/api/podcast_feed")
-async def get_podcast_feed(feed_url: str, limit: Optional[int] = None):
+async def get_podcast_feed(feed_url: str, limit: Optional[int] = None, db: Session = Depends(get_db)):
     """
     Fetches and parses an RSS feed from the given URL and returns structured data.
-    Uses a cache to avoid re-fetching the same feed excessively.
+    The parsed feed is cached once per URL and revalidated with a conditional GET.
+    Each episode is flagged as downloaded from the episode table, not the disk.
     """
-    cache_key = f"{feed_url}_{limit}"
-    if cache_key in podcast_cache:
-        return podcast_cache[cache_key]
-    
     try:
-        parsed_data = parse_rss_feed(feed_url, limit=limit)
-        podcast_cache[cache_key] = parsed_data
-        return parsed_data
+        feed = await podcast_feeds.get_feed(feed_url, limit=limit)
+        downloaded = podcast_store.downloaded_guids(db, feed_url)
+        return {
+            "feed_info": feed["feed_info"],
+            "episodes": [dict(episode, downloaded=episode["id"] in downloaded) for episode in feed["episodes"]],
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error parsing RSS feed: {e}")
 
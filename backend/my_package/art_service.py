@@ -0,0 +1,181 @@
+# my_package/art_service.py
+import asyncio
+import base64
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import LRUCache, TTLCache
+from mutagen import File as MutagenFile
+from mutagen.flac import Picture
+
+from .image_utils import encode_jpeg, open_image, resize_steps, write_atomic
+
+ART_CACHE_DIR = os.environ.get("ART_CACHE_DIR", "./art_cache")
+# Thumbnail widths generated for every cover, in pixels
+THUMBNAIL_SIZES = (64, 256, 512)
+# Threads resizing covers; decoding a large JPEG is CPU bound on the Pi
+ART_WORKERS = int(os.environ.get("ART_WORKERS", "2"))
+# Tracks whose cover lookup result is remembered in memory
+ART_INDEX_SIZE = 4096
+# MPD songs have no mtime to key on, so their lookups expire instead
+MPD_ART_TTL = 3600
+# Folder images used when a file has no embedded picture, in order of preference
+COVER_FILENAMES = ('cover.jpg', 'cover.png', 'folder.jpg', 'folder.png', 'front.jpg', 'front.png', 'album.jpg')
+# APIC / FLAC picture type for the front cover
+FRONT_COVER = 3
+
+_UNKNOWN = object()
+_CACHE_NAME = re.compile(r'^([0-9a-f]{64})-(\d+)\.jpg$')
+
+
+def _front_cover(pictures):
+    for picture in pictures:
+        if picture.type == FRONT_COVER:
+            return picture.data
+    return pictures[0].data if pictures else None
+
+
+def extract_embedded_art(full_path):
+    """Picture bytes embedded in an audio file (ID3 APIC, FLAC, Vorbis/Opus, MP4), or None."""
+    try:
+        audio = MutagenFile(full_path)
+    except Exception as e:
+        print(f"Error reading cover art from '{full_path}': {e}")
+        return None
+    if audio is None:
+        return None
+    if getattr(audio, "pictures", None): # FLAC
+        return _front_cover(audio.pictures)
+    tags = audio.tags
+    if tags is None:
+        return None
+    if hasattr(tags, "getall"): # ID3
+        return _front_cover(tags.getall("APIC"))
+    covers = tags.get("covr") # MP4
+    if covers:
+        return bytes(covers[0])
+    blocks = tags.get("metadata_block_picture") # Ogg Vorbis / Opus
+    if blocks:
+        try:
+            return _front_cover([Picture(base64.b64decode(block)) for block in blocks])
+        except Exception as e:
+            print(f"Error decoding cover art in '{full_path}': {e}")
+    return None
+
+
+def read_folder_cover(folder):
+    """Bytes of cover.jpg, folder.jpg, ... in `folder` (any letter case), or None."""
+    try:
+        names = {name.lower(): name for name in os.listdir(folder)}
+    except OSError:
+        return None
+    for candidate in COVER_FILENAMES:
+        if candidate in names:
+            try:
+                with open(os.path.join(folder, names[candidate]), 'rb') as f:
+                    return f.read()
+            except OSError as e:
+                print(f"Error reading cover '{candidate}' in '{folder}': {e}")
+    return None
+
+
+class ArtService:
+    """
+    Cover art thumbnails for tracks, extracted once and served from disk.
+
+    Thumbnails are stored under the SHA-256 of the source picture, so every
+    track of an album shares one set of files and a cached thumbnail never
+    changes; clients may cache them forever. Which digest belongs to a
+    track is remembered in memory, keyed by the track's mtime and its
+    folder's mtime (adding or removing cover.jpg changes the latter).
+    Resizing runs on a small thread pool, and concurrent requests for the
+    same track share one extraction.
+    """
+
+    def __init__(self, base_path, cache_dir=ART_CACHE_DIR, sizes=THUMBNAIL_SIZES,
+                 workers=ART_WORKERS, index_size=ART_INDEX_SIZE):
+        self.base_path = base_path
+        self.cache_dir = cache_dir
+        self.sizes = tuple(sizes)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="art")
+        self._index = LRUCache(maxsize=index_size)
+        self._mpd_index = TTLCache(maxsize=index_size, ttl=MPD_ART_TTL)
+        self._inflight = {}
+
+    def cache_path(self, digest, size):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-{size}.jpg")
+
+    def parse_cache_name(self, name):
+        """'<digest>-256.jpg' -> its path in the cache, or None for anything else."""
+        match = _CACHE_NAME.match(name)
+        if not match or int(match.group(2)) not in self.sizes:
+            return None
+        return self.cache_path(match.group(1), int(match.group(2)))
+
+    def track_key(self, relative_path):
+        """Raises OSError if the track does not exist."""
+        full_path = os.path.join(self.base_path, relative_path)
+        track_mtime = os.stat(full_path).st_mtime_ns
+        folder_mtime = os.stat(os.path.dirname(full_path)).st_mtime_ns
+        return (relative_path, track_mtime, folder_mtime)
+
+    async def track_art(self, relative_path):
+        """Digest of a music file's cover, or None if it has none or does not exist."""
+        try:
+            key = await asyncio.to_thread(self.track_key, relative_path)
+        except OSError:
+            return None
+        digest = self._index.get(key, _UNKNOWN)
+        if digest is _UNKNOWN:
+            loop = asyncio.get_running_loop()
+            digest = await self._single_flight(
+                key, lambda: loop.run_in_executor(self._executor, self._extract_track, relative_path))
+            self._index[key] = digest
+        return digest
+
+    async def mpd_art(self, pool, uri):
+        """Digest of the cover MPD reports for a song URI (readpicture, then albumart), or None."""
+        digest = self._mpd_index.get(uri, _UNKNOWN)
+        if digest is _UNKNOWN:
+            digest = await self._single_flight(("mpd", uri), lambda: self._fetch_mpd(pool, uri))
+            self._mpd_index[uri] = digest
+        return digest
+
+    async def _single_flight(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_mpd(self, pool, uri):
+        data = await pool.run("get_picture", uri)
+        if not data:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.store, data)
+
+    def _extract_track(self, relative_path):
+        full_path = os.path.join(self.base_path, relative_path)
+        data = extract_embedded_art(full_path) or read_folder_cover(os.path.dirname(full_path))
+        return self.store(data) if data else None
+
+    def store(self, data):
+        """Writes the thumbnails for picture bytes if they are not cached yet. Returns the digest, or None."""
+        digest = hashlib.sha256(data).hexdigest()
+        if all(os.path.exists(self.cache_path(digest, size)) for size in self.sizes):
+            return digest
+        try:
+            img = open_image(data, max(self.sizes))
+            for size, thumbnail in resize_steps(img, self.sizes):
+                write_atomic(self.cache_path(digest, size), encode_jpeg(thumbnail))
+        except Exception as e: # not an image, too large, truncated, disk full
+            print(f"Error creating cover thumbnails: {e}")
+            return None
+        return digest
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,13 +1,17 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from my_package.database import get_db
+from my_package.database import SessionLocal
 from my_package.models import User
 
 # Configuration for JWT
@@ -15,15 +19,54 @@ SECRET_KEY = "your-secret-key"  # CHANGE THIS IN PRODUCTION!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users are cached by token subject, so most requests cost a
+# signature check and a dict lookup instead of a database query.
+USER_CACHE_TTL_SECONDS = 60
+USER_CACHE_SIZE = 256
+
+# bcrypt cost factor. Hashes made with a different cost are flagged as
+# needing an update and rehashed the next time the user logs in.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# bcrypt takes hundreds of milliseconds on a Pi, so it runs on a small
+# dedicated pool rather than on the event loop.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+# Sync endpoints run in a threadpool and may invalidate concurrently
+_user_cache_lock = threading.Lock()
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash used a
+    different cost factor and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,7 +77,25 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def invalidate_cached_user(username: str):
+    """Drops a user from the auth cache; call after changing their row."""
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
+
+def _load_user(username: str):
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == username).first()
+        if user is not None:
+            # Detach with its columns loaded so it can be cached and shared
+            db.expunge(user)
+        return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Returns the User for the bearer token. The object is detached and shared
+    through the cache: treat it as read-only and load the row in your own
+    session to change it.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,7 +108,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+
+    with _user_cache_lock:
+        user = _user_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = _load_user(username)
+        if user is None:
+            raise credentials_exception
+        with _user_cache_lock:
+            _user_cache[username] = user
     return user
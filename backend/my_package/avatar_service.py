@@ -0,0 +1,83 @@
+# my_package/avatar_service.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from .image_utils import encode_jpeg, open_image, resize_steps, write_atomic
+
+AVATAR_DIR = os.environ.get("AVATAR_DIR", "../frontend/public/images/user_picture")
+AVATAR_MAX_BYTES = int(os.environ.get("AVATAR_MAX_UPLOAD_MB", "20")) * 1024 * 1024
+# Square sizes written per upload as <username>-<size>.jpg. The largest is
+# also written as <username>.jpg, the name the user page loads.
+AVATAR_SIZES = (64, 128, 256)
+# Decoding a phone photo takes a core for a while; keep the others for MPD and requests
+AVATAR_WORKERS = int(os.environ.get("AVATAR_WORKERS", "1"))
+
+_avatar_executor = ThreadPoolExecutor(max_workers=AVATAR_WORKERS, thread_name_prefix="avatar")
+
+
+class UploadTooLarge(MultiPartException):
+    pass
+
+
+async def _limited_stream(request, limit):
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(f"Upload is larger than {limit // (1024 * 1024)} MB")
+        yield chunk
+
+
+async def read_upload(request, field="file", limit=AVATAR_MAX_BYTES):
+    """
+    Parses a multipart/form-data request holding one file and returns that
+    field as an UploadFile. The body is streamed into a temporary file
+    (kept in memory up to 1 MB) and the upload is stopped as soon as it
+    passes `limit` bytes, instead of being read whole first.
+    Raises UploadTooLarge, or MultiPartException for a malformed form.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise MultiPartException("Expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise UploadTooLarge(f"Upload is larger than {limit // (1024 * 1024)} MB")
+
+    parser = MultiPartParser(request.headers, _limited_stream(request, limit), max_files=1, max_fields=1)
+    form = await parser.parse()
+    upload = form.get(field)
+    if not isinstance(upload, UploadFile):
+        await form.close()
+        raise MultiPartException(f"Missing file field '{field}'")
+    return upload
+
+
+def write_avatar(file, username, directory=AVATAR_DIR, sizes=AVATAR_SIZES):
+    """Center-crops the image to a square and writes every size atomically. Returns the paths."""
+    img = open_image(file, max(sizes))
+    width, height = img.size
+    side = min(width, height)
+    left, top = (width - side) // 2, (height - side) // 2
+    img = img.crop((left, top, left + side, top + side))
+
+    paths = []
+    for size, resized in resize_steps(img, sizes):
+        data = encode_jpeg(resized)
+        path = os.path.join(directory, f"{username}-{size}.jpg")
+        write_atomic(path, data)
+        paths.append(path)
+        if size == max(sizes):
+            write_atomic(os.path.join(directory, f"{username}.jpg"), data)
+    return paths
+
+
+async def save_avatar(upload, username):
+    """Processes an uploaded picture on the avatar worker, off the event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_avatar_executor, write_avatar, upload.file, username)
+    finally:
+        await upload.close()
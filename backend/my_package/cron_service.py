@@ -1,7 +1,6 @@
 # my_package/cron_service.py
 import os
 from crontab import CronTab
-from .mpd_controller import MPDClientController
 from typing import Optional, List # Import List and Optional
 
 # It's better to get the python path dynamically
@@ -37,17 +36,9 @@ def get_cron_jobs():
 def add_cron_job(hour: int, minute: int, day_of_week: Optional[List[int]] = None):
     """
     Adds a new cron job to play the '定期播放' playlist.
+    The caller creates the playlist first, over its own MPD connection.
     """
     cron = CronTab(user=True)
-    
-    # Create playlist before adding cron job
-    mpd_controller = MPDClientController()
-    mpd_controller.connect()
-    if mpd_controller.is_connected:
-        mpd_controller.create_playlist_if_not_exists("定期播放", "定期播放")
-        mpd_controller.disconnect()
-    else:
-        raise Exception("MPD is not connected.")
 
     command = f'{python_executable} {script_path}'
     
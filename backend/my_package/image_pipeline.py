@@ -0,0 +1,178 @@
+# my_package/image_pipeline.py
+import asyncio
+import hashlib
+import json
+import os
+import re
+
+from PIL import Image, features
+
+from .image_utils import blurhash, encode_image, open_image, write_atomic
+
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "./image_cache")
+# Widths generated for every wallpaper; never wider than the original
+WALLPAPER_WIDTHS = (480, 960, 1440, 1920)
+# Seconds between checks of the wallpaper folder for added or changed files
+WALLPAPER_POLL_SECONDS = 60
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Pillow options per output format. AVIF is far smaller than WebP but only
+# available when Pillow was built with libavif; browsers pick the first
+# <source> they support, so AVIF is listed first.
+ENCODERS = {
+    "avif": ("AVIF", "image/avif", {"quality": 60, "speed": 8}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+}
+OUTPUT_FORMATS = tuple(name for name in ENCODERS if features.check(name))
+
+_VARIANT_NAME = re.compile(r'^([0-9a-f]{16})-(\d+)\.(avif|webp)$')
+
+
+class ResponsiveImageSet:
+    """
+    Pre-resized variants of every image in a folder, for <picture>/srcset.
+
+    Each source is keyed by its name, size and mtime; its variants and a
+    JSON record (dimensions, blurhash) are written under that key once, so
+    a replaced file gets new URLs and existing ones can be cached forever.
+    The listing is kept in memory and rebuilt only when the folder changes.
+    """
+
+    def __init__(self, source_dir, url_prefix, variant_prefix, cache_dir=IMAGE_CACHE_DIR,
+                 widths=WALLPAPER_WIDTHS, formats=OUTPUT_FORMATS):
+        self.source_dir = source_dir
+        self.url_prefix = url_prefix
+        self.variant_prefix = variant_prefix
+        self.cache_dir = cache_dir
+        self.widths = tuple(widths)
+        self.formats = tuple(formats)
+        self._signature = None
+        self._listing = []
+        self._task = None
+
+    def listing(self):
+        return self._listing
+
+    def variant_path(self, name):
+        """Path of a variant file in the cache from its URL name, or None if the name is not one."""
+        match = _VARIANT_NAME.match(name)
+        if not match or match.group(3) not in self.formats:
+            return None
+        return os.path.join(self.cache_dir, match.group(1)[:2], name)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Error processing images in '{self.source_dir}': {e}")
+            await asyncio.sleep(WALLPAPER_POLL_SECONDS)
+
+    def _sources(self):
+        """(name, size, mtime_ns) of every image in the folder; compared to detect changes."""
+        sources = []
+        try:
+            entries = sorted(os.scandir(self.source_dir), key=lambda entry: entry.name)
+        except OSError:
+            return sources
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(SOURCE_EXTENSIONS):
+                stat_result = entry.stat()
+                sources.append((entry.name, stat_result.st_size, stat_result.st_mtime_ns))
+        return sources
+
+    def refresh(self):
+        """Processes new or changed images and rebuilds the listing. Returns True if anything changed."""
+        sources = self._sources()
+        if sources == self._signature:
+            return False
+        listing = []
+        for name, size, mtime_ns in sources:
+            key = hashlib.sha256(f"{name}\0{size}\0{mtime_ns}".encode()).hexdigest()[:16]
+            try:
+                record = self._load_record(key) or self._process(name, key)
+            except Exception as e:
+                print(f"Error processing image '{name}': {e}")
+                record = None
+            listing.append(self._entry(name, key, record))
+            # Publish as we go, so the first images are served while the rest are processed
+            self._listing = listing + [{"src": f"{self.url_prefix}/{n}"} for n, _, _ in sources[len(listing):]]
+        self._listing = listing
+        self._signature = sources
+        self._remove_stale({entry.get("key") for entry in listing})
+        return True
+
+    def _record_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_record(self, key):
+        try:
+            with open(self._record_path(key)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Regenerate if the configured widths or formats changed since
+        if record.get("formats") != list(self.formats) or record.get("requested_widths") != list(self.widths):
+            return None
+        return record
+
+    def _process(self, name, key):
+        with open(os.path.join(self.source_dir, name), 'rb') as f:
+            img = open_image(f.read())
+        width, height = img.size
+        widths = []
+        current = img
+        for target in sorted(self.widths, reverse=True):
+            if target < current.width:
+                current = current.resize((target, round(current.height * target / current.width)), Image.LANCZOS)
+            elif widths:
+                continue # the original is narrower; it was already written once
+            for format in self.formats:
+                pillow_format, _, options = ENCODERS[format]
+                write_atomic(os.path.join(self.cache_dir, key[:2], f"{key}-{current.width}.{format}"),
+                             encode_image(current, pillow_format, **options))
+            widths.append([current.width, current.height])
+        record = {
+            "width": width, "height": height, "blurhash": blurhash(img),
+            "widths": sorted(widths), "formats": list(self.formats), "requested_widths": list(self.widths),
+        }
+        write_atomic(self._record_path(key), json.dumps(record).encode())
+        print(f"Image '{name}': {len(widths)} widths x {len(self.formats)} formats generated.")
+        return record
+
+    def _entry(self, name, key, record):
+        entry = {"src": f"{self.url_prefix}/{name}"}
+        if record is None:
+            return entry
+        entry.update(key=key, width=record["width"], height=record["height"], blurhash=record["blurhash"])
+        entry["sources"] = [
+            {
+                "type": ENCODERS[format][1],
+                "srcset": ", ".join(f"{self.variant_prefix}/{key}-{w}.{format} {w}w" for w, _ in record["widths"]),
+            }
+            for format in record["formats"]
+        ]
+        return entry
+
+    def _remove_stale(self, keys):
+        """Deletes variants of images that were removed or replaced."""
+        for root, _, files in os.walk(self.cache_dir):
+            for file_name in files:
+                if file_name[:16] not in keys:
+                    try:
+                        os.remove(os.path.join(root, file_name))
+                    except OSError:
+                        pass
@@ -0,0 +1,156 @@
+# my_package/image_utils.py
+import io
+import math
+import os
+import uuid
+
+from PIL import Image, ImageOps
+
+# Largest image we agree to decode. Anything bigger is refused before the
+# pixel data is read, instead of exhausting the Pi's memory.
+MAX_IMAGE_PIXELS = 40_000_000
+JPEG_QUALITY = 85
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def open_image(source, max_size=None):
+    """
+    Opens image bytes or a binary file object for resizing. When max_size
+    is given, JPEGs are decoded at a reduced scale (Image.draft), which is
+    several times faster than decoding full size and then shrinking. The result is upright (EXIF
+    orientation applied) and in RGB or RGBA.
+    Raises ImageTooLarge, or PIL.UnidentifiedImageError for non-images.
+    """
+    img = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    width, height = img.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f"Image is {width}x{height}, more than {MAX_IMAGE_PIXELS} pixels")
+    if max_size:
+        img.draft('RGB', (max_size, max_size))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+    return img
+
+
+def resize_steps(img, sizes):
+    """
+    Yields (size, image) for each size, largest first, each one shrunk from
+    the previous so the expensive resample only runs on the full image once.
+    Images are never enlarged.
+    """
+    current = img
+    for size in sorted(sizes, reverse=True):
+        if max(current.size) > size:
+            current = current.copy()
+            # reducing_gap shrinks by whole factors first (Image.reduce), then resamples
+            current.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+        yield size, current
+
+
+def encode_jpeg(img, quality=JPEG_QUALITY):
+    if img.mode != 'RGB':
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A') if 'A' in img.getbands() else None)
+        img = background
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def encode_image(img, format, **options):
+    """Encodes to 'WEBP', 'AVIF', 'JPEG', ... with Pillow's save options."""
+    if format == 'JPEG':
+        return encode_jpeg(img, **options)
+    buffer = io.BytesIO()
+    img.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+# --- Blurhash (https://blurha.sh), a ~30 character placeholder for an image ---
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+# The hash only keeps a few cosine components, so a tiny image gives the same result
+BLURHASH_SAMPLE_SIZE = 32
+
+
+def _base83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value):
+    value /= 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+_SRGB_TO_LINEAR = [_srgb_to_linear(value) for value in range(256)]
+
+
+def blurhash(img, x_components=4, y_components=3):
+    """Blurhash of a Pillow image with x_components * y_components cosine terms."""
+    sample = img.convert('RGB')
+    sample.thumbnail((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE))
+    width, height = sample.size
+    data = sample.tobytes()
+    pixels = [(_SRGB_TO_LINEAR[data[k]], _SRGB_TO_LINEAR[data[k + 1]], _SRGB_TO_LINEAR[data[k + 2]])
+              for k in range(0, len(data), 3)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                basis_y = math.cos(math.pi * j * y / height)
+                row = y * width
+                for x in range(width):
+                    basis = basis_y * math.cos(math.pi * i * x / width)
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(c) for factor in ac for c in factor) * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    result += _base83(quantised_max, 1)
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    def quantise(value):
+        return max(0, min(18, int(math.floor(math.copysign(abs(value / max_value) ** 0.5, value) * 9 + 9.5))))
+
+    for r, g, b in ac:
+        result += _base83(quantise(r) * 19 * 19 + quantise(g) * 19 + quantise(b), 2)
+    return result
+
+
+def write_atomic(path, data):
+    """Writes to a temporary file next to `path` and renames it into place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
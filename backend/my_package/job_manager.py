@@ -0,0 +1,168 @@
+# my_package/job_manager.py
+import asyncio
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+# Jobs of different types that may run at the same time
+MAX_CONCURRENT_JOBS = 2
+# Finished jobs kept for the status endpoints
+JOB_HISTORY_SIZE = 50
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+@dataclass
+class Job:
+    id: int
+    type: str
+    func: Callable = field(repr=False)
+    args: tuple = field(default=(), repr=False)
+    status: str = "queued" # queued, running, completed, failed or cancelled
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Set by cancel(). Job functions poll it, or is_cancelled, to stop early.
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def is_active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def report(self, progress):
+        """Replaces the progress dict; safe to call from the job's worker thread."""
+        self.progress = progress
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs long operations (podcast downloads, library rescans, MPD updates)
+    in the server process instead of fire-and-forget subprocesses.
+
+    At most one job of each type is queued or running; submitting another
+    returns the existing one. Jobs wait in a FIFO queue and at most
+    max_concurrent run at once. Coroutine functions run on the event loop,
+    plain functions on a worker thread. Either way the function receives the
+    Job as its first argument, to report progress and check for cancellation.
+    Status is kept in memory, so reading it costs nothing.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_JOBS, history_size=JOB_HISTORY_SIZE):
+        self.max_concurrent = max(1, max_concurrent)
+        self.history_size = history_size
+        self._jobs = OrderedDict()
+        self._active_by_type = {}
+        self._ids = itertools.count(1)
+        self._queue = None
+        self._workers = []
+
+    def start(self):
+        if not self._workers:
+            self._queue = asyncio.Queue()
+            for job in self._jobs.values():
+                if job.status == "queued":
+                    self._queue.put_nowait(job)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)]
+
+    async def stop(self):
+        for job in self._jobs.values():
+            if job.is_active:
+                job.cancel_event.set()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, job_type, func, *args):
+        """Queues func(job, *args). Returns (job, created); created is False if one was already active."""
+        existing = self._active_by_type.get(job_type)
+        if existing is not None and existing.is_active:
+            return existing, False
+
+        job = Job(id=next(self._ids), type=job_type, func=func, args=args)
+        self._jobs[job.id] = job
+        self._active_by_type[job_type] = job
+        self._trim_history()
+        if self._queue is not None:
+            self._queue.put_nowait(job)
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def active(self, job_type):
+        job = self._active_by_type.get(job_type)
+        return job if job is not None and job.is_active else None
+
+    def latest(self, job_type):
+        for job in reversed(self._jobs.values()):
+            if job.type == job_type:
+                return job
+        return None
+
+    def list(self):
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Asks a job to stop. A queued job is cancelled right away. Returns False if it is not active."""
+        job = self._jobs.get(job_id)
+        if job is None or not job.is_active:
+            return False
+        job.cancel_event.set()
+        if job.status == "queued":
+            self._finish(job, "cancelled")
+        return True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != "queued":
+                # Cancelled while waiting
+                continue
+            job.status = "running"
+            job.started_at = datetime.now()
+            try:
+                if asyncio.iscoroutinefunction(job.func):
+                    job.result = await job.func(job, *job.args)
+                else:
+                    job.result = await asyncio.to_thread(job.func, job, *job.args)
+                self._finish(job, "cancelled" if job.is_cancelled else "completed")
+            except asyncio.CancelledError:
+                self._finish(job, "cancelled")
+                raise
+            except Exception as e:
+                print(f"Job {job.type} #{job.id} failed: {e}")
+                job.error = str(e)
+                self._finish(job, "failed")
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = datetime.now()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
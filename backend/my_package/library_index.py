@@ -0,0 +1,306 @@
+# my_package/library_index.py
+import asyncio
+import json
+import os
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from .models import LibraryDir
+
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.wav', '.ogg', '.m4a', '.aac')
+# Seconds between checks of the directory mtimes
+RESCAN_INTERVAL = 60
+# Paths per DELETE ... IN (...) when the snapshot is saved
+SNAPSHOT_DELETE_BATCH = 500
+
+
+@dataclass
+class DirEntry:
+    mtime: int
+    subdirs: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    # name -> (size, st_mtime_ns)
+    file_stats: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+
+class LibrarySnapshot:
+    """
+    Persists LibraryIndex directories in the library_dirs table, one row per
+    directory, so a restart can load the index instead of walking the tree.
+    Only directories that changed since the last save are written.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def load(self):
+        with self.session_factory() as db:
+            rows = db.execute(select(LibraryDir.path, LibraryDir.mtime, LibraryDir.subdirs, LibraryDir.files)).all()
+        dirs = {}
+        for path, mtime, subdirs, files in rows:
+            files = json.loads(files)
+            dirs[path] = DirEntry(
+                mtime=mtime,
+                subdirs=json.loads(subdirs),
+                files=[name for name, _, _ in files],
+                file_stats={name: (size, file_mtime) for name, size, file_mtime in files},
+            )
+        return dirs
+
+    def save(self, changed: Dict[str, DirEntry], removed):
+        # Changed rows are deleted and inserted again in bulk; merge() would
+        # run one SELECT per directory, seconds for a first save of 10k folders.
+        paths = list(removed) + list(changed)
+        rows = [
+            {
+                "path": path,
+                "mtime": entry.mtime,
+                "subdirs": json.dumps(entry.subdirs, ensure_ascii=False),
+                "files": json.dumps([[name, *entry.file_stats.get(name, (0, 0))] for name in entry.files],
+                                    ensure_ascii=False),
+            }
+            for path, entry in changed.items()
+        ]
+        with self.session_factory() as db:
+            for start in range(0, len(paths), SNAPSHOT_DELETE_BATCH):
+                db.execute(delete(LibraryDir).where(LibraryDir.path.in_(paths[start:start + SNAPSHOT_DELETE_BATCH])))
+            if rows:
+                db.execute(insert(LibraryDir), rows)
+            db.commit()
+
+
+class LibraryIndex:
+    """
+    In-memory index of the audio files under the music folder.
+
+    The tree is walked once at startup. After that only directory mtimes are
+    checked: a directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so only those directories are listed again.
+
+    All relative file paths are kept in one sorted list, which makes "every
+    file under this folder" a bisect plus a slice instead of a walk.
+
+    With a LibrarySnapshot the index is also saved to SQLite, so after a
+    reboot it is loaded from there and only reconciled against the disk.
+    """
+
+    def __init__(self, base_path, extensions=AUDIO_EXTENSIONS, snapshot=None):
+        self.base_path = base_path.rstrip('/')
+        self.extensions = tuple(extensions)
+        # Optional LibrarySnapshot used for fast cold starts
+        self.snapshot = snapshot
+        self._dirs: Dict[str, DirEntry] = {}
+        self._files: List[str] = []
+        # Bumped on every change, lets dependent indexes tell when to resync
+        self.version = 0
+        # Serializes scan() and refresh(); readers use the last published snapshot.
+        self._scan_lock = threading.Lock()
+        self._task = None
+
+    # --- Scanning ---
+
+    def scan(self):
+        """Walks the whole music folder and replaces the index."""
+        with self._scan_lock:
+            dirs = {}
+            if os.path.isdir(self.base_path):
+                self._scan_tree('', dirs, set())
+            self._publish(dirs)
+        print(f"Library index: {len(self._files)} files in {len(self._dirs)} folders.")
+
+    def load(self):
+        """
+        Fills the index from the snapshot. Returns False if there is none, in
+        which case scan() is needed. Call refresh() afterwards to pick up
+        changes made while the app was not running.
+        """
+        if self.snapshot is None:
+            return False
+        try:
+            dirs = self.snapshot.load()
+        except Exception as e:
+            print(f"Library index: could not load snapshot: {e}")
+            return False
+        if '' not in dirs:
+            return False
+        with self._scan_lock:
+            self._publish(dirs, persist=False)
+        print(f"Library index: loaded {len(self._files)} files in {len(self._dirs)} folders from snapshot.")
+        return True
+
+    def refresh(self):
+        """
+        Re-lists only the directories whose mtime changed since the last scan.
+        Returns True if the index changed.
+        """
+        with self._scan_lock:
+            dirs = dict(self._dirs)
+            changed = False
+            for rel in sorted(self._dirs):
+                if rel not in dirs:
+                    # Already dropped together with a removed parent
+                    continue
+                try:
+                    mtime = os.stat(self._abs(rel)).st_mtime_ns
+                except OSError:
+                    self._drop_tree(rel, dirs)
+                    changed = True
+                    continue
+                if mtime != dirs[rel].mtime:
+                    self._rescan_dir(rel, dirs)
+                    changed = True
+            if changed:
+                self._publish(dirs)
+            return changed
+
+    def _abs(self, rel):
+        return os.path.join(self.base_path, rel) if rel else self.base_path
+
+    def _list_dir(self, rel):
+        """Returns a DirEntry for one directory, without descending."""
+        path = self._abs(rel)
+        entry = DirEntry(mtime=os.stat(path).st_mtime_ns)
+        with os.scandir(path) as it:
+            for item in it:
+                try:
+                    if item.is_dir(follow_symlinks=True):
+                        entry.subdirs.append(item.name)
+                    elif item.name.lower().endswith(self.extensions):
+                        stat = item.stat(follow_symlinks=True)
+                        entry.files.append(item.name)
+                        entry.file_stats[item.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        entry.subdirs.sort()
+        entry.files.sort()
+        return entry
+
+    def _scan_tree(self, rel, dirs, seen):
+        # Symlinks are followed like os.walk(followlinks=True); `seen` stops loops.
+        real = os.path.realpath(self._abs(rel))
+        if real in seen:
+            return
+        seen.add(real)
+        try:
+            entry = self._list_dir(rel)
+        except OSError as e:
+            print(f"Library index: cannot read '{rel}': {e}")
+            return
+        dirs[rel] = entry
+        for name in entry.subdirs:
+            self._scan_tree(f"{rel}/{name}" if rel else name, dirs, seen)
+
+    def _rescan_dir(self, rel, dirs):
+        old = dirs[rel]
+        try:
+            entry = self._list_dir(rel)
+        except OSError:
+            self._drop_tree(rel, dirs)
+            return
+        dirs[rel] = entry
+        for name in set(old.subdirs) - set(entry.subdirs):
+            self._drop_tree(f"{rel}/{name}" if rel else name, dirs)
+        new_children = [child for child in (f"{rel}/{name}" if rel else name for name in entry.subdirs)
+                        if child not in dirs]
+        if new_children:
+            seen = {os.path.realpath(self._abs(d)) for d in dirs}
+            for child in new_children:
+                self._scan_tree(child, dirs, seen)
+
+    def _drop_tree(self, rel, dirs):
+        prefix = rel + '/'
+        for key in [d for d in dirs if d == rel or d.startswith(prefix)]:
+            del dirs[key]
+
+    def _publish(self, dirs, persist=True):
+        files = []
+        for rel, entry in dirs.items():
+            prefix = rel + '/' if rel else ''
+            files.extend(prefix + name for name in entry.files)
+        files.sort()
+        old_dirs = self._dirs
+        # Swapping whole objects keeps concurrent readers consistent without locking.
+        self._dirs, self._files = dirs, files
+        self.version += 1
+
+        if persist and self.snapshot is not None:
+            # Unchanged directories keep the same DirEntry object across refreshes.
+            changed = {rel: entry for rel, entry in dirs.items() if old_dirs.get(rel) is not entry}
+            removed = old_dirs.keys() - dirs.keys()
+            try:
+                self.snapshot.save(changed, removed)
+            except Exception as e:
+                print(f"Library index: could not save snapshot: {e}")
+
+    # --- Background refresh ---
+
+    def start(self, interval=RESCAN_INTERVAL, refresh_now=False):
+        """Starts the periodic refresh; refresh_now reconciles a loaded snapshot first."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop(interval, refresh_now))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self, interval, refresh_now):
+        if not refresh_now:
+            await asyncio.sleep(interval)
+        while True:
+            try:
+                if await asyncio.to_thread(self.refresh):
+                    print(f"Library index refreshed: {len(self._files)} files.")
+            except Exception as e:
+                print(f"Library index refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    # --- Queries ---
+
+    @staticmethod
+    def normalize(folder):
+        """'', '.', '/a/b/' and 'a/b' all map to the index key ('' or 'a/b')."""
+        folder = (folder or '').strip('/')
+        return '' if folder in ('', '.') else folder
+
+    def files_under(self, folder='', extensions=None):
+        """Sorted relative paths of every file below `folder`."""
+        folder = self.normalize(folder)
+        files = self._files
+        if folder:
+            # '0' is the character after '/', so this is the range of 'folder/...'
+            files = files[bisect_left(files, folder + '/'):bisect_left(files, folder + '0')]
+        if extensions:
+            extensions = tuple(extensions)
+            return [f for f in files if f.lower().endswith(extensions)]
+        return list(files)
+
+    def list_dir(self, folder='') -> Optional[List[dict]]:
+        """Directories and files directly in `folder`, sorted by name. None if unknown."""
+        folder = self.normalize(folder)
+        entry = self._dirs.get(folder)
+        if entry is None:
+            return None
+        prefix = folder + '/' if folder else ''
+        items = [{"type": "directory", "path": prefix + name, "name": name} for name in entry.subdirs]
+        items += [{"type": "file", "path": prefix + name, "name": name} for name in entry.files]
+        items.sort(key=lambda item: item["name"])
+        return items
+
+    def file_stat(self, path):
+        """(size, st_mtime_ns) of an indexed file, or None."""
+        folder, _, name = self.normalize(path).rpartition('/')
+        entry = self._dirs.get(folder)
+        return entry.file_stats.get(name) if entry else None
+
+    def top_level_folders(self):
+        entry = self._dirs.get('')
+        return list(entry.subdirs) if entry else []
@@ -0,0 +1,165 @@
+# my_package/lyrics_service.py
+import codecs
+import os
+import re
+import threading
+
+from cachetools import LRUCache
+from charset_normalizer import from_bytes
+from mutagen import File as MutagenFile
+
+# Parsed lyrics kept in memory, keyed by path and mtimes
+LYRICS_CACHE_SIZE = 512
+# Most tracks a single prefetch request may ask for
+LYRICS_PREFETCH_MAX = 10
+SIDECAR_EXTENSIONS = ('.lrc', '.LRC')
+# Tried in order when the file is not UTF-8; charset-normalizer picks among them first
+FALLBACK_ENCODINGS = ('big5', 'gb18030', 'shift_jis')
+
+# [mm:ss], [mm:ss.x], [mm:ss.xx], [mm:ss.xxx] and [mm:ss:xx]
+_TIMESTAMP = re.compile(r'\[(\d{1,3}):(\d{1,2})(?:[.:](\d{1,3}))?\]')
+_META = re.compile(r'^\[(ti|ar|al|by|offset|length):([^\]]*)\]\s*$', re.IGNORECASE)
+
+
+def decode_text(data):
+    """Decodes lyrics bytes: BOMs and UTF-8 first, then the legacy Chinese/Japanese encodings."""
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+        if data.startswith(bom):
+            return data.decode(encoding, errors='replace')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    best = from_bytes(data, cp_isolation=list(FALLBACK_ENCODINGS)).best()
+    if best is not None:
+        return str(best)
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def parse_lrc(text):
+    """
+    Parses LRC text into {"synced", "lines", "meta"}. lines is a list of
+    [seconds, text] sorted by time; a line with several timestamps appears
+    once per timestamp. Text without timestamps (typical for embedded
+    lyrics) comes back unsynced with a time of None.
+    """
+    meta, timed, plain = {}, [], []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        meta_match = _META.match(line)
+        if meta_match:
+            meta[meta_match.group(1).lower()] = meta_match.group(2).strip()
+            continue
+        stamps = list(_TIMESTAMP.finditer(line))
+        if not stamps:
+            plain.append(line)
+            continue
+        words = _TIMESTAMP.sub('', line).strip()
+        for stamp in stamps:
+            fraction = stamp.group(3) or '0'
+            seconds = int(stamp.group(1)) * 60 + int(stamp.group(2)) + int(fraction) / 10 ** len(fraction)
+            timed.append([seconds, words])
+
+    if not timed:
+        return {"synced": False, "lines": [[None, line] for line in plain], "meta": meta}
+
+    # [offset:+500] shows every line 0.5 s earlier
+    try:
+        offset = int(meta.get("offset", 0)) / 1000
+    except ValueError:
+        offset = 0
+    timed.sort(key=lambda entry: entry[0])
+    lines = [[round(max(0.0, seconds - offset), 3), words] for seconds, words in timed]
+    return {"synced": True, "lines": lines, "meta": meta}
+
+
+def read_embedded_lyrics(full_path):
+    """Lyrics stored in the audio file: ID3 USLT, Vorbis/FLAC LYRICS or MP4 ©lyr."""
+    try:
+        audio = MutagenFile(full_path)
+    except Exception as e:
+        print(f"Error reading lyrics from '{full_path}': {e}")
+        return None
+    if audio is None or audio.tags is None:
+        return None
+    tags = audio.tags
+    if hasattr(tags, "getall"): # ID3
+        frames = tags.getall("USLT")
+        return frames[0].text if frames else None
+    for key in ("LYRICS", "UNSYNCEDLYRICS", "lyrics", "unsyncedlyrics", "\xa9lyr"):
+        try:
+            values = tags[key]
+        except (KeyError, ValueError):
+            continue
+        if values:
+            return str(values[0])
+    return None
+
+
+class LyricsService:
+    """
+    Finds lyrics for a track, preferring a sidecar .lrc next to it over tags
+    embedded in the file, and returns them parsed. Results are cached by
+    path plus the mtimes of the track and sidecar, so editing either one is
+    picked up without a restart.
+    """
+
+    def __init__(self, base_path, maxsize=LYRICS_CACHE_SIZE):
+        self.base_path = base_path
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, relative_path):
+        """Parsed lyrics for a track, or None if the track does not exist."""
+        full_path = os.path.join(self.base_path, relative_path)
+        try:
+            track_mtime = os.stat(full_path).st_mtime_ns
+        except OSError:
+            return None
+        sidecar, sidecar_mtime = self._find_sidecar(full_path)
+        key = (relative_path, track_mtime, sidecar_mtime)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = {"path": relative_path, "source": None, "synced": False, "lines": [], "meta": {}}
+        text = None
+        if sidecar is not None:
+            try:
+                with open(sidecar, 'rb') as f:
+                    text = decode_text(f.read())
+                result["source"] = "sidecar"
+            except OSError as e:
+                print(f"Error reading lyrics file '{sidecar}': {e}")
+        if text is None:
+            text = read_embedded_lyrics(full_path)
+            if text:
+                result["source"] = "embedded"
+        if text:
+            result.update(parse_lrc(text))
+
+        with self._lock:
+            self._cache[key] = result
+        return result
+
+    def prefetch(self, relative_paths):
+        """Loads several tracks into the cache. Returns {path: lyrics}."""
+        return {path: self.get(path) for path in relative_paths[:LYRICS_PREFETCH_MAX]}
+
+    @staticmethod
+    def _find_sidecar(full_path):
+        stem = os.path.splitext(full_path)[0]
+        for extension in SIDECAR_EXTENSIONS:
+            try:
+                return stem + extension, os.stat(stem + extension).st_mtime_ns
+            except OSError:
+                continue
+        return None, None
@@ -0,0 +1,85 @@
+# my_package/media_files.py
+import os
+import stat
+from email.utils import parsedate_to_datetime
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+# Only for URLs that name their content (cover art and image variants keyed
+# by a hash), which never change. Files addressed by path, music included,
+# can be retagged or edited in place, so browsers revalidate them with the
+# ETag on every use; an unchanged file costs a 304.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=604800, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Bytes per read when the server cannot send the file itself. Each read is a
+# thread hop, so seeking in a large FLAC is cheaper with bigger reads.
+MEDIA_CHUNK_SIZE = 256 * 1024
+MEDIA_TYPES = {'.lrc': 'text/plain', '.webp': 'image/webp', '.avif': 'image/avif'}
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse with larger reads. Starlette already answers Range and
+    If-Range requests with 206, and hands whole files to the server with
+    the ASGI pathsend extension where the server supports it (zero-copy).
+    """
+    chunk_size = MEDIA_CHUNK_SIZE
+
+
+def resolve_media_path(base_path, relative_path):
+    """Absolute path of a file under base_path; 400 for paths that escape it."""
+    normalized = os.path.normpath(relative_path)
+    if os.path.isabs(normalized) or normalized == '..' or normalized.startswith('../') or normalized == '.':
+        raise HTTPException(status_code=400, detail="Invalid path")
+    return os.path.join(base_path, normalized)
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison, as for GET: W/"x" matches "x"
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return etag in tags
+
+
+def is_not_modified(request: Request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present (RFC 9110)
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def media_response(request: Request, path, cache_control=REVALIDATE_CACHE_CONTROL):
+    """
+    Serves one media file with a strong ETag, Last-Modified, Cache-Control,
+    304 for conditional requests and 206 for byte ranges.
+    """
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    extension = os.path.splitext(path)[1].lower()
+    response = MediaFileResponse(
+        path,
+        stat_result=stat_result,
+        media_type=MEDIA_TYPES.get(extension),
+        headers={"cache-control": cache_control},
+    )
+    if is_not_modified(request, response.headers["etag"], stat_result.st_mtime):
+        return Response(status_code=304, headers={
+            "etag": response.headers["etag"],
+            "last-modified": response.headers["last-modified"],
+            "cache-control": cache_control,
+        })
+    return response
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Text, Float, Index, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -19,6 +19,95 @@ class UserPlaylist(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     playlist_name = Column(String, index=True) # e.g., "pc_playlist"
-    playlist_data = Column(String) # Storing as a JSON string for simplicity
+    # Legacy JSON list of paths; migrated into playlist_items at startup and left NULL
+    playlist_data = Column(String, nullable=True)
 
-    owner = relationship("User", back_populates="playlists")
\ No newline at end of file
+    owner = relationship("User", back_populates="playlists")
+    items = relationship("PlaylistItem", back_populates="playlist", order_by="PlaylistItem.position")
+
+class PlaylistItem(Base):
+    __tablename__ = "playlist_items"
+    __table_args__ = (
+        Index("ix_playlist_items_playlist_position", "playlist_id", "position"),
+        Index("ix_playlist_items_playlist_path", "playlist_id", "path"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    playlist_id = Column(Integer, ForeignKey("user_playlists.id"), nullable=False)
+    # Sort key only; gaps are allowed so a removal never renumbers the rest
+    position = Column(Integer, nullable=False)
+    path = Column(String, nullable=False)
+
+    playlist = relationship("UserPlaylist", back_populates="items")
+
+class LibraryDir(Base):
+    """On-disk snapshot of one LibraryIndex directory, so startup can skip the full walk."""
+    __tablename__ = "library_dirs"
+
+    path = Column(String, primary_key=True) # relative to the music folder, "" for the root
+    mtime = Column(Integer) # st_mtime_ns of the directory when it was listed
+    subdirs = Column(Text) # JSON list of names
+    files = Column(Text) # JSON list of [name, size, mtime_ns]
+
+class TrackTag(Base):
+    """Tags read from one music file; the track_search FTS5 table indexes these rows by id."""
+    __tablename__ = "track_tags"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, unique=True, index=True) # relative to the music folder
+    size = Column(Integer)
+    mtime = Column(Integer) # st_mtime_ns the tags were read at
+    title = Column(String)
+    artist = Column(String)
+    album = Column(String)
+    duration = Column(Float)
+    track = Column(Integer)
+
+class PodcastEpisode(Base):
+    """One feed entry seen by podcastdl_task.py and the state of its download."""
+    __tablename__ = "podcast_episodes"
+    __table_args__ = (
+        UniqueConstraint("feed_url", "guid", name="uq_podcast_episodes_feed_guid"),
+        Index("ix_podcast_episodes_status_pub_date", "status", "pub_date"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    feed = Column(String, nullable=False) # podcast name, also its folder name
+    feed_url = Column(String, nullable=False)
+    guid = Column(String, nullable=False)
+    title = Column(String)
+    audio_url = Column(String)
+    pub_date = Column(DateTime)
+    local_path = Column(String)
+    size = Column(Integer)
+    # pending, downloading, downloaded, failed, removed, or ignored (too old or no audio)
+    status = Column(String, nullable=False, default="pending")
+    error = Column(String)
+    updated_at = Column(DateTime)
+
+class Schedule(Base):
+    """A timed playback run by PlaybackScheduler: load a stored MPD playlist and play it."""
+    __tablename__ = "schedules"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    hour = Column(Integer, nullable=False)
+    minute = Column(Integer, nullable=False)
+    days = Column(String) # comma separated, 0 = Sunday as in crontab; NULL for every day
+    playlist = Column(String, nullable=False)
+    volume = Column(Integer) # NULL leaves the volume unchanged
+    fade_in_seconds = Column(Integer, default=0)
+    enabled = Column(Boolean, default=True)
+    last_run_at = Column(DateTime)
+
+class YouTubeVideo(Base):
+    """A YouTube video added to an MPD playlist, and its last resolved stream URL."""
+    __tablename__ = "youtube_videos"
+
+    video_id = Column(String, primary_key=True)
+    title = Column(String)
+    # Signed googlevideo URL from yt-dlp; only valid until expires_at
+    stream_url = Column(String)
+    expires_at = Column(DateTime)
+    resolved_at = Column(DateTime)
+    added_at = Column(DateTime)
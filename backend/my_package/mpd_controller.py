@@ -1,24 +1,42 @@
 # my_package/mpd_controller.py
 import os
+import re
 import sys
+import threading
 from pathlib import Path # Added import
 from mpd import MPDClient
 from mpd import ConnectionError as MPDConnectionError
 from mpd import CommandError as MPDCommandError
 
+# Commands sent per command_list_ok_begin/command_list_end round trip
+COMMAND_LIST_CHUNK_SIZE = 500
+# MPD error replies look like "[50@3] {playlistadd} No such song", where 3 is
+# the index of the failing command inside the command list.
+_COMMAND_LIST_ERROR = re.compile(r'^\[\d+@(\d+)\]')
+# Bytes per albumart/readpicture chunk. MPD's default of 8 KiB turns a large
+# embedded cover into hundreds of round trips.
+BINARY_LIMIT = 256 * 1024
+
 class MPDClientController:
     """
     A class to control the Music Player Daemon (MPD) using python-mpd2.
     Includes auto-reconnection logic to prevent crashes after idle periods.
     """
 
-    def __init__(self, host='localhost', port=6600, music_base_path='/home/ubuntu/Music/'):
+    def __init__(self, host='localhost', port=6600, music_base_path='/home/ubuntu/Music/',
+                 command_list_chunk_size=COMMAND_LIST_CHUNK_SIZE, library=None):
         self.host = host
         self.port = port
         self.music_base_path = music_base_path
+        # Optional LibraryIndex; folder listings are read from it instead of the disk.
+        self.library = library
+        self.command_list_chunk_size = command_list_chunk_size
         self.client = MPDClient(use_unicode=True)
         # We track connection state, but we also verify it with ping()
         self.is_connected = False
+        # One MPD socket can only carry one command at a time. The lock lets the
+        # controller be shared between the event loop executor and other threads.
+        self.lock = threading.RLock()
 
     def __enter__(self):
         self.connect()
@@ -32,33 +50,40 @@ class MPDClientController:
         Connects to the MPD server.
         Checks if the connection is actually alive using ping().
         """
-        # 1. If we think we are connected, verify it.
-        if self.is_connected:
+        # Takes the lock so ping() or a reconnect never lands on a socket that
+        # another thread is in the middle of using.
+        with self.lock:
+            # 1. If we think we are connected, verify it.
+            if self.is_connected:
+                try:
+                    self.client.ping()
+                    # If ping succeeds, we are good.
+                    return
+                except (MPDConnectionError, OSError):
+                    print("Connection flag was True, but ping failed. Reconnecting...")
+                    self.is_connected = False
+                    try:
+                        self.client.disconnect()
+                    except:
+                        pass
+
+            # 2. Perform fresh connection
+            print(f"Attempting to connect to MPD at {self.host}:{self.port}...")
             try:
-                self.client.ping()
-                # If ping succeeds, we are good.
-                return
-            except (MPDConnectionError, OSError):
-                print("Connection flag was True, but ping failed. Reconnecting...")
-                self.is_connected = False
+                self.client.connect(self.host, self.port)
+                self.is_connected = True
+                print("Successfully connected to MPD.")
                 try:
-                    self.client.disconnect()
-                except:
-                    pass
-
-        # 2. Perform fresh connection
-        print(f"Attempting to connect to MPD at {self.host}:{self.port}...")
-        try:
-            self.client.connect(self.host, self.port)
-            self.is_connected = True
-            print("Successfully connected to MPD.")
-        except MPDConnectionError as e:
-            print(f"Error: Could not connect to MPD. {e}")
-            self.is_connected = False
-            # We do not raise here to allow the app to start even if MPD is temporarily down
-        except Exception as e:
-            print(f"An unexpected error occurred during connection: {e}")
-            self.is_connected = False
+                    self.client.binarylimit(BINARY_LIMIT)
+                except MPDCommandError:
+                    pass # MPD older than 0.22.4
+            except MPDConnectionError as e:
+                print(f"Error: Could not connect to MPD. {e}")
+                self.is_connected = False
+                # We do not raise here to allow the app to start even if MPD is temporarily down
+            except Exception as e:
+                print(f"An unexpected error occurred during connection: {e}")
+                self.is_connected = False
 
     def disconnect(self):
         """Disconnects from the MPD server."""
@@ -75,21 +100,56 @@ class MPDClientController:
         """
         Wraps MPD commands to handle disconnection/reconnection automatically.
         """
-        try:
-            if not self.is_connected:
-                self.connect()
-            return func(*args, **kwargs)
-        except (MPDConnectionError, OSError, ConnectionRefusedError):
-            print("Connection lost during command. Attempting to reconnect...")
-            self.is_connected = False
+        with self.lock:
             try:
-                self.connect()
+                if not self.is_connected:
+                    self.connect()
                 return func(*args, **kwargs)
-            except Exception as e:
-                print(f"Reconnection failed: {e}")
-                # We return None or empty structures based on context usually, 
-                # but raising allows the API to send a 500 error if really needed.
-                raise e
+            except (MPDConnectionError, OSError, ConnectionRefusedError):
+                print("Connection lost during command. Attempting to reconnect...")
+                self.is_connected = False
+                try:
+                    self.connect()
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    print(f"Reconnection failed: {e}")
+                    # We return None or empty structures based on context usually, 
+                    # but raising allows the API to send a 500 error if really needed.
+                    raise e
+
+    def _execute_command_list(self, command, args_list, chunk_size=None):
+        """
+        Sends `command` once for every argument tuple in args_list, batched in
+        command lists of `chunk_size` commands per round trip.
+
+        MPD aborts a command list at the first failing command, so the failure
+        is recorded and the rest of that chunk is sent again.
+        Returns a list of {"uri", "error"} for the commands MPD rejected.
+        """
+        chunk_size = chunk_size or self.command_list_chunk_size
+        failures = []
+        start = 0
+        with self.lock:
+            while start < len(args_list):
+                chunk = args_list[start:start + chunk_size]
+                try:
+                    self._execute_safe(self._send_command_list, command, chunk)
+                    start += len(chunk)
+                except MPDCommandError as e:
+                    match = _COMMAND_LIST_ERROR.match(str(e))
+                    index = int(match.group(1)) if match else None
+                    if index is None or index >= len(chunk):
+                        raise
+                    failures.append({"uri": chunk[index][-1], "error": str(e)})
+                    start += index + 1
+        return failures
+
+    def _send_command_list(self, command, chunk):
+        func = getattr(self.client, command)
+        self.client.command_list_ok_begin()
+        for args in chunk:
+            func(*args)
+        return self.client.command_list_end()
 
     # --- Status & Playback ---
 
@@ -121,6 +181,11 @@ class MPDClientController:
         except Exception as e:
             print(f"Error: {e}")
 
+    def playid(self, songid):
+        # Raises so the API can report an unknown song id.
+        self._execute_safe(self.client.playid, songid)
+        print(f"Playing song with id {songid}.")
+
     def pause(self):
         try:
             self._execute_safe(self.client.pause)
@@ -128,6 +193,13 @@ class MPDClientController:
         except Exception as e:
             print(f"Error: {e}")
 
+    def set_pause(self, paused=True):
+        # Unlike pause(), which toggles, this leaves a paused player paused
+        try:
+            self._execute_safe(self.client.pause, 1 if paused else 0)
+        except Exception as e:
+            print(f"Error: {e}")
+
     def stop(self):
         try:
             self._execute_safe(self.client.stop)
@@ -211,6 +283,14 @@ class MPDClientController:
             print(f"Seeking to {time}s in current song.")
         except Exception as e: print(f"Error: {e}")
 
+    def idle(self, *subsystems):
+        """
+        Blocks until one of the given MPD subsystems changes and returns the
+        list of changed subsystem names. Only use this on a dedicated
+        connection, since the socket is unusable while waiting.
+        """
+        return self._execute_safe(self.client.idle, *subsystems)
+
     def get_current_song_duration(self):
         """Gets the total duration of the currently playing song."""
         try:
@@ -237,11 +317,13 @@ class MPDClientController:
 
     def queue_load_radiostreams(self, streams_dict):
         try:
-            if not self.is_connected: self.connect()
-            self.client.clear()
-            for url in streams_dict.values():
-                self.client.add(url)
-            print(f"Loaded {len(streams_dict)} radio streams.")
+            with self.lock:
+                self._execute_safe(self.client.clear)
+                failures = self._execute_command_list("add", [(url,) for url in streams_dict.values()])
+            for failure in failures:
+                print(f"Error adding stream {failure['uri']}: {failure['error']}")
+            print(f"Loaded {len(streams_dict) - len(failures)} radio streams.")
+            return failures
         except (MPDConnectionError, OSError):
             self.is_connected = False
             self.connect()
@@ -301,6 +383,23 @@ class MPDClientController:
             print(f"Error: {e}")
             return None
 
+    def get_picture(self, uri):
+        """
+        Cover art bytes for a song: the embedded picture (readpicture), else
+        the cover file in its folder (albumart). None when there is neither.
+        """
+        for command in (self.client.readpicture, self.client.albumart):
+            try:
+                result = self._execute_safe(command, uri)
+            except MPDCommandError:
+                continue
+            except Exception as e:
+                print(f"Error: {e}")
+                return None
+            if result and result.get("binary"):
+                return result["binary"]
+        return None
+
     def queue_get_songs(self):
         try:
             return self._execute_safe(self.client.playlistinfo)
@@ -308,6 +407,14 @@ class MPDClientController:
             print(f"Error: {e}")
             return []
 
+    def queue_get_changes(self, version):
+        """Returns the queue entries changed since playlist version `version` (plchanges)."""
+        try:
+            return self._execute_safe(self.client.plchanges, version)
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
     def queue_get_songsid(self):
         try:
             return self._execute_safe(self.client.playlistid)
@@ -373,6 +480,25 @@ class MPDClientController:
             print(f"Error: {e}")
             return []
 
+    def supports_ranges(self):
+        """True if MPD accepts START:END windows on listplaylist/listplaylistinfo (0.24+)."""
+        with self.lock:
+            if not self.is_connected:
+                self.connect()
+            version = self.client.mpd_version or "0"
+        try:
+            return tuple(int(part) for part in version.split(".")[:2]) >= (0, 24)
+        except ValueError:
+            return False
+
+    def playlist_songsinfo_window(self, pi_plname, start, end):
+        """Entries start..end-1 of a stored playlist, read by MPD without sending the rest."""
+        try:
+            return self._execute_safe(self.client.listplaylistinfo, pi_plname, (start, end))
+        except Exception as e:
+            print(f"Error: {e}")
+            return []
+
 
     def playlist_deletesong(self, pi_plname, songpos):
         try:
@@ -403,7 +529,8 @@ class MPDClientController:
                 print(f"Playlist '{pi_plname}' does not exist. It will be created.")
 
             # Get current songs in the playlist to check for duplicates
-            current_playlist_songs = self._execute_safe(self.client.listplaylist, pi_plname)
+            # (listplaylist fails with "No such playlist" for a new one)
+            current_playlist_songs = self._execute_safe(self.client.listplaylist, pi_plname) if playlist_exists else []
             
             # Check if the song URI is already in the playlist
             if uri in current_playlist_songs:
@@ -425,11 +552,13 @@ class MPDClientController:
                 message = f"No music files found in folder '{foldername}'."
                 print(message)
                 return {"message": message}
-            for file_path_mpd in files:
-                self._execute_safe(self.client.playlistadd, pi_plname, file_path_mpd)
-            message = f"Added all files from '{foldername}' to playlist '{pi_plname}'."
+            failures = self._execute_command_list("playlistadd", [(pi_plname, f) for f in files])
+            if failures:
+                message = f"Added {len(files) - len(failures)} of {len(files)} files from '{foldername}' to playlist '{pi_plname}'."
+            else:
+                message = f"Added all files from '{foldername}' to playlist '{pi_plname}'."
             print(message)
-            return {"message": message}
+            return {"message": message, "added": len(files) - len(failures), "failed": failures}
         except Exception as e:
             error_message = f"Error adding folder to playlist: {e}"
             print(error_message)
@@ -456,20 +585,35 @@ class MPDClientController:
         """
         Creates a new playlist from a list of selected songs.
         If the playlist already exists, it will be overwritten.
-        """
-        try:
-            # Check if a playlist with the same name exists and remove it.
-            playlists = self._execute_safe(self.client.listplaylists)
-            if any(p['playlist'] == playlist_name for p in playlists):
-                self._execute_safe(self.client.rm, playlist_name)
-                print(f"Removed existing playlist '{playlist_name}'.")
 
-            # Add each song to the new playlist.
-            for song_uri in songs:
-                self._execute_safe(self.client.playlistadd, playlist_name, song_uri)
-            
-            print(f"Successfully created playlist '{playlist_name}' with {len(songs)} songs.")
-            return {"message": f"Playlist '{playlist_name}' created successfully."}
+        The songs are written to a temporary playlist first which then replaces
+        the old one, so a failed save never leaves a half-written playlist.
+        """
+        temp_name = f".{playlist_name}.saving"
+        try:
+            with self.lock:
+                playlists = {p['playlist'] for p in self._execute_safe(self.client.listplaylists)}
+                if temp_name in playlists:
+                    self._execute_safe(self.client.rm, temp_name)
+
+                failures = self._execute_command_list("playlistadd", [(temp_name, uri) for uri in songs])
+                added = len(songs) - len(failures)
+                if songs and not added:
+                    # Nothing was written, keep the existing playlist as it is.
+                    print(f"No songs could be added to playlist '{playlist_name}'.")
+                    return {"message": f"No songs could be saved to playlist '{playlist_name}'.",
+                            "added": 0, "failed": failures}
+
+                # Check if a playlist with the same name exists and remove it.
+                if playlist_name in playlists:
+                    self._execute_safe(self.client.rm, playlist_name)
+                    print(f"Removed existing playlist '{playlist_name}'.")
+                if added:
+                    self._execute_safe(self.client.rename, temp_name, playlist_name)
+
+            print(f"Successfully created playlist '{playlist_name}' with {added} songs.")
+            return {"message": f"Playlist '{playlist_name}' created successfully.",
+                    "added": added, "failed": failures}
 
         except MPDCommandError as e:
             error_message = f"MPD command error while saving selection to playlist: {e}"
@@ -498,7 +642,10 @@ class MPDClientController:
         Scans a directory for music files and returns their paths relative to the MPD music root.
         """
         music_extensions = ['.mp3', '.flac', '.ogg', '.wav', '.aac']
-        
+
+        if self.library is not None:
+            return self.library.files_under(foldername, music_extensions)
+
         full_folder_path = os.path.join(self.music_base_path, foldername)
 
         if not os.path.isdir(full_folder_path):
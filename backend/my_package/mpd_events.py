@@ -0,0 +1,129 @@
+# my_package/mpd_events.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .mpd_controller import MPDClientController
+
+# Subsystems pushed to clients. Everything else MPD reports is ignored.
+IDLE_SUBSYSTEMS = ("player", "mixer", "playlist", "options", "stored_playlist")
+RECONNECT_DELAY = 5
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+class MPDEventBroadcaster:
+    """
+    Waits in MPD's `idle` command on a dedicated connection and fans out the
+    changed state to every subscriber, so clients are told about changes
+    instead of polling for them.
+
+    Only the subsystems that changed are re-read (through the shared
+    connection pool), and nothing is read at all while nobody is listening.
+    Listeners added with add_listener() are only told the names of the
+    changed subsystems, so they do not count as listening.
+    """
+
+    def __init__(self, pool, queue_cache, host='localhost', port=6600, music_base_path='/home/ubuntu/Music/'):
+        self.pool = pool
+        self.queue_cache = queue_cache
+        # Playlist version of the last queue diff sent to subscribers
+        self._queue_version = None
+        self.controller = MPDClientController(host=host, port=port, music_base_path=music_base_path)
+        # idle blocks its thread until MPD reports a change, so it gets its own.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mpd-idle")
+        self._subscribers = set()
+        self._listeners = set()
+        self._task = None
+        self._stopping = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        # Closing the socket wakes up the thread blocked in idle.
+        self.controller.disconnect()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def add_listener(self, callback):
+        """callback(changed) runs on the event loop for every change MPD reports; it must not block."""
+        self._listeners.add(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.discard(callback)
+
+    async def snapshot(self):
+        """Full state for a newly connected client."""
+        event = await self._build_event([s for s in IDLE_SUBSYSTEMS if s != "playlist"])
+        event["changed"] = list(IDLE_SUBSYSTEMS)
+        event["queue_version"], event["queue"] = await self.queue_cache.get_songs()
+        return event
+
+    async def _build_event(self, changed):
+        event = {"changed": changed}
+        if {"player", "mixer", "options"} & set(changed):
+            event["status"] = await self.pool.run("get_status")
+        if "player" in changed:
+            event["currentsong"] = await self.pool.run("queue_current_song")
+        if "playlist" in changed:
+            # Only the entries that changed, see QueueCache.get_changes
+            if self._queue_version is None:
+                self._queue_version, event["queue"] = await self.queue_cache.get_songs()
+                event["queue_version"] = self._queue_version
+            else:
+                diff = await self.queue_cache.get_changes(self._queue_version)
+                # Lets a client that missed an event notice the gap and reload
+                event["queue_since"] = self._queue_version
+                event["queue_changes"] = diff
+                self._queue_version = diff["version"]
+        if "stored_playlist" in changed:
+            event["playlists"] = await self.pool.run("get_playlist_List")
+        return event
+
+    def _publish(self, event):
+        for queue in self._subscribers:
+            if queue.full():
+                # A slow client only needs the latest state, drop its oldest event.
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                changed = await loop.run_in_executor(self._executor, self.controller.idle, *IDLE_SUBSYSTEMS)
+            except Exception as e:
+                if self._stopping:
+                    break
+                print(f"MPD idle connection lost: {e}. Retrying in {RECONNECT_DELAY}s...")
+                self.controller.is_connected = False
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            for listener in list(self._listeners):
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"Error in MPD change listener: {e}")
+            if not changed or not self._subscribers:
+                continue
+            try:
+                self._publish(await self._build_event(changed))
+            except Exception as e:
+                print(f"Error building MPD event for {changed}: {e}")
@@ -0,0 +1,73 @@
+# my_package/mpd_pool.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from .mpd_controller import MPDClientController
+
+
+class MPDConnectionPool:
+    """
+    A bounded pool of MPDClientController connections for use from async code.
+
+    python-mpd2 is blocking, so every command is run on a small thread pool
+    instead of on the event loop. Each controller owns its own socket and lock,
+    which lets concurrent requests talk to MPD in parallel rather than queueing
+    behind one shared connection.
+    """
+
+    def __init__(self, host='localhost', port=6600, music_base_path='/home/ubuntu/Music/', size=4, library=None):
+        self.size = max(1, size)
+        self.controllers = [
+            MPDClientController(host=host, port=port, music_base_path=music_base_path, library=library)
+            for _ in range(self.size)
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="mpd")
+        self._idle = asyncio.Queue()
+        for controller in self.controllers:
+            self._idle.put_nowait(controller)
+
+    @property
+    def is_connected(self):
+        return any(controller.is_connected for controller in self.controllers)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Checks out one controller for exclusive use by the caller."""
+        controller = await self._idle.get()
+        try:
+            yield controller
+        finally:
+            self._idle.put_nowait(controller)
+
+    async def run(self, method, *args, **kwargs):
+        """
+        Runs a MPDClientController method by name on a free connection.
+        e.g. status = await pool.run("get_status")
+        """
+        async with self.acquire() as controller:
+            func = getattr(controller, method)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def batch(self, func, *args):
+        """
+        Runs func(controller, *args) on a single connection, for multi-step
+        operations that must not interleave with other commands.
+        """
+        async with self.acquire() as controller:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: func(controller, *args))
+
+    async def connect(self):
+        """Connects every controller in parallel."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, controller.connect)
+            for controller in self.controllers
+        ))
+
+    def disconnect(self):
+        for controller in self.controllers:
+            controller.disconnect()
+        self._executor.shutdown(wait=False, cancel_futures=True)
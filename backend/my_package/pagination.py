@@ -0,0 +1,90 @@
+# my_package/pagination.py
+import base64
+import json
+from bisect import bisect_right
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Lines serialized per chunk written to a streamed response
+NDJSON_CHUNK_SIZE = 500
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value, ensure_ascii=False).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def cursor_offset(cursor):
+    """The offset in an offset cursor, 0 without a cursor; 400 for anything else."""
+    if not cursor:
+        return 0
+    position = decode_cursor(cursor)
+    # bool is an int subclass, but never an offset
+    if isinstance(position, int) and not isinstance(position, bool) and position >= 0:
+        return position
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page(items, limit=None, cursor=None, sorted_keys=False):
+    """
+    Returns the part of `items` after `cursor`, at most `limit` entries, and
+    the cursor of the next page (None on the last page).
+
+    With sorted_keys the items are a sorted list of unique strings (library
+    paths) and the cursor is the last item returned, so pages stay stable
+    when files are added in between. Otherwise the cursor is an offset.
+    """
+    if not sorted_keys:
+        start = cursor_offset(cursor)
+    elif cursor:
+        position = decode_cursor(cursor)
+        # e.g. an offset cursor from another endpoint; comparing it to paths would fail
+        if not isinstance(position, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        start = bisect_right(items, position)
+    else:
+        start = 0
+    end = len(items) if limit is None else start + limit
+    selected = items[start:end]
+
+    next_cursor = None
+    if end < len(items) and selected:
+        next_cursor = encode_cursor(selected[-1] if sorted_keys else end)
+    return selected, next_cursor
+
+
+def ndjson_lines(items):
+    for start in range(0, len(items), NDJSON_CHUNK_SIZE):
+        chunk = items[start:start + NDJSON_CHUNK_SIZE]
+        yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in chunk)
+
+
+def list_response(items, limit=None, cursor=None, stream=False, sorted_keys=False):
+    """
+    Shared response for the large listing endpoints:
+    - no limit, cursor or stream: the plain JSON list, as before
+    - limit/cursor: {"items": [...], "next_cursor": "..."}
+    - stream: one JSON value per line (NDJSON), produced while it is sent
+    """
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    if limit is None and cursor is None and not stream:
+        return items
+
+    selected, next_cursor = page(items, limit, cursor, sorted_keys)
+    return page_response(selected, next_cursor, stream)
+
+
+def page_response(selected, next_cursor, stream=False):
+    """A page that was already cut, in the shape list_response uses."""
+    if stream:
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return StreamingResponse(ndjson_lines(selected), media_type="application/x-ndjson", headers=headers)
+    return {"items": selected, "next_cursor": next_cursor}
@@ -0,0 +1,105 @@
+# my_package/playlist_store.py
+import json
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import UserPlaylist, PlaylistItem
+
+
+def migrate_playlist_blobs(db: Session):
+    """
+    Moves playlists still stored as a JSON blob in UserPlaylist.playlist_data
+    into playlist_items rows. Safe to run on every startup.
+    """
+    migrated = 0
+    for playlist in db.query(UserPlaylist).filter(UserPlaylist.playlist_data.isnot(None)):
+        has_items = db.query(PlaylistItem.id).filter(PlaylistItem.playlist_id == playlist.id).first()
+        if not has_items:
+            try:
+                paths = json.loads(playlist.playlist_data) or []
+            except ValueError:
+                print(f"Skipping unreadable playlist data for '{playlist.playlist_name}'")
+                paths = []
+            _insert_items(db, playlist.id, paths, 0)
+        playlist.playlist_data = None
+        migrated += 1
+    db.commit()
+    if migrated:
+        print(f"Migrated {migrated} playlists to playlist_items.")
+
+
+def get_playlist(db: Session, user_id: int, name: str):
+    return db.query(UserPlaylist).filter(
+        UserPlaylist.user_id == user_id,
+        UserPlaylist.playlist_name == name
+    ).first()
+
+
+def get_or_create_playlist(db: Session, user_id: int, name: str):
+    playlist = get_playlist(db, user_id, name)
+    if playlist is None:
+        playlist = UserPlaylist(user_id=user_id, playlist_name=name)
+        db.add(playlist)
+        db.flush()
+    return playlist
+
+
+def get_paths(db: Session, playlist_id: int):
+    rows = db.query(PlaylistItem.path).filter(
+        PlaylistItem.playlist_id == playlist_id
+    ).order_by(PlaylistItem.position, PlaylistItem.id)
+    return [path for (path,) in rows]
+
+
+def replace_items(db: Session, playlist_id: int, paths):
+    db.query(PlaylistItem).filter(PlaylistItem.playlist_id == playlist_id).delete(synchronize_session=False)
+    _insert_items(db, playlist_id, paths, 0)
+
+
+def append_item(db: Session, playlist_id: int, path: str):
+    last = db.query(func.max(PlaylistItem.position)).filter(PlaylistItem.playlist_id == playlist_id).scalar()
+    db.add(PlaylistItem(playlist_id=playlist_id, position=0 if last is None else last + 1, path=path))
+
+
+def remove_item(db: Session, playlist_id: int, path=None, position=None):
+    """Removes the first entry for `path`, or the entry at index `position`. Returns False if none matched."""
+    query = db.query(PlaylistItem).filter(PlaylistItem.playlist_id == playlist_id)
+    if path is not None:
+        item = query.filter(PlaylistItem.path == path).order_by(PlaylistItem.position).first()
+    else:
+        item = query.order_by(PlaylistItem.position, PlaylistItem.id).offset(position).first()
+    if item is None:
+        return False
+    db.delete(item)
+    return True
+
+
+def move_item(db: Session, playlist_id: int, from_position: int, to_position: int):
+    """
+    Moves one entry. Only the entries between the two indexes are updated:
+    they are reordered but keep the same set of position values.
+    """
+    low, high = sorted((from_position, to_position))
+    if low < 0:
+        return False
+    items = db.query(PlaylistItem).filter(
+        PlaylistItem.playlist_id == playlist_id
+    ).order_by(PlaylistItem.position, PlaylistItem.id).offset(low).limit(high - low + 1).all()
+    if len(items) != high - low + 1:
+        return False
+    positions = [item.position for item in items]
+    if from_position < to_position:
+        items = items[1:] + items[:1]
+    else:
+        items = items[-1:] + items[:-1]
+    for item, position in zip(items, positions):
+        item.position = position
+    return True
+
+
+def _insert_items(db: Session, playlist_id: int, paths, start):
+    db.bulk_insert_mappings(PlaylistItem, [
+        {"playlist_id": playlist_id, "position": start + index, "path": path}
+        for index, path in enumerate(paths)
+    ])
@@ -0,0 +1,190 @@
+# my_package/podcast_downloader.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+# Episodes downloaded at the same time, across all feeds
+DOWNLOAD_WORKERS = int(os.environ.get("PODCAST_DOWNLOAD_WORKERS", "4"))
+# Bytes read from the socket per iteration, and buffered before each disk write
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+# Attempts per episode; each retry resumes from the end of the .part file
+DOWNLOAD_ATTEMPTS = 3
+PART_SUFFIX = ".part"
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: str
+    title: Optional[str] = None
+    status: str = "pending" # downloaded, skipped, failed or cancelled
+    bytes_received: int = 0
+    resumed_from: int = 0
+    size: Optional[int] = None
+    elapsed: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def throughput(self):
+        """Bytes per second received during this run."""
+        return self.bytes_received / self.elapsed if self.elapsed > 0 else 0.0
+
+    def describe(self):
+        name = self.title or os.path.basename(self.path)
+        if self.status == "skipped":
+            return f"⏩ Skipping: '{name}' (Already exists)"
+        if self.status == "failed":
+            return f"❌ Failed: '{name}': {self.error}"
+        if self.status == "cancelled":
+            return f"⏹️ Cancelled: '{name}'"
+        resumed = f", resumed at {self.resumed_from / 1e6:.1f} MB" if self.resumed_from else ""
+        return (f"✅ Downloaded: '{name}' {self.bytes_received / 1e6:.1f} MB in {self.elapsed:.1f}s "
+                f"({self.throughput / 1e6:.2f} MB/s{resumed})")
+
+
+class PodcastDownloader:
+    """
+    Downloads episodes on a bounded pool of worker threads.
+
+    Data is written to '<file>.part' and renamed into place only once the
+    size matches Content-Length, so an interrupted download never looks
+    finished. The next attempt, or the next run, resumes the .part file with
+    an HTTP Range request.
+
+    Setting cancel_event stops the downloads in progress after their current
+    chunk, keeping the .part files, and skips the ones still queued.
+    """
+
+    def __init__(self, workers=DOWNLOAD_WORKERS, headers=None, timeout=DOWNLOAD_TIMEOUT,
+                 chunk_size=DOWNLOAD_CHUNK_SIZE, attempts=DOWNLOAD_ATTEMPTS, cancel_event=None):
+        self.headers = dict(headers or {})
+        self.cancel_event = cancel_event
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.attempts = max(1, attempts)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="podcastdl")
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def submit(self, url, path, title=None, on_start=None):
+        """Queues one download. Returns a Future resolving to a DownloadResult."""
+        return self._executor.submit(self.download, url, path, title, on_start)
+
+    def download(self, url, path, title=None, on_start=None):
+        """
+        Downloads url to path in the calling thread. on_start() is called
+        once a worker picks the download up, unless the file already exists.
+        """
+        result = DownloadResult(url=url, path=path, title=title)
+        if os.path.exists(path):
+            result.status = "skipped"
+            return result
+        if self._cancelled():
+            result.status = "cancelled"
+            return result
+        if on_start is not None:
+            on_start()
+
+        part_path = path + PART_SUFFIX
+        start = time.monotonic()
+        if os.path.exists(part_path):
+            result.resumed_from = os.path.getsize(part_path)
+        while result.attempts < self.attempts:
+            result.attempts += 1
+            try:
+                self._fetch(url, part_path, result)
+                os.replace(part_path, path)
+                result.status = "downloaded"
+                result.error = None
+                break
+            except DownloadCancelled:
+                result.status = "cancelled"
+                break
+            except (requests.RequestException, IncompleteDownload, OSError) as e:
+                result.status = "failed"
+                result.error = str(e)
+        result.elapsed = time.monotonic() - start
+        return result
+
+    def _cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def _session(self):
+        # requests.Session is not safe to share between threads
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _fetch(self, url, part_path, result):
+        """Writes the rest of the file to part_path."""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self._session().get(url, stream=True, headers=headers, timeout=self.timeout) as r:
+            if r.status_code == 416 and offset:
+                # Nothing left past offset: the .part file may already be complete
+                total = _content_range_total(r.headers.get("Content-Range"))
+                if total == offset:
+                    result.size = total
+                    return
+                os.remove(part_path)
+                raise IncompleteDownload(f"server rejected resume at byte {offset}")
+            r.raise_for_status()
+
+            if r.status_code == 206 and offset:
+                mode = "ab"
+                result.size = _content_range_total(r.headers.get("Content-Range"))
+            else:
+                # A fresh download, or the server ignored the Range header
+                mode = "wb"
+                length = r.headers.get("Content-Length")
+                result.size = int(length) if length and length.isdigit() else None
+
+            with open(part_path, mode, buffering=WRITE_BUFFER_SIZE) as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    if self._cancelled():
+                        raise DownloadCancelled()
+                    f.write(chunk)
+                    result.bytes_received += len(chunk)
+
+        size = os.path.getsize(part_path)
+        if result.size is not None and size != result.size:
+            if size > result.size:
+                os.remove(part_path)
+            raise IncompleteDownload(f"got {size} of {result.size} bytes")
+
+
+def _content_range_total(value):
+    """Total size from a 'bytes 0-99/1234' or 'bytes */1234' header."""
+    if value and "/" in value:
+        total = value.rsplit("/", 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    return None
@@ -1,5 +1,17 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Optional
+
 import feedparser
-from typing import List, Dict
+import httpx
+from cachetools import LRUCache
+
+# Seconds a fetched feed is served without asking the server again
+FEED_CACHE_TTL = 1800
+# Number of feeds kept in memory, along with their ETag / Last-Modified
+FEED_CACHE_SIZE = 100
+FEED_FETCH_TIMEOUT = 20
 
 def parse_rss_feed(feed_url: str, limit: int = None) -> Dict:
     """
@@ -12,7 +24,11 @@ def parse_rss_feed(feed_url: str, limit: int = None) -> Dict:
     Returns:
         A dictionary containing feed information and a list of episodes.
     """
-    feed = feedparser.parse(feed_url)
+    return build_feed_data(feedparser.parse(feed_url), limit=limit)
+
+
+def build_feed_data(feed, limit: int = None) -> Dict:
+    """Converts a feedparser result into feed information and a list of episodes."""
 
     # Extract feed-level information
     feed_info = {
@@ -55,3 +71,90 @@ def parse_rss_feed(feed_url: str, limit: int = None) -> Dict:
 
     return {"feed_info": feed_info, "episodes": episodes}
 
+
+@dataclass
+class _CachedFeed:
+    data: Dict
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class PodcastFeedService:
+    """
+    Fetches podcast feeds without blocking the event loop.
+
+    Each feed is parsed once and cached by URL; `limit` is applied to the
+    cached copy. After FEED_CACHE_TTL the feed is fetched again with
+    If-None-Match / If-Modified-Since, and a 304 reuses the parsed copy.
+    Concurrent requests for the same feed share a single fetch.
+    """
+
+    def __init__(self, ttl=FEED_CACHE_TTL, maxsize=FEED_CACHE_SIZE, timeout=FEED_FETCH_TIMEOUT):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._cache = LRUCache(maxsize=maxsize)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._client = None
+
+    async def get_feed(self, feed_url: str, limit: int = None) -> Dict:
+        cached = self._cache.get(feed_url)
+        if cached is None or time.monotonic() - cached.fetched_at >= self.ttl:
+            cached = await self._refresh(feed_url)
+        data = cached.data
+        if limit is None:
+            return data
+        return {"feed_info": data["feed_info"], "episodes": data["episodes"][:limit]}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh(self, feed_url):
+        task = self._inflight.get(feed_url)
+        if task is None:
+            task = asyncio.create_task(self._fetch(feed_url))
+            self._inflight[feed_url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(feed_url, None))
+        # shield() keeps one cancelled request from cancelling the fetch others wait on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, feed_url):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True)
+
+        cached = self._cache.get(feed_url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            response = await self._client.get(feed_url, headers=headers)
+            if response.status_code == 304 and cached is not None:
+                cached.fetched_at = time.monotonic()
+                return cached
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            if cached is None:
+                raise
+            # Keep serving the last good copy while the server is unreachable
+            print(f"Error refreshing feed '{feed_url}', serving cached copy: {e}")
+            cached.fetched_at = time.monotonic()
+            return cached
+
+        # Content-Location gives relative links and guids the same base URL
+        # feedparser would use when fetching the feed itself
+        response_headers = dict(response.headers, **{"content-location": str(response.url)})
+        feed = await asyncio.to_thread(feedparser.parse, response.content, response_headers=response_headers)
+        entry = _CachedFeed(
+            data=build_feed_data(feed),
+            fetched_at=time.monotonic(),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        self._cache[feed_url] = entry
+        return entry
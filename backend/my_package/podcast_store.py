@@ -0,0 +1,104 @@
+# my_package/podcast_store.py
+import os
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import PodcastEpisode
+from .podcast_downloader import PART_SUFFIX
+
+# Episodes that still need a download attempt. "downloading" rows are left
+# behind by a run that was killed, and are picked up again.
+OUTSTANDING_STATUSES = ("pending", "downloading", "failed")
+
+
+def known_guids(db: Session, feed_url: str):
+    rows = db.query(PodcastEpisode.guid).filter(PodcastEpisode.feed_url == feed_url)
+    return {guid for (guid,) in rows}
+
+
+def has_episodes(db: Session, feed_url: str):
+    return db.query(PodcastEpisode.id).filter(PodcastEpisode.feed_url == feed_url).first() is not None
+
+
+def add_episodes(db: Session, episodes):
+    """Inserts new episodes, given as dicts of PodcastEpisode columns."""
+    now = datetime.now()
+    db.bulk_insert_mappings(PodcastEpisode, [dict(episode, updated_at=now) for episode in episodes])
+    db.commit()
+
+
+def outstanding(db: Session, feed_url: str, since: datetime):
+    """Episodes of a feed published after `since` that are not downloaded yet."""
+    return db.query(PodcastEpisode).filter(
+        PodcastEpisode.feed_url == feed_url,
+        PodcastEpisode.status.in_(OUTSTANDING_STATUSES),
+        PodcastEpisode.pub_date >= since
+    ).order_by(PodcastEpisode.pub_date.desc()).all()
+
+
+def set_status(db: Session, episode_id: int, status: str, size=None, error=None):
+    values = {"status": status, "error": error, "updated_at": datetime.now()}
+    if size is not None:
+        values["size"] = size
+    db.query(PodcastEpisode).filter(PodcastEpisode.id == episode_id).update(values)
+    db.commit()
+
+
+def remove_expired(db: Session, cutoff: datetime):
+    """Deletes the files of downloaded episodes published before `cutoff`. Returns the removed episodes."""
+    expired = db.query(PodcastEpisode).filter(
+        PodcastEpisode.status == "downloaded",
+        PodcastEpisode.pub_date < cutoff
+    ).all()
+    now = datetime.now()
+    removed = []
+    for episode in expired:
+        try:
+            os.remove(episode.local_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing file {episode.local_path}: {e}")
+            continue
+        episode.status = "removed"
+        episode.updated_at = now
+        removed.append(episode)
+    db.commit()
+    return removed
+
+
+def downloaded_guids(db: Session, feed_url: str):
+    rows = db.query(PodcastEpisode.guid).filter(
+        PodcastEpisode.feed_url == feed_url,
+        PodcastEpisode.status == "downloaded"
+    )
+    return {guid for (guid,) in rows}
+
+
+def progress(db: Session, since: datetime = None):
+    """
+    Episode counts by status, limited to rows changed after `since`, and the
+    episodes being downloaded right now.
+    """
+    query = db.query(PodcastEpisode.status, func.count(PodcastEpisode.id))
+    if since is not None:
+        query = query.filter(PodcastEpisode.updated_at >= since)
+    counts = dict(query.group_by(PodcastEpisode.status).all())
+
+    active = db.query(PodcastEpisode).filter(PodcastEpisode.status == "downloading").all()
+    return {
+        "counts": counts,
+        "downloading": [
+            {"feed": episode.feed, "title": episode.title, "received": _part_size(episode.local_path)}
+            for episode in active
+        ],
+    }
+
+
+def _part_size(local_path):
+    try:
+        return os.path.getsize(local_path + PART_SUFFIX)
+    except (OSError, TypeError):
+        return None
@@ -0,0 +1,91 @@
+# my_package/queue_cache.py
+import asyncio
+
+
+class QueueCache:
+    """
+    A server-side copy of the MPD queue, keyed by MPD's playlist version.
+
+    MPD bumps the `playlist` number in `status` on every queue change, and
+    `plchanges` returns only the entries that changed since a given version.
+    The cache uses both to stay current without re-reading `playlistinfo`,
+    and to answer clients that already hold an older copy with a diff.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.version = None
+        self.songs = []
+        self._lock = asyncio.Lock()
+
+    async def get_songs(self):
+        """Returns (version, full queue)."""
+        async with self._lock:
+            return await self.pool.batch(self._query, None)
+
+    async def get_changes(self, since_version):
+        """
+        Returns the entries changed since `since_version` together with the
+        current version and queue length, e.g.
+        {"version": 12, "length": 3, "changes": [{"pos": "2", ...}]}
+        A client applies it by replacing entries at each `pos` and then
+        truncating its copy to `length`.
+        """
+        async with self._lock:
+            return await self.pool.batch(self._query, since_version)
+
+    def _query(self, player, since_version):
+        # Runs in the pool executor; the asyncio lock keeps it single-threaded.
+        with player.lock:
+            status = player.get_status()
+            if status is None:
+                raise ConnectionError("MPD is not connected or unavailable")
+            version = int(status.get('playlist', 0))
+            length = int(status.get('playlistlength', 0))
+
+            previous_version = self.version
+            cache_diff = self._refresh(player, version, length)
+
+            if since_version is None:
+                return version, list(self.songs)
+            if since_version == version:
+                changes = []
+            elif since_version == previous_version and cache_diff is not None:
+                changes = cache_diff
+            elif since_version > version:
+                # MPD was restarted and its version counter reset
+                changes = list(self.songs)
+            else:
+                changes = player.queue_get_changes(since_version)
+                if changes is None:
+                    changes = list(self.songs)
+            return {"version": version, "length": length, "changes": changes}
+
+    def _refresh(self, player, version, length):
+        """Brings the cache up to `version`. Returns the applied diff, or None after a full reload."""
+        if self.version == version and len(self.songs) == length:
+            return []
+        if self.version is not None and self.version < version:
+            changes = player.queue_get_changes(self.version)
+            if changes is not None and self._apply(changes, length):
+                self.version = version
+                return changes
+        # First use, MPD restart or an inconsistent diff: reload everything.
+        self.songs = list(player.queue_get_songs())
+        self.version = version
+        return None
+
+    def _apply(self, changes, length):
+        songs = self.songs[:length]
+        for song in changes:
+            pos = int(song['pos'])
+            if pos < len(songs):
+                songs[pos] = song
+            elif pos == len(songs):
+                songs.append(song)
+            else:
+                return False
+        if len(songs) != length:
+            return False
+        self.songs = songs
+        return True
@@ -0,0 +1,169 @@
+# my_package/scheduler.py
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .models import Schedule
+
+DEFAULT_PLAYLIST = "定期播放"
+# Longest single wait. Waking up at least this often re-reads the wall clock,
+# so a clock set by NTP after the Pi boots does not make a schedule fire late.
+MAX_SLEEP_SECONDS = 30
+
+
+def parse_days(days):
+    """'1,3,5' -> {1, 3, 5}; None or '' -> None (every day)."""
+    if not days:
+        return None
+    return {int(day) for day in days.split(',')}
+
+
+def format_days(day_of_week):
+    """[5, 1, 3] -> '1,3,5'. An empty list or all seven days -> None (every day)."""
+    if not day_of_week or len(set(day_of_week)) == 7:
+        return None
+    return ','.join(map(str, sorted(set(day_of_week))))
+
+
+def next_run_time(hour, minute, days, after):
+    """The first time after `after` at hour:minute on one of `days` (crontab numbering, 0 = Sunday)."""
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= after:
+        candidate += timedelta(days=1)
+    for _ in range(7):
+        # datetime.weekday() has Monday = 0, crontab has Sunday = 0
+        if days is None or (candidate.weekday() + 1) % 7 in days:
+            return candidate
+        candidate += timedelta(days=1)
+    return None
+
+
+def start_playback(controller, playlist, volume, fade_in):
+    """
+    Replaces the queue with a stored playlist and plays it, on one pooled
+    connection. Returns the volume to fade in to, or None.
+    """
+    status = controller.get_status() or {}
+    target = volume if volume is not None else int(status.get("volume", -1))
+    controller.queue_clearsongs()
+    controller.queue_loadfrom_playlist(playlist)
+    if fade_in and target > 0:
+        controller.setvol(0)
+    elif volume is not None:
+        controller.setvol(volume)
+    controller.play()
+    return target if fade_in and target > 0 else None
+
+
+@dataclass
+class ScheduledPlayback:
+    id: int
+    name: str
+    hour: int
+    minute: int
+    days: Optional[set]
+    playlist: str
+    volume: Optional[int]
+    fade_in_seconds: int
+    next_run: Optional[datetime] = None
+
+
+class PlaybackScheduler:
+    """
+    Runs the schedules table inside the app, in place of crontab + cron_task.py.
+
+    Playback goes through the live MPD connection pool, so it starts as soon
+    as the timer fires instead of after a Python interpreter cold start.
+    Call reload() after changing the table.
+    """
+
+    def __init__(self, session_factory, pool, fader):
+        self.session_factory = session_factory
+        self.pool = pool
+        self.fader = fader
+        self._entries = {}
+        self._changed = asyncio.Event()
+        self._task = None
+        self._running = set()
+
+    def load(self):
+        now = datetime.now()
+        with self.session_factory() as db:
+            rows = db.query(Schedule).filter(Schedule.enabled.is_(True)).all()
+            entries = {row.id: self.entry(row) for row in rows}
+        for entry in entries.values():
+            entry.next_run = next_run_time(entry.hour, entry.minute, entry.days, now)
+        self._entries = entries
+
+    @staticmethod
+    def entry(row):
+        return ScheduledPlayback(
+            id=row.id, name=row.name, hour=row.hour, minute=row.minute,
+            days=parse_days(row.days), playlist=row.playlist,
+            volume=row.volume, fade_in_seconds=row.fade_in_seconds or 0,
+        )
+
+    def reload(self):
+        self.load()
+        self._changed.set()
+
+    def next_run(self, schedule_id):
+        entry = self._entries.get(schedule_id)
+        return entry.next_run if entry else None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_loop(self):
+        await asyncio.to_thread(self.load)
+        while True:
+            now = datetime.now()
+            for entry in list(self._entries.values()):
+                if entry.next_run is not None and entry.next_run <= now:
+                    entry.next_run = next_run_time(entry.hour, entry.minute, entry.days, now)
+                    self.trigger(entry)
+
+            upcoming = [entry.next_run for entry in self._entries.values() if entry.next_run is not None]
+            delay = MAX_SLEEP_SECONDS
+            if upcoming:
+                delay = min(delay, max(0.0, (min(upcoming) - now).total_seconds()))
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def trigger(self, entry):
+        """Starts run(entry) in the background; the fade-in can take a while."""
+        task = asyncio.create_task(self.run(entry))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def run(self, entry):
+        """Starts one schedule's playback now."""
+        print(f"Schedule '{entry.name}': playing '{entry.playlist}'.")
+        try:
+            target = await self.pool.batch(start_playback, entry.playlist, entry.volume, entry.fade_in_seconds)
+            if target is not None:
+                await self.fader.fade(0, target, entry.fade_in_seconds, "ease-in")
+        except Exception as e:
+            print(f"Schedule '{entry.name}' failed: {e}")
+        await asyncio.to_thread(self._mark_run, entry.id)
+
+    def _mark_run(self, schedule_id):
+        with self.session_factory() as db:
+            row = db.get(Schedule, schedule_id)
+            if row is not None:
+                row.last_run_at = datetime.now()
+                db.commit()
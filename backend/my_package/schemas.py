@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from datetime import datetime
 
 class Settings(BaseModel):
     show_lyrics: bool
@@ -42,6 +43,15 @@ class PlaylistPayload(BaseModel):
     """
     songs: List[str]
 
+class PlaylistItemPayload(BaseModel):
+    """A single song to append to a PC playlist, e.g. {"path": "path/to/song.mp3"}"""
+    path: str
+
+class PlaylistMovePayload(BaseModel):
+    """Moves the song at from_position to to_position (0-based indexes in the playlist)."""
+    from_position: int
+    to_position: int
+
 # New Schema for returning a list of playlist names
 class PlaylistsListResponse(BaseModel):
     """
@@ -66,3 +76,24 @@ class UserPlaylistResponse(UserPlaylistBase):
 
 class SongRequest(BaseModel):
     path: str
+
+class ScheduleBase(BaseModel):
+    """
+    A timed playback. day_of_week uses crontab numbering (0 = Sunday);
+    empty or None means every day.
+    """
+    hour: int = Field(ge=0, le=23)
+    minute: int = Field(ge=0, le=59)
+    day_of_week: Optional[List[int]] = None
+    playlist: str = "定期播放"
+    volume: Optional[int] = Field(default=None, ge=0, le=100)
+    fade_in_seconds: int = Field(default=0, ge=0, le=3600)
+    enabled: bool = True
+
+class ScheduleCreate(ScheduleBase):
+    name: str
+
+class ScheduleResponse(ScheduleCreate):
+    id: int
+    next_run_at: Optional[datetime] = None
+    last_run_at: Optional[datetime] = None
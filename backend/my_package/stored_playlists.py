@@ -0,0 +1,63 @@
+# my_package/stored_playlists.py
+import threading
+from datetime import datetime, timezone
+
+from cachetools import LRUCache
+
+# Whole playlists kept for servers that cannot send a window of one
+STORED_PLAYLIST_COPIES = 4
+# A playlist changed this recently may change again within the same
+# Last-Modified second, so its copy is not kept
+RECENT_CHANGE_SECONDS = 2
+
+
+def _parse_last_modified(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+
+class StoredPlaylistPages:
+    """
+    Pages of MPD stored playlists for /pi_playlist_songsinfo.
+
+    MPD 0.24 and later send only the requested entries (listplaylistinfo
+    NAME START:END). Older servers can only send the whole playlist, so a
+    copy is kept per playlist, keyed by its Last-Modified from listplaylists,
+    and the following pages are cut from it instead of fetching everything
+    again for every page.
+    """
+
+    def __init__(self, pool, copies=STORED_PLAYLIST_COPIES):
+        self.pool = pool
+        self._copies = LRUCache(maxsize=copies)
+        self._lock = threading.Lock()
+
+    async def window(self, name, start, count):
+        """Returns (entries start..start+count-1, whether more follow)."""
+        songs = await self.pool.batch(self._window, name, start, start + count + 1)
+        return songs[:count], len(songs) > count
+
+    def _window(self, player, name, start, end):
+        # Runs in the pool executor
+        with player.lock:
+            if player.supports_ranges():
+                return player.playlist_songsinfo_window(name, start, end)
+            return self._copy(player, name)[start:end]
+
+    def _copy(self, player, name):
+        last_modified = next((playlist.get("last-modified") for playlist in player.get_playlist_List()
+                              if playlist.get("playlist") == name), None)
+        with self._lock:
+            cached = self._copies.get(name)
+        if cached is not None and last_modified is not None and cached[0] == last_modified:
+            return cached[1]
+
+        songs = player.playlist_songsinfo(name)
+        modified_at = _parse_last_modified(last_modified)
+        if modified_at is not None and \
+                (datetime.now(timezone.utc) - modified_at).total_seconds() >= RECENT_CHANGE_SECONDS:
+            with self._lock:
+                self._copies[name] = (last_modified, songs)
+        return songs
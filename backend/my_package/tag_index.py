@@ -0,0 +1,222 @@
+# my_package/tag_index.py
+import asyncio
+import os
+import re
+import time
+
+from mutagen import File as MutagenFile
+from sqlalchemy import delete, select, text
+
+from .models import TrackTag
+
+# Seconds between checks for library changes
+SYNC_INTERVAL = 60
+# Files whose tags are read before they are written in one transaction
+SYNC_BATCH_SIZE = 200
+# Seconds between syncs that stat every file on disk. A file retagged in
+# place does not change its folder's mtime, so LibraryIndex keeps its old
+# size/mtime; only these passes notice it.
+RESTAT_INTERVAL = 30 * 60
+
+# Han, kana and hangul. These scripts are written without spaces, so every
+# character is indexed as its own token and queries match them as phrases.
+_CJK_RANGES = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+_CJK = re.compile(f'([{_CJK_RANGES}])')
+# Word characters other than CJK, so 'Jay周杰倫' splits into 'Jay' and '周杰倫'
+# the way segment() split it when the tags were indexed
+_QUERY_TOKEN = re.compile(fr'[{_CJK_RANGES}]+|[^\W{_CJK_RANGES}]+')
+
+
+def segment(value):
+    """Puts spaces around CJK characters so FTS5's unicode61 tokenizer splits them."""
+    return _CJK.sub(r' \1 ', value or '')
+
+
+def build_match_query(query):
+    """
+    Turns user input into an FTS5 MATCH expression. Words become prefix
+    matches and runs of CJK characters become phrases, e.g.
+    '周杰 jay' -> '"周 杰" "jay"*', 'Jay周杰' -> '"Jay"* "周 杰"'
+    """
+    terms = []
+    for token in _QUERY_TOKEN.findall(query):
+        if _CJK.match(token):
+            terms.append('"' + ' '.join(token) + '"')
+        else:
+            terms.append(f'"{token}"*')
+    return ' '.join(terms)
+
+
+def read_tags(full_path):
+    """Returns the tag columns for one file, falling back to the file name for the title."""
+    tags = {"title": None, "artist": None, "album": None, "duration": None, "track": None}
+    try:
+        audio = MutagenFile(full_path, easy=True)
+    except Exception as e:
+        print(f"Error reading tags from '{full_path}': {e}")
+        audio = None
+    if audio is not None:
+        for key in ("title", "artist", "album"):
+            values = audio.get(key) if audio.tags is not None else None
+            if values:
+                tags[key] = str(values[0])
+        tracknumber = audio.get("tracknumber") if audio.tags is not None else None
+        if tracknumber:
+            match = re.match(r'\d+', str(tracknumber[0]))
+            tags["track"] = int(match.group()) if match else None
+        if audio.info is not None:
+            tags["duration"] = round(audio.info.length, 3)
+    if not tags["title"]:
+        tags["title"] = os.path.splitext(os.path.basename(full_path))[0]
+    return tags
+
+
+class TagIndex:
+    """
+    Tag metadata for every file in the LibraryIndex, stored in the track_tags
+    table and searchable through the track_search FTS5 table.
+
+    Files are keyed by path + size + mtime, so a sync only opens the files
+    that were added or modified since the last one.
+    """
+
+    def __init__(self, library, session_factory):
+        self.library = library
+        self.session_factory = session_factory
+        self._synced_version = None
+        self._task = None
+
+    def ensure_schema(self):
+        with self.session_factory() as db:
+            # Not expressible as a SQLAlchemy model, so created by hand
+            db.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS track_search "
+                "USING fts5(title, artist, album, filename, tokenize='unicode61')"
+            ))
+            db.commit()
+
+    def sync(self, restat=False):
+        """
+        Brings the tag index in line with the library. Returns (indexed, removed).
+        With restat, every file is stat()ed instead of trusting the sizes and
+        mtimes in the library index.
+        """
+        version = self.library.version
+        current = {}
+        for path in self.library.files_under(''):
+            stat = self._stat(path) if restat else self.library.file_stat(path)
+            if stat is not None:
+                current[path] = stat
+
+        with self.session_factory() as db:
+            known = {path: (id_, size, mtime) for id_, path, size, mtime in
+                     db.execute(select(TrackTag.id, TrackTag.path, TrackTag.size, TrackTag.mtime))}
+
+        removed = [known[path][0] for path in known.keys() - current.keys()]
+        if removed:
+            with self.session_factory() as db:
+                for start in range(0, len(removed), SYNC_BATCH_SIZE):
+                    ids = removed[start:start + SYNC_BATCH_SIZE]
+                    db.execute(delete(TrackTag).where(TrackTag.id.in_(ids)))
+                    db.execute(text(f"DELETE FROM track_search WHERE rowid IN ({','.join(map(str, ids))})"))
+                db.commit()
+
+        stale = []
+        for path, stat in current.items():
+            if path in known and known[path][1:] == stat:
+                continue
+            if not restat:
+                # The library's numbers can be older than the stored ones when
+                # a restat saw an in-place edit first; trust the disk.
+                stat = self._stat(path)
+                if stat is None or (path in known and known[path][1:] == stat):
+                    continue
+            stale.append((path, stat))
+        for start in range(0, len(stale), SYNC_BATCH_SIZE):
+            # Tags are read from the disk before the transaction starts, so
+            # SQLite's write lock is only held for the inserts below and other
+            # writers (playlists, logins) do not wait on the USB drive.
+            batch = [(path, stat, read_tags(os.path.join(self.library.base_path, path)))
+                     for path, stat in stale[start:start + SYNC_BATCH_SIZE]]
+            self._write_batch(batch)
+
+        self._synced_version = version
+        if stale or removed:
+            print(f"Tag index: {len(stale)} files indexed, {len(removed)} removed.")
+        return len(stale), len(removed)
+
+    def _stat(self, path):
+        try:
+            stat_result = os.stat(os.path.join(self.library.base_path, path))
+        except OSError:
+            return None
+        return stat_result.st_size, stat_result.st_mtime_ns
+
+    def _write_batch(self, batch):
+        with self.session_factory() as db:
+            for path, (size, mtime), tags in batch:
+                row = db.execute(select(TrackTag).where(TrackTag.path == path)).scalar_one_or_none()
+                if row is None:
+                    row = TrackTag(path=path)
+                    db.add(row)
+                row.size, row.mtime = size, mtime
+                for key, value in tags.items():
+                    setattr(row, key, value)
+                db.flush()
+                db.execute(text("DELETE FROM track_search WHERE rowid = :id"), {"id": row.id})
+                db.execute(text(
+                    "INSERT INTO track_search (rowid, title, artist, album, filename) "
+                    "VALUES (:id, :title, :artist, :album, :filename)"
+                ), {
+                    "id": row.id,
+                    "title": segment(tags["title"]),
+                    "artist": segment(tags["artist"]),
+                    "album": segment(tags["album"]),
+                    "filename": segment(path),
+                })
+            db.commit()
+
+    def search(self, query, limit=20, offset=0):
+        """Full-text search over title, artist, album and path, best matches first."""
+        match = build_match_query(query)
+        if not match:
+            return {"total": 0, "items": [], "limit": limit, "offset": offset}
+        with self.session_factory() as db:
+            total = db.execute(text("SELECT count(*) FROM track_search WHERE track_search MATCH :q"),
+                               {"q": match}).scalar()
+            rows = db.execute(text(
+                "SELECT t.path, t.title, t.artist, t.album, t.duration, t.track "
+                "FROM track_search JOIN track_tags t ON t.id = track_search.rowid "
+                "WHERE track_search MATCH :q ORDER BY track_search.rank LIMIT :limit OFFSET :offset"
+            ), {"q": match, "limit": limit, "offset": offset}).mappings().all()
+        return {"total": total, "items": [dict(row) for row in rows], "limit": limit, "offset": offset}
+
+    # --- Background sync ---
+
+    def start(self, interval=SYNC_INTERVAL):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sync_loop(self, interval, restat_interval=RESTAT_INTERVAL):
+        await asyncio.to_thread(self.ensure_schema)
+        # The first sync after startup stats every file, catching edits made while the app was down
+        last_restat = None
+        while True:
+            restat = last_restat is None or time.monotonic() - last_restat >= restat_interval
+            if restat or self.library.version != self._synced_version:
+                try:
+                    await asyncio.to_thread(self.sync, restat)
+                    if restat:
+                        last_restat = time.monotonic()
+                except Exception as e:
+                    print(f"Tag index sync failed: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,218 @@
+# my_package/transcoder.py
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi.responses import StreamingResponse
+
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+TRANSCODE_CACHE_DIR = os.environ.get("TRANSCODE_CACHE_DIR", "./transcode_cache")
+TRANSCODE_CACHE_MAX_BYTES = int(os.environ.get("TRANSCODE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# ffmpeg processes running at once; a Pi has four slow cores
+TRANSCODE_MAX_CONCURRENT = int(os.environ.get("TRANSCODE_MAX_CONCURRENT", "2"))
+# Seconds a request waits for a free slot before giving up with 503
+TRANSCODE_QUEUE_TIMEOUT = 30
+TRANSCODE_CHUNK_SIZE = 64 * 1024
+# Last bytes of ffmpeg's error output kept for the log; the rest is read and dropped
+STDERR_TAIL_BYTES = 4096
+
+_BITRATE = re.compile(r'^(\d{2,3})k$')
+MIN_BITRATE_K, MAX_BITRATE_K = 32, 320
+
+
+@dataclass(frozen=True)
+class Profile:
+    codec_args: tuple
+    container: str
+    extension: str
+    media_type: str
+
+
+PROFILES = {
+    "opus": Profile(("-c:a", "libopus"), "ogg", ".opus", "audio/ogg"),
+    "mp3": Profile(("-c:a", "libmp3lame"), "mp3", ".mp3", "audio/mpeg"),
+    "aac": Profile(("-c:a", "aac"), "adts", ".aac", "audio/aac"),
+}
+
+
+class TranscoderBusy(Exception):
+    pass
+
+
+def parse_bitrate(bitrate):
+    """'96k' -> '96k'; raises ValueError outside 32k-320k."""
+    match = _BITRATE.match(bitrate or '')
+    if not match or not MIN_BITRATE_K <= int(match.group(1)) <= MAX_BITRATE_K:
+        raise ValueError(f"bitrate must look like '96k', between {MIN_BITRATE_K}k and {MAX_BITRATE_K}k")
+    return bitrate
+
+
+class Transcoder:
+    """
+    Transcodes music files with ffmpeg for low-bandwidth listeners.
+
+    Output is streamed to the client while ffmpeg runs and written to the
+    cache at the same time. A finished transcode is keyed by path, size,
+    mtime and profile, so editing the source invalidates it. The cache is
+    trimmed to max_bytes, least recently used first: a hit sets the file's
+    access time and leaves its mtime alone, so the ETag and Last-Modified
+    of a cached transcode stay the same between plays. A semaphore caps the
+    number of ffmpeg processes.
+    """
+
+    def __init__(self, cache_dir=TRANSCODE_CACHE_DIR, max_bytes=TRANSCODE_CACHE_MAX_BYTES,
+                 max_concurrent=TRANSCODE_MAX_CONCURRENT, ffmpeg=FFMPEG_BIN):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ffmpeg = ffmpeg
+        self._slots = asyncio.Semaphore(max(1, max_concurrent))
+
+    def cache_path(self, relative_path, stat_result, format, bitrate):
+        key = f"{relative_path}\0{stat_result.st_size}\0{stat_result.st_mtime_ns}\0{format}\0{bitrate}"
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + PROFILES[format].extension)
+
+    def cached(self, cache_path):
+        """Returns True and marks the entry as recently used if it is in the cache."""
+        try:
+            stat_result = os.stat(cache_path)
+            # Set explicitly, so noatime/relatime mounts do not matter
+            os.utime(cache_path, ns=(time.time_ns(), stat_result.st_mtime_ns))
+            return True
+        except OSError:
+            return False
+
+    async def open(self, source_path, cache_path, format, bitrate):
+        """
+        Waits for an ffmpeg slot and starts ffmpeg, so a missing binary is
+        reported before any response is sent. Returns a TranscodeJob holding
+        the slot until it is closed. Raises TranscoderBusy if no slot frees
+        up within TRANSCODE_QUEUE_TIMEOUT.
+        """
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=TRANSCODE_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TranscoderBusy()
+        profile = PROFILES[format]
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.ffmpeg, "-nostdin", "-v", "error", "-i", source_path,
+                "-vn", *profile.codec_args, "-b:a", bitrate, "-f", profile.container, "pipe:1",
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        return TranscodeJob(self, process, source_path, cache_path)
+
+    def trim(self):
+        """Deletes least recently used transcodes until the cache fits in max_bytes."""
+        entries, total = [], 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat_result.st_atime, stat_result.st_size, path))
+                total += stat_result.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class TranscodeJob:
+    """
+    One running ffmpeg process and the slot it holds. chunks() streams the
+    output and writes it to the cache; close() kills ffmpeg if it is still
+    running, drops the unfinished file and frees the slot. close() is safe
+    to call more than once, and before chunks() was ever iterated, which
+    happens when the client goes away before the response starts.
+    """
+
+    def __init__(self, transcoder, process, source_path, cache_path):
+        self.transcoder = transcoder
+        self.process = process
+        self.source_path = source_path
+        self.cache_path = cache_path
+        self.part_path = f"{cache_path}.{uuid.uuid4().hex}.part"
+        self.completed = False
+        self._closed = False
+        self._stderr_tail = bytearray()
+        # Read alongside stdout: a full stderr pipe would stall ffmpeg
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+
+    async def _drain_stderr(self):
+        while True:
+            chunk = await self.process.stderr.read(TRANSCODE_CHUNK_SIZE)
+            if not chunk:
+                return
+            self._stderr_tail += chunk
+            del self._stderr_tail[:-STDERR_TAIL_BYTES]
+
+    async def chunks(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.part_path, "wb") as part:
+                while True:
+                    chunk = await self.process.stdout.read(TRANSCODE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    part.write(chunk)
+                    yield chunk
+            await self._stderr_task
+            if await self.process.wait() == 0:
+                os.replace(self.part_path, self.cache_path)
+                self.completed = True
+            else:
+                print(f"ffmpeg failed for '{self.source_path}': "
+                      f"{self._stderr_tail.decode(errors='replace').strip()}")
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # Everything that must happen runs before the first await, which a
+        # cancelled request would interrupt
+        if self.process.returncode is None:
+            # The client went away mid-stream
+            self.process.kill()
+        self._stderr_task.cancel()
+        if not self.completed:
+            try:
+                os.remove(self.part_path)
+            except OSError:
+                pass
+        self.transcoder._slots.release()
+        await self.process.wait()
+        if self.completed:
+            await asyncio.to_thread(self.transcoder.trim)
+
+
+class TranscodeResponse(StreamingResponse):
+    """Streams a TranscodeJob and closes it however the response ends."""
+
+    def __init__(self, job, media_type):
+        super().__init__(job.chunks(), media_type=media_type)
+        self.job = job
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.job.close()
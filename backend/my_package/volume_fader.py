@@ -0,0 +1,133 @@
+# my_package/volume_fader.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+# Shortest gap between two setvol commands sent by one fade
+FADE_MIN_INTERVAL = 0.1
+# Length of the fade-out at the end of a sleep timer
+SLEEP_FADE_SECONDS = 60
+
+# Progress curves, mapping elapsed fraction 0..1 to volume fraction 0..1.
+# MPD volume is not perceptually linear: a fade-in sounds even with ease-in
+# (slow start) and a fade-out with ease-out (fast start).
+CURVES = {
+    "linear": lambda x: x,
+    "ease-in": lambda x: x * x,
+    "ease-out": lambda x: 1 - (1 - x) * (1 - x),
+    "s-curve": lambda x: x * x * (3 - 2 * x),
+}
+
+
+async def current_volume(pool):
+    """MPD volume 0-100, or None when there is no mixer or MPD is down."""
+    status = await pool.run("get_status")
+    volume = int(status.get("volume", -1)) if status else -1
+    return volume if volume >= 0 else None
+
+
+class VolumeFader:
+    """
+    Ramps MPD volume over time through the connection pool.
+
+    The volume is computed from the elapsed time on every wake-up, so a slow
+    setvol makes the fade skip values instead of running late, and a command
+    is only sent when the rounded volume changes and never more often than
+    min_interval. Only one fade runs at a time: starting another, or cancel()
+    (e.g. the user moving the volume slider), ends the previous one.
+    """
+
+    def __init__(self, pool, min_interval=FADE_MIN_INTERVAL, clock=time.monotonic):
+        self.pool = pool
+        self.min_interval = min_interval
+        self.clock = clock
+        self._generation = 0
+
+    def cancel(self):
+        self._generation += 1
+
+    async def fade(self, start, end, seconds, curve="linear"):
+        """
+        Fades from `start` to `end` over `seconds`. Returns the number of
+        setvol commands sent, or None if the fade was cancelled.
+        """
+        if curve not in CURVES:
+            raise ValueError(f"Unknown fade curve '{curve}'. Use one of: {', '.join(CURVES)}")
+        self._generation += 1
+        generation = self._generation
+        shape = CURVES[curve]
+        # On average the volume changes by one every `interval` seconds
+        interval = max(self.min_interval, seconds / max(1, abs(end - start)))
+
+        sent, last = 0, None
+        started = self.clock()
+        while True:
+            if generation != self._generation:
+                return None
+            progress = 1.0 if seconds <= 0 else min(1.0, (self.clock() - started) / seconds)
+            volume = round(start + (end - start) * shape(progress))
+            if volume != last:
+                await self.pool.run("setvol", volume)
+                last = volume
+                sent += 1
+            if progress >= 1.0:
+                return sent
+            await asyncio.sleep(min(interval, max(0.0, started + seconds - self.clock())))
+
+
+class SleepTimer:
+    """
+    Server-side sleep timer: after the set time, fades the volume out,
+    pauses, and puts the volume back for the next time playback starts.
+    Runs in the app, so closing the browser tab does not cancel it.
+    """
+
+    def __init__(self, pool, fader):
+        self.pool = pool
+        self.fader = fader
+        self._task = None
+        self.ends_at = None
+        self.fade_seconds = 0
+
+    @property
+    def is_active(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, minutes, fade_seconds=SLEEP_FADE_SECONDS, curve="ease-out"):
+        if curve not in CURVES:
+            raise ValueError(f"Unknown fade curve '{curve}'. Use one of: {', '.join(CURVES)}")
+        self.cancel()
+        seconds = minutes * 60
+        self.fade_seconds = min(fade_seconds, seconds)
+        self.ends_at = datetime.now() + timedelta(seconds=seconds)
+        self._task = asyncio.create_task(self._run(seconds, self.fade_seconds, curve))
+
+    def cancel(self):
+        if self.is_active:
+            self._task.cancel()
+        self._task = None
+        self.ends_at = None
+
+    def status(self):
+        if not self.is_active:
+            return {"active": False, "ends_at": None, "remaining": None, "fade_seconds": None}
+        remaining = max(0, round((self.ends_at - datetime.now()).total_seconds()))
+        return {"active": True, "ends_at": self.ends_at, "remaining": remaining, "fade_seconds": self.fade_seconds}
+
+    async def _run(self, seconds, fade_seconds, curve):
+        await asyncio.sleep(seconds - fade_seconds)
+        original = await current_volume(self.pool)
+        faded = None
+        if original:
+            try:
+                faded = await self.fader.fade(original, 0, fade_seconds, curve)
+            except asyncio.CancelledError:
+                # The timer was cancelled or restarted during the fade; do
+                # not leave playback at whatever volume the fade had reached
+                await self.pool.run("setvol", original)
+                raise
+        await self.pool.run("set_pause", True)
+        if faded is not None:
+            # Cancelled fades mean the user picked a volume; leave it alone
+            await self.pool.run("setvol", original)
+        print("Sleep timer: playback paused.")
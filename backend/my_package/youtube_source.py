@@ -0,0 +1,277 @@
+# my_package/youtube_source.py
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+from .models import YouTubeVideo
+
+YTDLP_BIN = os.environ.get("YTDLP_BIN", "yt-dlp")
+# How MPD reaches this app. Playlist entries are <base>/yt/<video id>.
+YOUTUBE_PROXY_BASE = os.environ.get("YOUTUBE_PROXY_BASE", "http://127.0.0.1:8001")
+# yt-dlp processes running at once
+YOUTUBE_RESOLVE_WORKERS = int(os.environ.get("YOUTUBE_RESOLVE_WORKERS", "2"))
+YOUTUBE_RESOLVE_TIMEOUT = 60
+# A cached stream URL is resolved again once it has less than this left
+YOUTUBE_REFRESH_MARGIN = 20 * 60
+# Lifetime assumed when a stream URL carries no expire= parameter
+YOUTUBE_DEFAULT_TTL = 60 * 60
+# Queue entries after the current song whose stream URLs are kept fresh
+YOUTUBE_PREFETCH_AHEAD = 3
+# Longest wait between prefetch checks when MPD reports no player changes
+YOUTUBE_PREFETCH_INTERVAL = 300
+
+_VIDEO_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_PROXY_PATH = re.compile(r'^https?://[^/]+/yt/([A-Za-z0-9_-]{11})$')
+_PATH_EXPIRE = re.compile(r'/expire/(\d+)')
+
+
+class ResolveError(Exception):
+    pass
+
+
+@dataclass
+class ResolvedStream:
+    video_id: str
+    title: str
+    url: str
+    expires_at: float # unix time
+
+    def is_fresh(self, margin=YOUTUBE_REFRESH_MARGIN):
+        return self.expires_at - time.time() > margin
+
+
+def is_video_id(value):
+    return bool(_VIDEO_ID.match(value or ''))
+
+
+def parse_video_id(url):
+    """The video id of a youtube.com / youtu.be URL (or of a bare id), or None."""
+    url = url.strip()
+    if is_video_id(url):
+        return url
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    for prefix in ('www.', 'm.', 'music.'):
+        host = host.removeprefix(prefix)
+    candidate = None
+    if host == 'youtu.be':
+        candidate = parsed.path.strip('/').split('/')[0]
+    elif host in ('youtube.com', 'youtube-nocookie.com'):
+        if parsed.path == '/watch':
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+        else:
+            parts = parsed.path.strip('/').split('/')
+            if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+                candidate = parts[1]
+    return candidate if is_video_id(candidate) else None
+
+
+def parse_expiry(stream_url):
+    """Unix time a googlevideo URL stops working, from its expire= parameter."""
+    values = parse_qs(urlparse(stream_url).query).get('expire')
+    if not values:
+        # Some formats carry their parameters in the path: .../expire/1700000000/...
+        match = _PATH_EXPIRE.search(stream_url)
+        values = [match.group(1)] if match else None
+    try:
+        return float(values[0])
+    except (TypeError, ValueError):
+        return time.time() + YOUTUBE_DEFAULT_TTL
+
+
+def proxied_video_id(uri):
+    """The video id of a /yt/<video id> playlist entry, or None for any other URI."""
+    match = _PROXY_PATH.match(uri or '')
+    return match.group(1) if match else None
+
+
+async def run_yt_dlp(target, binary=YTDLP_BIN, timeout=YOUTUBE_RESOLVE_TIMEOUT):
+    """
+    Runs yt-dlp for one video id or URL. Returns (video_id, title, stream_url).
+    Raises ResolveError, or FileNotFoundError if yt-dlp is not installed.
+    """
+    process = await asyncio.create_subprocess_exec(
+        binary, '-f', 'bestaudio/best', '--no-playlist', '--no-warnings',
+        '--print', 'id', '--print', 'title', '--print', 'urls', '--', target,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise ResolveError(f"yt-dlp took longer than {timeout}s for '{target}'")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    if process.returncode != 0:
+        raise ResolveError(stderr.decode(errors='replace').strip() or f"yt-dlp exited with {process.returncode}")
+    lines = stdout.decode(errors='replace').splitlines()
+    if len(lines) < 3 or not lines[2].startswith('http'):
+        raise ResolveError(f"yt-dlp returned no stream URL for '{target}'")
+    return lines[0].strip(), lines[1].strip(), lines[2].strip()
+
+
+class YouTubeSource:
+    """
+    YouTube videos in MPD playlists, stored by video id instead of by the
+    signed stream URL, which stops working after a few hours.
+
+    Playlist entries point at this app's /yt/<video id>, which redirects MPD
+    to a current stream URL. Resolved URLs are cached (in memory and in the
+    youtube_videos table) until shortly before the expiry parsed from their
+    expire= parameter. The prefetcher re-resolves the next entries in the
+    queue before they play, so the redirect is normally answered from the
+    cache. At most `workers` yt-dlp processes run at once, and concurrent
+    requests for the same video share one run.
+    """
+
+    def __init__(self, session_factory, pool, queue_cache, resolver=run_yt_dlp,
+                 workers=YOUTUBE_RESOLVE_WORKERS, proxy_base=YOUTUBE_PROXY_BASE):
+        self.session_factory = session_factory
+        self.pool = pool
+        self.queue_cache = queue_cache
+        self.resolver = resolver
+        self.proxy_base = proxy_base.rstrip('/')
+        self._slots = asyncio.Semaphore(max(1, workers))
+        self._streams = {}
+        self._inflight = {}
+        self._task = None
+
+    def proxy_url(self, video_id):
+        return f"{self.proxy_base}/yt/{video_id}"
+
+    async def add(self, youtube_url):
+        """
+        Resolves a URL the user pasted, which also checks it is playable.
+        Returns its ResolvedStream. Raises ValueError for anything that is
+        not a YouTube video, since /yt/<video id> can only replay those.
+        """
+        video_id = parse_video_id(youtube_url)
+        if video_id is None:
+            raise ValueError(f"'{youtube_url}' is not a YouTube video URL")
+        return await self.stream(video_id)
+
+    async def stream(self, video_id):
+        """A ResolvedStream for video_id that is not about to expire, resolving it if needed."""
+        cached = self._streams.get(video_id)
+        if cached is None:
+            cached = await asyncio.to_thread(self._load, video_id)
+            if cached is not None:
+                self._streams[video_id] = cached
+        if cached is not None and cached.is_fresh():
+            return cached
+        return await self._single_flight(video_id)
+
+    async def added_stream(self, video_id):
+        """
+        stream() for a video that add() has stored, or None for any other id,
+        so /yt/<video id> cannot be used to resolve arbitrary videos.
+        """
+        if video_id not in self._streams and not await asyncio.to_thread(self._is_added, video_id):
+            return None
+        return await self.stream(video_id)
+
+    async def _single_flight(self, target):
+        task = self._inflight.get(target)
+        if task is None:
+            task = asyncio.ensure_future(self._resolve(target))
+            self._inflight[target] = task
+            task.add_done_callback(lambda _: self._inflight.pop(target, None))
+        return await asyncio.shield(task)
+
+    async def _resolve(self, target):
+        async with self._slots:
+            started = time.monotonic()
+            video_id, title, url = await self.resolver(target)
+        stream = ResolvedStream(video_id, title, url, parse_expiry(url))
+        self._streams[video_id] = stream
+        await asyncio.to_thread(self._save, stream)
+        print(f"YouTube '{title}' ({video_id}) resolved in {time.monotonic() - started:.1f}s, "
+              f"valid until {datetime.fromtimestamp(stream.expires_at):%H:%M}.")
+        return stream
+
+    def _load(self, video_id):
+        with self.session_factory() as db:
+            row = db.get(YouTubeVideo, video_id)
+            if row is None or not row.stream_url or row.expires_at is None:
+                return None
+            return ResolvedStream(row.video_id, row.title, row.stream_url, row.expires_at.timestamp())
+
+    def _is_added(self, video_id):
+        with self.session_factory() as db:
+            return db.get(YouTubeVideo, video_id) is not None
+
+    def _save(self, stream):
+        now = datetime.now()
+        with self.session_factory() as db:
+            row = db.get(YouTubeVideo, stream.video_id)
+            if row is None:
+                row = YouTubeVideo(video_id=stream.video_id, added_at=now)
+                db.add(row)
+            row.title = stream.title
+            row.stream_url = stream.url
+            row.expires_at = datetime.fromtimestamp(stream.expires_at)
+            row.resolved_at = now
+            db.commit()
+
+    # --- Prefetching the upcoming queue entries ---
+
+    def start(self, events):
+        """Keeps upcoming entries fresh, checking whenever MPD reports a player or queue change."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._prefetch_loop(events))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _prefetch_loop(self, events):
+        # A raw listener rather than a subscription: it only needs to know
+        # that something changed, and does not make the broadcaster read
+        # and build events while no browser is connected
+        changed = asyncio.Event()
+
+        def on_change(subsystems):
+            if {"player", "playlist"} & set(subsystems):
+                changed.set()
+
+        events.add_listener(on_change)
+        try:
+            while True:
+                changed.clear()
+                try:
+                    await self.prefetch_upcoming()
+                except Exception as e:
+                    print(f"YouTube prefetch failed: {e}")
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=YOUTUBE_PREFETCH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            events.remove_listener(on_change)
+
+    async def prefetch_upcoming(self):
+        """Resolves the current, next and following YouTube entries of the queue that are stale."""
+        status = await self.pool.run("get_status") or {}
+        _, songs = await self.queue_cache.get_songs()
+        current = int(status.get("song", 0))
+        positions = {current, *range(current + 1, current + 1 + YOUTUBE_PREFETCH_AHEAD)}
+        if "nextsong" in status:
+            positions.add(int(status["nextsong"])) # differs from current + 1 in random mode
+        video_ids = list({
+            proxied_video_id(songs[pos].get("file"))
+            for pos in positions if 0 <= pos < len(songs)
+        } - {None})
+        results = await asyncio.gather(*(self.stream(video_id) for video_id in video_ids), return_exceptions=True)
+        for video_id, result in zip(video_ids, results):
+            if isinstance(result, Exception):
+                print(f"YouTube prefetch of {video_id} failed: {result}")
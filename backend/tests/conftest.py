@@ -0,0 +1,27 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# main.py mounts ./static and reads other paths relative to the backend folder
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+# Read at import time; keeps the tests away from sql_app.db and the real caches
+_TEMP_DIR = tempfile.mkdtemp(prefix="pi-mpd-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TEMP_DIR}/test.db")
+for name in ("TRANSCODE_CACHE_DIR", "ART_CACHE_DIR", "IMAGE_CACHE_DIR", "AVATAR_DIR"):
+    os.environ.setdefault(name, os.path.join(_TEMP_DIR, name.lower()))
+# bcrypt's minimum; the default 12 rounds take a quarter second per hash
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from tests.fake_mpd import FakeMPD
+
+
+@pytest.fixture
+def fake_mpd():
+    with FakeMPD() as server:
+        yield server
@@ -0,0 +1,280 @@
+# tests/fake_mpd.py
+import select
+import shlex
+import socketserver
+import threading
+import time
+
+# Subsystems reported to idle clients for each state-changing command
+COMMAND_SUBSYSTEMS = {
+    "setvol": "mixer",
+    "play": "player", "pause": "player", "stop": "player", "next": "player", "previous": "player",
+    "add": "playlist", "addid": "playlist", "clear": "playlist", "delete": "playlist", "load": "playlist",
+    "playlistadd": "stored_playlist", "rm": "stored_playlist", "rename": "stored_playlist",
+}
+
+
+class CommandFailed(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeMPD:
+    """
+    An in-process MPD stand-in speaking enough of the protocol for
+    python-mpd2: status, queue and stored playlists, command lists with
+    MPD's "[code@index]" errors, idle/noidle, and listplaylistinfo ranges.
+
+    `delay` is added to every round trip, to look like MPD on a Pi.
+    URIs in `missing` are rejected by add/playlistadd like unknown songs.
+    `round_trips` counts requests (a whole command list is one) and
+    `commands` logs every command as (name, args), with the
+    time.monotonic() each arrived at in `command_times`.
+    """
+
+    def __init__(self, delay=0.0, songs=(), version="0.23.5"):
+        self.delay = delay
+        self.version = version
+        self.volume = 50
+        self.state = "play"
+        self.queue = [{"file": uri} for uri in songs]
+        self.queue_version = 1
+        self.playlists = {}
+        self.playlists_modified = {}
+        self.missing = set()
+        self.commands = []
+        self.command_times = []
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        # Subsystems changed since each connected client last asked (idle)
+        self._pending = {}
+        self._server = None
+        self.host, self.port = "127.0.0.1", None
+
+    # --- Server lifecycle ---
+
+    def start(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                fake._serve(self.connection, self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((self.host, 0), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- Connection handling ---
+
+    def _serve(self, connection, rfile, wfile):
+        pending = set()
+        with self._lock:
+            self._pending[id(pending)] = pending
+        wfile.write(f"OK MPD {self.version}\n".encode())
+        command_list = None
+        try:
+            while True:
+                line = rfile.readline()
+                if not line:
+                    return
+                line = line.decode().rstrip("\n")
+                name, args = self._parse(line)
+                if name in ("command_list_begin", "command_list_ok_begin"):
+                    command_list = (name == "command_list_ok_begin", [])
+                    continue
+                if command_list is not None and name != "command_list_end":
+                    command_list[1].append((name, args))
+                    continue
+                if name == "close":
+                    return
+                if name == "idle":
+                    if not self._idle(connection, rfile, wfile, pending, args):
+                        return
+                    continue
+                if name == "noidle":
+                    continue
+
+                self._round_trip()
+                if name == "command_list_end":
+                    ok_each, commands = command_list
+                    command_list = None
+                    wfile.write(self._run_list(commands, ok_each).encode())
+                else:
+                    wfile.write(self._run_list([(name, args)], False).encode())
+                wfile.flush()
+        except (ConnectionError, OSError):
+            return
+        finally:
+            with self._lock:
+                self._pending.pop(id(pending), None)
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+    @staticmethod
+    def _parse(line):
+        parts = shlex.split(line)
+        return parts[0], parts[1:]
+
+    def _run_list(self, commands, ok_each):
+        output = []
+        for index, (name, args) in enumerate(commands):
+            try:
+                with self._lock:
+                    self.commands.append((name, args))
+                    self.command_times.append(time.monotonic())
+                    lines = self._execute(name, args)
+                    subsystem = COMMAND_SUBSYSTEMS.get(name)
+                    if subsystem:
+                        for pending in self._pending.values():
+                            pending.add(subsystem)
+            except CommandFailed as e:
+                output.append(f"ACK [{e.code}@{index}] {{{name}}} {e}\n")
+                return "".join(output)
+            output.extend(f"{key}: {value}\n" for key, value in lines)
+            if ok_each:
+                output.append("list_OK\n")
+        output.append("OK\n")
+        return "".join(output)
+
+    def _idle(self, connection, rfile, wfile, pending, subsystems):
+        """Answers idle once a watched subsystem changes, or noidle arrives. False if the client left."""
+        watched = set(subsystems) or set(COMMAND_SUBSYSTEMS.values())
+        while True:
+            with self._lock:
+                changed = sorted(pending & watched)
+                pending.difference_update(changed)
+            if changed:
+                wfile.write("".join(f"changed: {name}\n" for name in changed).encode() + b"OK\n")
+                wfile.flush()
+                return True
+            readable, _, _ = select.select([connection], [], [], 0.02)
+            if readable:
+                line = rfile.readline()
+                if not line:
+                    return False
+                # noidle: an empty reply ends the idle
+                wfile.write(b"OK\n")
+                wfile.flush()
+                return True
+
+    # --- Commands ---
+
+    def _song(self, pos):
+        return [("file", self.queue[pos]["file"]), ("Pos", pos), ("Id", pos + 1)]
+
+    def _execute(self, name, args):
+        if name in ("ping", "binarylimit"):
+            return []
+        if name == "status":
+            return [
+                ("volume", self.volume), ("state", self.state), ("playlist", self.queue_version),
+                ("playlistlength", len(self.queue)), ("song", 0), ("songid", 1),
+                ("nextsong", 1 if len(self.queue) > 1 else 0), ("elapsed", "1.000"), ("duration", "180.000"),
+            ]
+        if name == "currentsong":
+            return self._song(0) if self.queue else []
+        if name in ("playlistinfo", "playlistid"):
+            return [line for pos in range(len(self.queue)) for line in self._song(pos)]
+        if name == "plchanges":
+            # Every entry counts as changed; enough for a client to stay correct
+            return [line for pos in range(len(self.queue)) for line in self._song(pos)]
+        if name == "setvol":
+            self.volume = int(args[0])
+            return []
+        if name == "pause":
+            self.state = "pause" if not args or args[0] == "1" else "play"
+            return []
+        if name in ("play", "stop", "next", "previous"):
+            self.state = "stop" if name == "stop" else "play"
+            return []
+        if name == "clear":
+            self.queue = []
+            self.queue_version += 1
+            return []
+        if name in ("add", "addid"):
+            self._check_uri(args[0])
+            self.queue.append({"file": args[0]})
+            self.queue_version += 1
+            return [("Id", len(self.queue))] if name == "addid" else []
+        if name == "playlistadd":
+            self._check_uri(args[1])
+            self.playlists.setdefault(args[0], []).append(args[1])
+            self._touch(args[0])
+            return []
+        if name == "listplaylists":
+            return [line for playlist in sorted(self.playlists)
+                    for line in (("playlist", playlist), ("Last-Modified", self.playlists_modified[playlist]))]
+        if name in ("listplaylist", "listplaylistinfo"):
+            songs = self._stored(args[0])
+            if len(args) > 1:
+                songs = songs[self._range(args[1])]
+            if name == "listplaylist":
+                return [("file", uri) for uri in songs]
+            return [line for uri in songs for line in (("file", uri), ("Title", uri.rsplit("/", 1)[-1]))]
+        if name == "rm":
+            self._stored(args[0])
+            del self.playlists[args[0]]
+            del self.playlists_modified[args[0]]
+            return []
+        if name == "rename":
+            self.playlists[args[1]] = self.playlists.pop(self._stored_name(args[0]))
+            self.playlists_modified.pop(args[0])
+            self._touch(args[1])
+            return []
+        raise CommandFailed(5, f"unknown command \"{name}\"")
+
+    def _check_uri(self, uri):
+        if uri in self.missing:
+            raise CommandFailed(50, "No such song")
+
+    def _stored_name(self, name):
+        if name not in self.playlists:
+            raise CommandFailed(50, "No such playlist")
+        return name
+
+    def _stored(self, name):
+        return self.playlists[self._stored_name(name)]
+
+    def _touch(self, name):
+        # One second per change, so two changes never share a timestamp
+        seconds = len(self.commands)
+        self.playlists_modified[name] = f"2025-01-01T{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}Z"
+
+    def _range(self, value):
+        if tuple(int(part) for part in self.version.split(".")[:2]) < (0, 24):
+            raise CommandFailed(2, "too many arguments")
+        start, _, end = value.partition(":")
+        return slice(int(start), int(end) if end else None)
+
+
+if __name__ == "__main__":
+    # python -m tests.fake_mpd [delay] [queue length] [version]: serves until killed, for benchmarks
+    import sys
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    fake = FakeMPD(delay=delay, songs=[f"music/{i:05d}.flac" for i in range(length)],
+                   version=sys.argv[3] if len(sys.argv) > 3 else "0.23.5").start()
+    print(fake.port, flush=True)
+    threading.Event().wait()
@@ -0,0 +1,108 @@
+# tests/http_stub.py
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHTTPServer:
+    """
+    A local HTTP server for feed and download tests.
+
+    `files` maps a path to {"body": bytes} plus optional "etag",
+    "last_modified", "declared_size" (the total sent in Content-Range
+    instead of the real one), "cut_after" (bytes sent before the connection
+    is dropped, once) and "ignore_range". Conditional requests get 304,
+    Range requests 206 or 416. `requests` logs (path, headers) and
+    `statuses` the status of every reply. `delay` is added to each reply.
+    """
+
+    def __init__(self, delay=0.0):
+        self.files = {}
+        self.requests = []
+        self.statuses = []
+        self.delay = delay
+        self._server = None
+
+    def url(self, path):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{path}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _reply(self, handler, status, headers=(), length=0):
+        """Sends the status line and headers; the caller writes `length` bytes of body."""
+        self.statuses.append(status)
+        handler.send_response(status)
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(length))
+        handler.end_headers()
+
+    def _handle(self, handler):
+        self.requests.append((handler.path, dict(handler.headers)))
+        if self.delay:
+            time.sleep(self.delay)
+        entry = self.files.get(handler.path)
+        if entry is None:
+            self._reply(handler, 404)
+            return
+
+        body = entry["body"]
+        validators = []
+        if entry.get("etag"):
+            validators.append(("ETag", entry["etag"]))
+        if entry.get("last_modified"):
+            validators.append(("Last-Modified", entry["last_modified"]))
+        if (entry.get("etag") and handler.headers.get("If-None-Match") == entry["etag"]) or \
+                (entry.get("last_modified") and handler.headers.get("If-Modified-Since") == entry["last_modified"]):
+            self._reply(handler, 304, validators)
+            return
+
+        total = entry.get("declared_size", len(body))
+        requested = handler.headers.get("Range")
+        if requested and not entry.get("ignore_range"):
+            start = int(requested.removeprefix("bytes=").split("-")[0])
+            if start >= len(body):
+                self._reply(handler, 416, [("Content-Range", f"bytes */{total}")])
+                return
+            body = body[start:]
+            headers = [("Content-Range", f"bytes {start}-{start + len(body) - 1}/{total}")] + validators
+            self._reply(handler, 206, headers, len(body))
+        else:
+            self._reply(handler, 200, validators, len(body))
+
+        cut_after = entry.pop("cut_after", None)
+        if cut_after is not None:
+            # Headers promised the whole body; drop the connection partway
+            handler.wfile.write(body[:cut_after])
+            handler.wfile.flush()
+            handler.close_connection = True
+            return
+        handler.wfile.write(body)
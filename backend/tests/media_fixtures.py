@@ -0,0 +1,42 @@
+# tests/media_fixtures.py
+import math
+import struct
+import wave
+
+
+def write_flac(path, **tags):
+    """
+    A FLAC file with only a STREAMINFO block (no audio frames), which is
+    all mutagen needs to read and write tags.
+    """
+    info = struct.pack(">HH", 4096, 4096) + bytes(6)
+    # 44100 Hz, 2 channels, 16 bits per sample, 0 samples
+    info += ((44100 << 44) | (1 << 41) | (15 << 36)).to_bytes(8, "big") + bytes(16)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info)
+    if tags:
+        set_tags(path, **tags)
+    return path
+
+
+def set_tags(path, **tags):
+    from mutagen.flac import FLAC
+    audio = FLAC(path)
+    for key, value in tags.items():
+        audio[key] = value
+    audio.save()
+
+
+def write_wav(path, seconds=1.0, rate=8000, frequency=440):
+    """A mono 16-bit sine wave."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frames = b"".join(
+        struct.pack("<h", int(12000 * math.sin(2 * math.pi * frequency * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+    with wave.open(str(path), "wb") as output:
+        output.setnchannels(1)
+        output.setsampwidth(2)
+        output.setframerate(rate)
+        output.writeframes(frames)
+    return path
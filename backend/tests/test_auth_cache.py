@@ -0,0 +1,78 @@
+# tests/test_auth_cache.py
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from my_package import auth
+from my_package.auth import create_access_token, get_password_hash
+from my_package.database import Base, SessionLocal, engine
+from my_package.models import User
+
+SETTINGS = {"show_lyrics": True, "show_radio_card": True, "sleeping_time": 20,
+            "spare_setting1": True, "spare_setting2": True, "id3tagDisplaytype": False}
+
+
+@pytest.fixture
+def headers(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.query(User).filter(User.username == "CACHED").delete()
+        db.add(User(username="CACHED", hashed_password=get_password_hash("first-password"),
+                    settings=json.dumps(SETTINGS)))
+        db.commit()
+    auth.invalidate_cached_user("CACHED")
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'CACHED'})}"}
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Usernames passed to auth._load_user, i.e. the requests that opened a session."""
+    calls = []
+    load_user = auth._load_user
+
+    def counting(username):
+        calls.append(username)
+        return load_user(username)
+
+    monkeypatch.setattr(auth, "_load_user", counting)
+    return calls
+
+
+def test_user_is_loaded_once(headers, loads):
+    client = TestClient(main.app)
+    for _ in range(5):
+        assert client.get("/users/me/", headers=headers).json()["username"] == "CACHED"
+    assert loads == ["CACHED"]
+
+
+def test_settings_update_invalidates(headers, loads):
+    client = TestClient(main.app)
+    client.get("/users/me/", headers=headers)
+    response = client.put("/users/me/settings", json=dict(SETTINGS, sleeping_time=45), headers=headers)
+    assert response.status_code == 200
+
+    assert client.get("/users/me/", headers=headers).json()["settings"]["sleeping_time"] == 45
+    assert loads == ["CACHED", "CACHED"]
+
+
+def test_password_change_invalidates(headers, loads):
+    client = TestClient(main.app)
+    response = client.put("/users/password", headers=headers,
+                          json={"current_password": "first-password", "new_password": "second-password"})
+    assert response.status_code == 200
+    # The cached row had the old hash, which would accept the old password again
+    response = client.put("/users/password", headers=headers,
+                          json={"current_password": "first-password", "new_password": "third-password"})
+    assert response.status_code == 400
+    assert loads == ["CACHED", "CACHED"]
+
+
+def test_unknown_user_is_not_cached(loads):
+    Base.metadata.create_all(bind=engine)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'NOBODY'})}"}
+    client = TestClient(main.app)
+    assert client.get("/users/me/", headers=headers).status_code == 401
+    assert client.get("/users/me/", headers=headers).status_code == 401
+    assert loads == ["NOBODY", "NOBODY"]
@@ -0,0 +1,53 @@
+# tests/test_avatar_upload.py
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+from my_package import avatar_service
+from my_package.auth import create_access_token, get_password_hash
+from my_package.database import Base, SessionLocal, engine
+from my_package.models import User
+
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.query(User).filter(User.username == "AVATAR").first() is None:
+            db.add(User(username="AVATAR", hashed_password=get_password_hash("avatar-password")))
+            db.commit()
+    client = TestClient(main.app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'AVATAR'})}"
+    return client
+
+
+def jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "jpeg")
+    return buffer.getvalue()
+
+
+def test_every_size_is_written(client):
+    response = client.post("/upload_user_picture", files={"file": ("me.jpg", jpeg(1200, 800), "image/jpeg")})
+    assert response.status_code == 200
+    for size in avatar_service.AVATAR_SIZES:
+        with Image.open(os.path.join(avatar_service.AVATAR_DIR, f"AVATAR-{size}.jpg")) as img:
+            assert img.size == (size, size)
+    with Image.open(os.path.join(avatar_service.AVATAR_DIR, "AVATAR.jpg")) as img:
+        assert img.size == (max(avatar_service.AVATAR_SIZES),) * 2
+
+
+def test_oversized_upload_is_refused(client):
+    body = bytes(avatar_service.AVATAR_MAX_BYTES + 1)
+    response = client.post("/upload_user_picture", files={"file": ("big.jpg", body, "image/jpeg")})
+    assert response.status_code == 413
+
+
+def test_not_a_picture(client):
+    response = client.post("/upload_user_picture", files={"file": ("notes.jpg", b"not an image", "image/jpeg")})
+    assert response.status_code == 400
+    assert client.post("/upload_user_picture", data={"other": "x"}).status_code == 400
@@ -0,0 +1,66 @@
+# tests/test_database_concurrency.py
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import main
+from my_package.auth import create_access_token, get_password_hash
+from my_package.database import Base, SessionLocal, engine
+from my_package.models import User
+
+THREADS = 4
+REQUESTS_PER_THREAD = 25
+
+
+def test_connections_use_wal():
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() > 0
+
+
+def test_concurrent_playlist_reads_and_writes():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(username="LOAD", hashed_password=get_password_hash("load-password"), settings="{}"))
+        db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'LOAD'})}"}
+    songs = [f"Artist/Album/{i:03d} Track.flac" for i in range(200)]
+    errors = []
+    start = threading.Barrier(THREADS * 2)
+
+    def reader():
+        # Without `with`, every request runs on its own event loop thread,
+        # so the threads really do hit the database at the same time
+        client = TestClient(main.app)
+        start.wait()
+        for _ in range(REQUESTS_PER_THREAD):
+            try:
+                response = client.get("/pc_get_playlist_List", headers=headers)
+                if response.status_code != 200:
+                    errors.append(response.text)
+            except Exception as e:
+                errors.append(repr(e))
+
+    def writer(n):
+        client = TestClient(main.app)
+        start.wait()
+        for i in range(REQUESTS_PER_THREAD):
+            try:
+                response = client.post(f"/pc_playlist_saveto_list/load-{n}", json={"songs": songs[i % 7:]},
+                                       headers=headers)
+                if response.status_code != 200:
+                    errors.append(response.text)
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=reader) for _ in range(THREADS)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    names = TestClient(main.app).get("/pc_get_playlist_List", headers=headers).json()["names"]
+    assert sorted(names) == [f"load-{n}" for n in range(THREADS)]
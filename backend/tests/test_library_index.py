@@ -0,0 +1,48 @@
+# tests/test_library_index.py
+import os
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from my_package.database import Base
+from my_package.library_index import LibraryIndex, LibrarySnapshot
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/library.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def make_tree(root, paths):
+    for path in paths:
+        full_path = root / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_bytes(b"x" * 10)
+
+
+def test_snapshot_round_trip_and_incremental_save(tmp_path, session_factory):
+    music = tmp_path / "music"
+    make_tree(music, ["a/1.mp3", "a/2.flac", "b/c/3.mp3", "b/cover.jpg"])
+    LibraryIndex(str(music), snapshot=LibrarySnapshot(session_factory)).scan()
+
+    loaded = LibraryIndex(str(music), snapshot=LibrarySnapshot(session_factory))
+    assert loaded.load()
+    assert loaded.files_under("") == ["a/1.mp3", "a/2.flac", "b/c/3.mp3"]
+    assert loaded.file_stat("a/1.mp3")[0] == 10
+
+    # Changes made while the app was down are picked up and saved again
+    shutil.rmtree(music / "b")
+    make_tree(music, ["a/4.mp3", "d/5.mp3"])
+    os.utime(music / "a", ns=(1, 1))
+    assert loaded.refresh()
+
+    again = LibraryIndex(str(music), snapshot=LibrarySnapshot(session_factory))
+    assert again.load()
+    assert again.files_under("") == ["a/1.mp3", "a/2.flac", "a/4.mp3", "d/5.mp3"]
+    assert again.list_dir("b") is None
+    assert not again.refresh()
@@ -0,0 +1,40 @@
+# tests/test_media_files.py
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from tests.media_fixtures import set_tags, write_flac
+
+
+@pytest.fixture
+def music(tmp_path, monkeypatch):
+    write_flac(tmp_path / "a" / "1.flac", title="First")
+    monkeypatch.setattr(main, "music_Basefolder", f"{tmp_path}/")
+    return tmp_path
+
+
+def test_music_is_revalidated_and_retagging_changes_the_etag(music):
+    client = TestClient(main.app)
+    first = client.get("/music/a/1.flac")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert "immutable" not in first.headers["cache-control"]
+    etag = first.headers["etag"]
+    assert client.get("/music/a/1.flac", headers={"If-None-Match": etag}).status_code == 304
+
+    path = music / "a" / "1.flac"
+    set_tags(path, title="Retagged")
+    later = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(later, later))
+    second = client.get("/music/a/1.flac", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+    assert second.content == path.read_bytes()
+
+
+def test_ranges_are_still_served(music):
+    response = TestClient(main.app).get("/music/a/1.flac", headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == b"fLaC"
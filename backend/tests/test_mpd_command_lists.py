@@ -0,0 +1,84 @@
+# tests/test_mpd_command_lists.py
+import pytest
+
+from my_package.mpd_controller import MPDClientController
+
+
+@pytest.fixture
+def player(fake_mpd):
+    controller = MPDClientController(host=fake_mpd.host, port=fake_mpd.port, command_list_chunk_size=4)
+    controller.connect()
+    fake_mpd.round_trips = 0
+    yield controller
+    controller.disconnect()
+
+
+def test_command_list_is_one_round_trip_per_chunk(fake_mpd, player):
+    songs = [f"a/{i}.mp3" for i in range(10)]
+    assert player._execute_command_list("playlistadd", [("p", uri) for uri in songs]) == []
+    assert fake_mpd.playlists["p"] == songs
+    assert fake_mpd.round_trips == 3
+
+
+def test_failed_command_is_reported_and_rest_of_chunk_resent(fake_mpd, player):
+    songs = [f"a/{i}.mp3" for i in range(10)]
+    fake_mpd.missing = {"a/2.mp3", "a/3.mp3", "a/9.mp3"}
+
+    failures = player._execute_command_list("playlistadd", [("p", uri) for uri in songs])
+
+    assert [failure["uri"] for failure in failures] == ["a/2.mp3", "a/3.mp3", "a/9.mp3"]
+    assert failures[0]["error"].startswith("[50@2]")
+    # MPD stops at the failing command; everything after it is sent again
+    assert fake_mpd.playlists["p"] == [uri for uri in songs if uri not in fake_mpd.missing]
+    # [0-3] fails at 2, [3] fails at 0, [4-7], [8-9] fails at 1
+    assert fake_mpd.round_trips == 4
+
+
+def test_save_selection_replaces_playlist_and_reports_failures(fake_mpd, player):
+    fake_mpd.playlists["mix"] = ["old.mp3"]
+    fake_mpd.playlists_modified["mix"] = "2025-01-01T00:00:00Z"
+    fake_mpd.missing = {"b.mp3"}
+
+    result = player.pi_save_selection_to_playlist("mix", ["a.mp3", "b.mp3", "c.mp3"])
+
+    assert result["added"] == 2
+    assert [failure["uri"] for failure in result["failed"]] == ["b.mp3"]
+    assert fake_mpd.playlists == {"mix": ["a.mp3", "c.mp3"]}
+
+
+def test_save_selection_keeps_playlist_when_nothing_could_be_added(fake_mpd, player):
+    fake_mpd.playlists["mix"] = ["old.mp3"]
+    fake_mpd.playlists_modified["mix"] = "2025-01-01T00:00:00Z"
+    fake_mpd.missing = {"gone.mp3"}
+
+    result = player.pi_save_selection_to_playlist("mix", ["gone.mp3"])
+
+    assert result["added"] == 0
+    assert fake_mpd.playlists == {"mix": ["old.mp3"]}
+
+
+def test_playlist_add_folder_batches_files_from_disk(fake_mpd, player, tmp_path):
+    for name in ("1.mp3", "2.flac", "cover.jpg", "sub/3.mp3"):
+        (tmp_path / "album" / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "album" / name).write_bytes(b"")
+    player.music_base_path = str(tmp_path)
+
+    result = player.playlist_add_folder("p", "album")
+
+    assert result["added"] == 3
+    assert sorted(fake_mpd.playlists["p"]) == ["album/1.mp3", "album/2.flac", "album/sub/3.mp3"]
+    assert fake_mpd.round_trips == 1
+
+
+def test_radio_streams_replace_the_queue(fake_mpd, player):
+    fake_mpd.queue = [{"file": "song.mp3"}]
+    fake_mpd.missing = {"http://down.example/stream"}
+
+    failures = player.queue_load_radiostreams({
+        "one": "http://one.example/stream",
+        "down": "http://down.example/stream",
+        "two": "http://two.example/stream",
+    })
+
+    assert [failure["uri"] for failure in failures] == ["http://down.example/stream"]
+    assert [song["file"] for song in fake_mpd.queue] == ["http://one.example/stream", "http://two.example/stream"]
@@ -0,0 +1,65 @@
+# tests/test_mpd_pool.py
+import asyncio
+import time
+
+from my_package.mpd_pool import MPDConnectionPool
+
+
+def make_pool(fake, size=4):
+    pool = MPDConnectionPool(host=fake.host, port=fake.port, size=size)
+    for controller in pool.controllers:
+        # A garbled reply fails the test instead of hanging it
+        controller.client.timeout = 5
+    return pool
+
+
+def test_commands_run_in_parallel_off_the_event_loop(fake_mpd):
+    fake_mpd.delay = 0.2
+
+    async def scenario():
+        pool = make_pool(fake_mpd)
+        await pool.connect()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        started = time.monotonic()
+        results = await asyncio.gather(*(pool.run("get_status") for _ in range(4)))
+        elapsed = time.monotonic() - started
+        ticking.cancel()
+        pool.disconnect()
+        return results, elapsed, ticks
+
+    results, elapsed, ticks = asyncio.run(scenario())
+    assert all(status["state"] == "play" for status in results)
+    # Four 0.2 s commands on four connections, not one after the other
+    assert elapsed < 0.5
+    # The loop kept running while MPD was slow
+    assert ticks >= 10
+
+
+def test_connect_does_not_interleave_with_running_commands(fake_mpd):
+    fake_mpd.queue = [{"file": f"music/{i}.mp3"} for i in range(200)]
+
+    async def scenario():
+        pool = make_pool(fake_mpd, size=2)
+        await pool.connect()
+
+        async def reconnect_repeatedly():
+            for _ in range(50):
+                await pool.connect()
+
+        queues = asyncio.gather(*(pool.run("queue_get_songs") for _ in range(100)))
+        _, results = await asyncio.gather(reconnect_repeatedly(), queues)
+        pool.disconnect()
+        return results
+
+    # ping() sent on a socket in the middle of a playlistinfo reply would
+    # corrupt that reply or the next one
+    for songs in asyncio.run(scenario()):
+        assert len(songs) == 200
@@ -0,0 +1,112 @@
+# tests/test_pagination.py
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from my_package.mpd_pool import MPDConnectionPool
+from my_package.pagination import decode_cursor, encode_cursor, page
+from my_package.stored_playlists import StoredPlaylistPages
+from tests.fake_mpd import FakeMPD
+
+PATHS = [f"a/{i:02d}.mp3" for i in range(10)]
+
+
+def test_sorted_key_pages_are_stable_when_items_are_added():
+    first, cursor = page(PATHS, limit=4, sorted_keys=True)
+    assert first == PATHS[:4]
+    assert decode_cursor(cursor) == "a/03.mp3"
+    second, _ = page(sorted(PATHS + ["a/00b.mp3"]), limit=4, cursor=cursor, sorted_keys=True)
+    assert second == PATHS[4:8]
+
+
+@pytest.mark.parametrize("value", [5, None, ["a"], {"a": 1}])
+def test_non_string_cursor_on_sorted_keys_is_rejected(value):
+    # e.g. an offset cursor from /pi_queue_songs sent to /pc_get_allfiles
+    with pytest.raises(HTTPException) as error:
+        page(PATHS, limit=4, cursor=encode_cursor(value), sorted_keys=True)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("value", ["a/03.mp3", -1, True, 1.5])
+def test_non_offset_cursor_is_rejected(value):
+    with pytest.raises(HTTPException) as error:
+        page(PATHS, limit=4, cursor=encode_cursor(value))
+    assert error.value.status_code == 400
+
+
+def read_all_pages(fake, count=7):
+    async def scenario():
+        pool = MPDConnectionPool(host=fake.host, port=fake.port, size=2)
+        pages = StoredPlaylistPages(pool)
+        songs, start, more = [], 0, True
+        while more:
+            window, more = await pages.window("big", start, count)
+            songs += window
+            start += len(window)
+        pool.disconnect()
+        return songs
+
+    return [song["file"] for song in asyncio.run(scenario())]
+
+
+def full_reads(fake):
+    return sum(1 for name, args in fake.commands if name == "listplaylistinfo" and len(args) == 1)
+
+
+@pytest.mark.parametrize("version", ["0.23.5", "0.24.0"])
+def test_stored_playlist_pages(version):
+    songs = [f"music/{i:03d}.flac" for i in range(30)]
+    with FakeMPD(version=version) as fake:
+        fake.playlists["big"] = list(songs)
+        fake.playlists_modified["big"] = "2025-01-01T00:00:00Z"
+
+        assert read_all_pages(fake) == songs
+        if version == "0.23.5":
+            # One full read, then every page is cut from the copy
+            assert full_reads(fake) == 1
+        else:
+            assert full_reads(fake) == 0
+            assert [args[1] for name, args in fake.commands if name == "listplaylistinfo"][:2] == ["0:8", "7:15"]
+
+
+def test_copy_is_refreshed_when_the_playlist_changes():
+    with FakeMPD() as fake:
+        fake.playlists["big"] = [f"music/{i:03d}.flac" for i in range(10)]
+        fake.playlists_modified["big"] = "2025-01-01T00:00:00Z"
+        read_all_pages(fake)
+        fake.playlists["big"].append("music/new.flac")
+        fake.playlists_modified["big"] = "2025-01-02T00:00:00Z"
+
+        assert read_all_pages(fake)[-1] == "music/new.flac"
+        assert full_reads(fake) == 2
+
+
+@pytest.fixture
+def app_client(fake_mpd, monkeypatch):
+    import main
+    pool = MPDConnectionPool(host=fake_mpd.host, port=fake_mpd.port, size=2)
+    monkeypatch.setattr(main, "mpd_pool", pool)
+    monkeypatch.setattr(main, "stored_playlists", StoredPlaylistPages(pool))
+    yield TestClient(main.app)
+    pool.disconnect()
+
+
+def test_playlist_songsinfo_endpoint_pages(fake_mpd, app_client):
+    fake_mpd.playlists["big"] = [f"music/{i:03d}.flac" for i in range(12)]
+    fake_mpd.playlists_modified["big"] = "2025-01-01T00:00:00Z"
+
+    files, cursor = [], None
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        body = app_client.get("/pi_playlist_songsinfo/big", params=params).json()
+        files += [song["file"] for song in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert files == fake_mpd.playlists["big"]
+    # The whole list, as before, without a limit
+    assert len(app_client.get("/pi_playlist_songsinfo/big").json()) == 12
+    bad = app_client.get("/pi_playlist_songsinfo/big", params={"limit": 5, "cursor": encode_cursor("x")})
+    assert bad.status_code == 400
@@ -0,0 +1,148 @@
+# tests/test_podcast_downloader.py
+import os
+import threading
+import time
+
+import pytest
+
+from my_package.podcast_downloader import PART_SUFFIX, PodcastDownloader
+from tests.http_stub import StubHTTPServer
+
+EPISODE = bytes(range(256)) * 4096 # 1 MiB
+
+
+@pytest.fixture
+def stub():
+    with StubHTTPServer() as server:
+        server.files["/episode.mp3"] = {"body": EPISODE}
+        yield server
+
+
+def download(stub, tmp_path, **options):
+    path = str(tmp_path / "episode.mp3")
+    with PodcastDownloader(chunk_size=64 * 1024, **options) as downloader:
+        return downloader.download(stub.url("/episode.mp3"), path, "Episode"), path
+
+
+def ranges(stub):
+    return [headers.get("Range") for _, headers in stub.requests]
+
+
+def test_download_is_renamed_into_place(stub, tmp_path):
+    result, path = download(stub, tmp_path)
+    assert result.status == "downloaded"
+    assert open(path, "rb").read() == EPISODE
+    assert not os.path.exists(path + PART_SUFFIX)
+    assert result.size == result.bytes_received == len(EPISODE)
+    assert result.throughput > 0
+
+
+def test_dropped_connection_resumes_with_range(stub, tmp_path):
+    stub.files["/episode.mp3"]["cut_after"] = 300_000
+    result, path = download(stub, tmp_path)
+
+    assert result.status == "downloaded" and result.attempts == 2
+    assert ranges(stub)[0] is None
+    # The retry asked only for what the .part file was missing
+    resumed_at = int(ranges(stub)[1].removeprefix("bytes=").rstrip("-"))
+    assert 0 < resumed_at <= 300_000
+    assert stub.statuses == [200, 206]
+    assert open(path, "rb").read() == EPISODE
+
+
+def test_next_run_resumes_the_part_file(stub, tmp_path):
+    path = str(tmp_path / "episode.mp3")
+    with open(path + PART_SUFFIX, "wb") as f:
+        f.write(EPISODE[:400_000])
+
+    result, path = download(stub, tmp_path)
+    assert result.status == "downloaded" and result.resumed_from == 400_000
+    assert ranges(stub) == ["bytes=400000-"]
+    assert result.bytes_received == len(EPISODE) - 400_000
+    assert open(path, "rb").read() == EPISODE
+
+
+def test_server_without_range_support_restarts(stub, tmp_path):
+    stub.files["/episode.mp3"]["ignore_range"] = True
+    with open(str(tmp_path / "episode.mp3") + PART_SUFFIX, "wb") as f:
+        f.write(EPISODE[:400_000])
+
+    result, path = download(stub, tmp_path)
+    assert stub.statuses == [200]
+    assert result.status == "downloaded"
+    assert open(path, "rb").read() == EPISODE
+
+
+def test_416_with_a_complete_part_file(stub, tmp_path):
+    with open(str(tmp_path / "episode.mp3") + PART_SUFFIX, "wb") as f:
+        f.write(EPISODE)
+
+    result, path = download(stub, tmp_path)
+    assert stub.statuses == [416]
+    assert result.status == "downloaded" and result.bytes_received == 0
+    assert open(path, "rb").read() == EPISODE
+
+
+def test_416_with_an_oversized_part_file_starts_over(stub, tmp_path):
+    with open(str(tmp_path / "episode.mp3") + PART_SUFFIX, "wb") as f:
+        f.write(EPISODE + b"stale tail")
+
+    result, path = download(stub, tmp_path)
+    assert stub.statuses == [416, 200]
+    assert result.status == "downloaded" and result.attempts == 2
+    assert open(path, "rb").read() == EPISODE
+
+
+def test_short_download_is_never_renamed(stub, tmp_path):
+    # Content-Range promises more than the server sends
+    stub.files["/episode.mp3"]["declared_size"] = len(EPISODE) + 1000
+    with open(str(tmp_path / "episode.mp3") + PART_SUFFIX, "wb") as f:
+        f.write(EPISODE[:1000])
+
+    result, path = download(stub, tmp_path, attempts=1)
+    assert result.status == "failed"
+    assert result.error == f"got {len(EPISODE)} of {len(EPISODE) + 1000} bytes"
+    assert not os.path.exists(path)
+    # Kept for the next attempt to resume
+    assert os.path.getsize(path + PART_SUFFIX) == len(EPISODE)
+
+
+def test_oversized_download_is_discarded(stub, tmp_path):
+    stub.files["/episode.mp3"]["declared_size"] = len(EPISODE) - 1000
+    with open(str(tmp_path / "episode.mp3") + PART_SUFFIX, "wb") as f:
+        f.write(EPISODE[:1000])
+
+    result, path = download(stub, tmp_path, attempts=1)
+    assert result.status == "failed"
+    assert not os.path.exists(path) and not os.path.exists(path + PART_SUFFIX)
+
+
+def test_existing_file_is_skipped(stub, tmp_path):
+    (tmp_path / "episode.mp3").write_bytes(b"done")
+    result, _ = download(stub, tmp_path)
+    assert result.status == "skipped" and stub.requests == []
+
+
+def test_cancel_keeps_the_part_file(stub, tmp_path):
+    cancel = threading.Event()
+    stub.files["/episode.mp3"]["body"] = EPISODE * 4
+    path = str(tmp_path / "episode.mp3")
+    with PodcastDownloader(chunk_size=64 * 1024, cancel_event=cancel) as downloader:
+        future = downloader.submit(stub.url("/episode.mp3"), path, on_start=cancel.set)
+        result = future.result()
+    assert result.status == "cancelled"
+    assert not os.path.exists(path)
+    assert os.path.exists(path + PART_SUFFIX)
+
+
+def test_workers_download_in_parallel(stub, tmp_path):
+    stub.delay = 0.3
+    for n in range(4):
+        stub.files[f"/{n}.mp3"] = {"body": EPISODE[:10_000]}
+    started = time.monotonic()
+    with PodcastDownloader(workers=4) as downloader:
+        futures = [downloader.submit(stub.url(f"/{n}.mp3"), str(tmp_path / f"{n}.mp3")) for n in range(4)]
+        results = [future.result() for future in futures]
+    assert [result.status for result in results] == ["downloaded"] * 4
+    # Four 0.3 s replies, one after another, would take 1.2 s
+    assert time.monotonic() - started < 0.9
@@ -0,0 +1,140 @@
+# tests/test_podcast_feeds.py
+import asyncio
+
+import pytest
+
+from my_package import podcast_service
+from my_package.podcast_service import PodcastFeedService
+from tests.http_stub import StubHTTPServer
+
+
+def rss(*titles):
+    items = "".join(
+        f"<item><guid>{title}</guid><title>{title}</title>"
+        f"<enclosure url=\"http://example.com/{title}.mp3\" length=\"1000\" type=\"audio/mpeg\"/></item>"
+        for title in titles
+    )
+    return f"<?xml version=\"1.0\"?><rss version=\"2.0\"><channel><title>Fixture</title>{items}</channel></rss>".encode()
+
+
+@pytest.fixture
+def stub():
+    with StubHTTPServer() as server:
+        server.files["/feed.xml"] = {"body": rss("one", "two", "three"), "etag": '"v1"',
+                                     "last_modified": "Mon, 06 Oct 2025 08:00:00 GMT"}
+        yield server
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Counts feedparser runs, i.e. bodies that were parsed rather than reused."""
+    calls = []
+    parse = podcast_service.feedparser.parse
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return parse(*args, **kwargs)
+
+    monkeypatch.setattr(podcast_service.feedparser, "parse", counting)
+    return calls
+
+
+def titles(data):
+    return [episode["title"] for episode in data["episodes"]]
+
+
+def test_one_fetch_serves_every_limit(stub, parses):
+    async def scenario():
+        service = PodcastFeedService()
+        pages = [await service.get_feed(stub.url("/feed.xml"), limit) for limit in (None, 1, 2)]
+        await service.close()
+        return pages
+
+    full, one, two = asyncio.run(scenario())
+    assert titles(full) == ["one", "two", "three"]
+    assert titles(one) == ["one"] and titles(two) == ["one", "two"]
+    assert full["episodes"][0]["audio_url"] == "http://example.com/one.mp3"
+    assert len(stub.requests) == 1 and len(parses) == 1
+
+
+def test_expired_feed_is_revalidated(stub, parses):
+    async def scenario():
+        # ttl=0: every call asks the server again
+        service = PodcastFeedService(ttl=0)
+        first = await service.get_feed(stub.url("/feed.xml"))
+        second = await service.get_feed(stub.url("/feed.xml"))
+        stub.files["/feed.xml"].update(body=rss("zero", "one", "two", "three"), etag='"v2"',
+                                       last_modified="Tue, 07 Oct 2025 08:00:00 GMT")
+        third = await service.get_feed(stub.url("/feed.xml"))
+        await service.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert stub.statuses == [200, 304, 200]
+    _, conditional = stub.requests[1]
+    assert conditional["If-None-Match"] == '"v1"'
+    assert conditional["If-Modified-Since"] == "Mon, 06 Oct 2025 08:00:00 GMT"
+    # The 304 reused the parsed copy
+    assert len(parses) == 2
+    assert second is first
+    assert titles(third) == ["zero", "one", "two", "three"]
+
+
+def test_last_modified_alone_is_used(stub):
+    stub.files["/feed.xml"].pop("etag")
+
+    async def scenario():
+        service = PodcastFeedService(ttl=0)
+        await service.get_feed(stub.url("/feed.xml"))
+        await service.get_feed(stub.url("/feed.xml"))
+        await service.close()
+
+    asyncio.run(scenario())
+    assert stub.statuses == [200, 304]
+    assert "If-None-Match" not in stub.requests[1][1]
+
+
+def test_concurrent_requests_share_one_fetch(stub, parses):
+    stub.delay = 0.2
+
+    async def scenario():
+        service = PodcastFeedService()
+        results = await asyncio.gather(*(service.get_feed(stub.url("/feed.xml"), limit)
+                                         for limit in (None, 1, 2, 3, None, 1, 2, 3)))
+        await service.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(stub.requests) == 1 and len(parses) == 1
+    assert [len(result["episodes"]) for result in results] == [3, 1, 2, 3, 3, 1, 2, 3]
+
+
+def test_cancelled_waiter_does_not_cancel_the_fetch(stub):
+    stub.delay = 0.2
+
+    async def scenario():
+        service = PodcastFeedService()
+        impatient = asyncio.create_task(service.get_feed(stub.url("/feed.xml")))
+        patient = asyncio.create_task(service.get_feed(stub.url("/feed.xml"), 2))
+        await asyncio.sleep(0.05)
+        impatient.cancel()
+        result = await patient
+        await service.close()
+        return result
+
+    assert titles(asyncio.run(scenario())) == ["one", "two"]
+    assert len(stub.requests) == 1
+
+
+def test_server_error_serves_the_cached_copy(stub):
+    async def scenario():
+        service = PodcastFeedService(ttl=0)
+        first = await service.get_feed(stub.url("/feed.xml"))
+        del stub.files["/feed.xml"]
+        second = await service.get_feed(stub.url("/feed.xml"))
+        await service.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert stub.statuses == [200, 404]
+    assert titles(second) == titles(first)
@@ -0,0 +1,110 @@
+# tests/test_tag_index.py
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import my_package.tag_index as tag_index_module
+from my_package.database import Base
+from my_package.library_index import LibraryIndex
+from my_package.tag_index import TagIndex, build_match_query
+from tests.media_fixtures import set_tags, write_flac
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "tags.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 5})
+    Base.metadata.create_all(bind=engine)
+    yield path, sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def music(tmp_path):
+    root = tmp_path / "music"
+    write_flac(root / "a" / "1.flac", title="First", artist="周杰倫")
+    write_flac(root / "a" / "2.flac", title="Second")
+    write_flac(root / "b" / "3.flac", title="Third")
+    return root
+
+
+def make_index(music, session_factory):
+    library = LibraryIndex(str(music))
+    library.scan()
+    tags = TagIndex(library, session_factory)
+    tags.ensure_schema()
+    return library, tags
+
+
+def titles(tags, query):
+    return [item["title"] for item in tags.search(query)["items"]]
+
+
+def test_sync_indexes_new_and_removed_files(music, database):
+    _, session_factory = database
+    library, tags = make_index(music, session_factory)
+
+    assert tags.sync() == (3, 0)
+    assert titles(tags, "周杰") == ["First"]
+    assert tags.sync() == (0, 0)
+
+    os.remove(music / "b" / "3.flac")
+    library.refresh()
+    assert tags.sync() == (0, 1)
+    assert titles(tags, "third") == []
+
+
+def test_mixed_script_query_without_space(music, database):
+    _, session_factory = database
+    write_flac(music / "b" / "4.flac", title="Fourth", artist="Jay周杰倫")
+    _, tags = make_index(music, session_factory)
+    tags.sync()
+
+    assert build_match_query("Jay周杰倫") == '"Jay"* "周 杰 倫"'
+    assert titles(tags, "Jay周杰倫") == ["Fourth"]
+    assert titles(tags, "Jay 周杰倫") == ["Fourth"]
+
+
+def test_file_retagged_in_place_is_found_by_restat(music, database):
+    _, session_factory = database
+    library, tags = make_index(music, session_factory)
+    tags.sync()
+
+    path = music / "a" / "2.flac"
+    set_tags(path, title="Renamed")
+    later = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(later, later))
+    # Written in place: the folder's mtime, and so the library index, did not change
+    assert not library.refresh()
+    assert tags.sync() == (0, 0)
+
+    assert tags.sync(restat=True) == (1, 0)
+    assert titles(tags, "renamed") == ["Renamed"]
+    # The library index still has the old mtime; that must not re-read the file every time
+    assert tags.sync() == (0, 0)
+
+
+def test_write_lock_is_not_held_while_tags_are_read(music, database, monkeypatch):
+    db_path, session_factory = database
+    for i in range(4, 8):
+        write_flac(music / "c" / f"{i}.flac", title=f"Track {i}")
+    library, tags = make_index(music, session_factory)
+    monkeypatch.setattr(tag_index_module, "SYNC_BATCH_SIZE", 3)
+
+    read_tags = tag_index_module.read_tags
+    writes = []
+
+    def read_tags_while_someone_writes(full_path):
+        # Another writer (e.g. a playlist save) must get the lock right away
+        with sqlite3.connect(db_path, timeout=0.2) as other:
+            other.execute("CREATE TABLE IF NOT EXISTS other_writer (value TEXT)")
+            other.execute("INSERT INTO other_writer VALUES (?)", (full_path,))
+        writes.append(full_path)
+        return read_tags(full_path)
+
+    monkeypatch.setattr(tag_index_module, "read_tags", read_tags_while_someone_writes)
+    assert tags.sync() == (7, 0)
+    assert len(writes) == 7
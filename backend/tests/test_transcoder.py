@@ -0,0 +1,201 @@
+# tests/test_transcoder.py
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from my_package.transcoder import TranscodeResponse, Transcoder
+from tests.media_fixtures import write_wav
+
+# Stands in for ffmpeg: copies the input file to stdout behind a marker,
+# after writing `stderr_bytes` of noise to stderr (more than a pipe holds)
+FAKE_FFMPEG = """#!{python}
+import sys, time
+args = sys.argv[1:]
+source = args[args.index("-i") + 1]
+sys.stderr.buffer.write(b"x" * {stderr_bytes})
+sys.stderr.flush()
+time.sleep({delay})
+sys.stdout.buffer.write(b"FAKE " + args[args.index("-f") + 1].encode() + b"\\n")
+with open(source, "rb") as f:
+    sys.stdout.buffer.write(f.read())
+sys.exit({exit_code})
+"""
+
+
+def fake_ffmpeg(tmp_path, stderr_bytes=0, delay=0.0, exit_code=0):
+    path = tmp_path / f"ffmpeg-{stderr_bytes}-{delay}-{exit_code}"
+    path.write_text(FAKE_FFMPEG.format(python=sys.executable, stderr_bytes=stderr_bytes, delay=delay,
+                                       exit_code=exit_code))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def music(tmp_path):
+    folder = tmp_path / "music"
+    write_wav(folder / "Album" / "tone.wav")
+    return folder
+
+
+def cache_files(transcoder):
+    return sorted(name for _, _, files in os.walk(transcoder.cache_dir) for name in files)
+
+
+async def transcode(transcoder, source, cache_path, format="opus"):
+    job = await transcoder.open(str(source), cache_path, format, "96k")
+    return b"".join([chunk async for chunk in job.chunks()])
+
+
+def test_output_is_streamed_and_cached(tmp_path, music):
+    transcoder = Transcoder(cache_dir=str(tmp_path / "cache"), ffmpeg=fake_ffmpeg(tmp_path))
+    source = music / "Album" / "tone.wav"
+    cache_path = transcoder.cache_path("Album/tone.wav", os.stat(source), "opus", "96k")
+
+    output = asyncio.run(transcode(transcoder, source, cache_path))
+    assert output == b"FAKE ogg\n" + source.read_bytes()
+    assert open(cache_path, "rb").read() == output
+    assert cache_files(transcoder) == [os.path.basename(cache_path)]
+
+
+def test_noisy_stderr_does_not_stall_ffmpeg(tmp_path, music):
+    # 1 MB of errors, e.g. from a corrupt file, is far more than a pipe buffers
+    transcoder = Transcoder(cache_dir=str(tmp_path / "cache"), max_concurrent=1,
+                            ffmpeg=fake_ffmpeg(tmp_path, stderr_bytes=1024 * 1024, exit_code=1))
+    source = music / "Album" / "tone.wav"
+    cache_path = transcoder.cache_path("Album/tone.wav", os.stat(source), "opus", "96k")
+
+    async def scenario():
+        await asyncio.wait_for(transcode(transcoder, source, cache_path), timeout=10)
+        # The failed transcode gave its slot back
+        job = await asyncio.wait_for(transcoder.open(str(source), cache_path, "opus", "96k"), timeout=1)
+        await job.close()
+
+    asyncio.run(scenario())
+    assert cache_files(transcoder) == []
+
+
+def test_slot_is_freed_when_the_client_leaves_before_the_response(tmp_path, music):
+    transcoder = Transcoder(cache_dir=str(tmp_path / "cache"), max_concurrent=1,
+                            ffmpeg=fake_ffmpeg(tmp_path, delay=5))
+    source = music / "Album" / "tone.wav"
+    cache_path = transcoder.cache_path("Album/tone.wav", os.stat(source), "opus", "96k")
+
+    async def gone(message):
+        raise OSError("client disconnected")
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def scenario():
+        job = await transcoder.open(str(source), cache_path, "opus", "96k")
+        with pytest.raises(OSError):
+            await TranscodeResponse(job, "audio/ogg")({"type": "http", "method": "GET"}, receive, gone)
+        assert job.process.returncode is not None
+        next_job = await asyncio.wait_for(transcoder.open(str(source), cache_path, "opus", "96k"), timeout=1)
+        # Closing twice, and without ever iterating, is fine
+        await next_job.close()
+        await next_job.close()
+        return next_job
+
+    job = asyncio.run(scenario())
+    assert job.process.returncode is not None
+    assert cache_files(transcoder) == []
+
+
+def test_cancelled_stream_frees_the_slot(tmp_path, music):
+    transcoder = Transcoder(cache_dir=str(tmp_path / "cache"), max_concurrent=1,
+                            ffmpeg=fake_ffmpeg(tmp_path, delay=5))
+    source = music / "Album" / "tone.wav"
+    cache_path = transcoder.cache_path("Album/tone.wav", os.stat(source), "opus", "96k")
+
+    async def scenario():
+        task = asyncio.create_task(transcode(transcoder, source, cache_path))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        job = await asyncio.wait_for(transcoder.open(str(source), cache_path, "opus", "96k"), timeout=1)
+        await job.close()
+
+    asyncio.run(scenario())
+    assert cache_files(transcoder) == []
+
+
+def test_trim_evicts_the_least_recently_played(tmp_path):
+    transcoder = Transcoder(cache_dir=str(tmp_path / "cache"), max_bytes=2500)
+    paths = []
+    for n in range(3):
+        path = tmp_path / "cache" / "ab" / f"{n}.opus"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(bytes(1000))
+        # Written newest first, played oldest first
+        os.utime(path, (1000 + n, 2000 - n))
+        paths.append(path)
+    mtimes = [path.stat().st_mtime_ns for path in paths]
+    assert transcoder.cached(str(paths[0]))
+    assert [path.stat().st_mtime_ns for path in paths] == mtimes
+
+    transcoder.trim()
+    assert [path.exists() for path in paths] == [True, False, True]
+
+
+@pytest.fixture
+def client(tmp_path, music, monkeypatch):
+    monkeypatch.setattr(main, "music_Basefolder", str(music) + "/")
+    monkeypatch.setattr(main, "transcoder", Transcoder(cache_dir=str(tmp_path / "cache"), ffmpeg=fake_ffmpeg(tmp_path)))
+    return TestClient(main.app)
+
+
+def test_cached_transcode_keeps_its_validators(client, music):
+    first = client.get("/stream/Album/tone.wav")
+    assert first.status_code == 200 and first.content.startswith(b"FAKE ogg\n")
+    assert "etag" not in first.headers
+
+    cached = client.get("/stream/Album/tone.wav")
+    time.sleep(0.01)
+    again = client.get("/stream/Album/tone.wav")
+    assert cached.content == again.content == first.content
+    assert cached.headers["etag"] == again.headers["etag"]
+    assert cached.headers["last-modified"] == again.headers["last-modified"]
+
+    etag = cached.headers["etag"]
+    assert client.get("/stream/Album/tone.wav", headers={"If-None-Match": etag}).status_code == 304
+    partial = client.get("/stream/Album/tone.wav", headers={"Range": "bytes=9-", "If-Range": etag})
+    assert partial.status_code == 206 and partial.content == first.content[9:]
+    stale = client.get("/stream/Album/tone.wav", headers={"Range": "bytes=9-", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.content == first.content
+
+
+def test_stream_rejects_unknown_profiles(client):
+    assert client.get("/stream/Album/tone.wav", params={"format": "wma"}).status_code == 400
+    assert client.get("/stream/Album/tone.wav", params={"bitrate": "96"}).status_code == 400
+    assert client.get("/stream/Album/missing.wav").status_code == 404
+
+
+FFMPEG = shutil.which("ffmpeg")
+
+
+@pytest.mark.skipif(FFMPEG is None, reason="ffmpeg is not installed")
+@pytest.mark.parametrize("format", ["opus", "mp3", "aac"])
+@pytest.mark.parametrize("source_format", ["wav", "flac"])
+def test_real_ffmpeg(tmp_path, music, format, source_format):
+    source = music / "Album" / "tone.wav"
+    if source_format == "flac":
+        flac = music / "Album" / "tone.flac"
+        subprocess.run([FFMPEG, "-v", "error", "-i", str(source), str(flac)], check=True)
+        source = flac
+    transcoder = Transcoder(cache_dir=str(tmp_path / "cache"), ffmpeg=FFMPEG)
+    cache_path = transcoder.cache_path(source.name, os.stat(source), format, "64k")
+
+    output = asyncio.run(transcode(transcoder, source, cache_path, format))
+    assert len(output) > 100
+    assert open(cache_path, "rb").read() == output
+    if format == "opus":
+        assert output.startswith(b"OggS")
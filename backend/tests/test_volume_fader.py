@@ -0,0 +1,129 @@
+# tests/test_volume_fader.py
+import asyncio
+import time
+
+import pytest
+
+from my_package.mpd_pool import MPDConnectionPool
+from my_package.volume_fader import SleepTimer, VolumeFader
+from tests.fake_mpd import FakeMPD
+
+# Slack for wall-clock assertions on a busy test machine
+TOLERANCE = 0.25
+
+
+def run_with_pool(fake, scenario):
+    async def main():
+        pool = MPDConnectionPool(host=fake.host, port=fake.port, size=2)
+        try:
+            return await scenario(pool)
+        finally:
+            pool.disconnect()
+
+    return asyncio.run(main())
+
+
+def sent(fake, name, since=0.0):
+    """(time, args) of each `name` command that arrived after `since`."""
+    return [(at, args) for (command, args), at in zip(fake.commands, fake.command_times)
+            if command == name and at >= since]
+
+
+@pytest.mark.parametrize("delay", [0.0, 0.05])
+def test_fade_finishes_on_time_with_bounded_steps(delay):
+    # With 50 ms per round trip the fade skips values instead of running late
+    with FakeMPD(delay=delay) as fake:
+        async def scenario(pool):
+            fader = VolumeFader(pool, min_interval=0.1)
+            started = time.monotonic()
+            steps = await fader.fade(0, 100, 1.0)
+            return steps, started, time.monotonic() - started
+
+        steps, started, elapsed = run_with_pool(fake, scenario)
+        setvols = sent(fake, "setvol", since=started)
+
+    assert 1.0 <= elapsed < 1.0 + TOLERANCE
+    # One command per min_interval at most, plus the first and the last value
+    assert steps == len(setvols) <= 1.0 / 0.1 + 2
+    volumes = [int(args[0]) for _, args in setvols]
+    assert volumes == sorted(volumes) and volumes[-1] == 100 == fake.volume
+    gaps = [b - a for (a, _), (b, _) in zip(setvols, setvols[1:])]
+    assert min(gaps) >= 0.1 - 0.02
+
+
+def test_fader_cancel_stops_the_fade():
+    with FakeMPD() as fake:
+        async def scenario(pool):
+            fader = VolumeFader(pool)
+            task = asyncio.create_task(fader.fade(80, 0, 1.0))
+            await asyncio.sleep(0.45)
+            fader.cancel()
+            return await task
+
+        assert run_with_pool(fake, scenario) is None
+        stopped_at = fake.volume
+        time.sleep(0.2)
+        assert 0 < fake.volume == stopped_at < 80
+
+
+def test_sleep_timer_fades_pauses_and_restores():
+    with FakeMPD() as fake:
+        fake.volume = 60
+
+        async def scenario(pool):
+            timer = SleepTimer(pool, VolumeFader(pool, min_interval=0.1))
+            started = time.monotonic()
+            # 1.5 s in total, the last 1 s of it fading
+            timer.start(minutes=1.5 / 60, fade_seconds=1.0)
+            await timer._task
+            return started
+
+        started = run_with_pool(fake, scenario)
+        setvols = sent(fake, "setvol")
+        (paused_at, pause_args), = sent(fake, "pause")
+
+    # The fade starts after the quiet part and the pause lands on the end time
+    assert 0.5 <= setvols[0][0] - started < 0.5 + TOLERANCE
+    assert 1.5 <= paused_at - started < 1.5 + TOLERANCE
+    assert pause_args == ["1"] and fake.state == "pause"
+    fade, restore = setvols[:-1], setvols[-1]
+    assert 5 <= len(fade) <= 1.0 / 0.1 + 2
+    assert fade[-1][1] == ["0"]
+    assert restore[0] >= paused_at and restore[1] == ["60"] and fake.volume == 60
+
+
+@pytest.mark.parametrize("action", ["cancel", "restart"])
+def test_cancel_during_the_fade_restores_the_volume(action):
+    with FakeMPD() as fake:
+        fake.volume = 60
+
+        async def scenario(pool):
+            timer = SleepTimer(pool, VolumeFader(pool, min_interval=0.1))
+            timer.start(minutes=1.0 / 60, fade_seconds=1.0)
+            task = timer._task
+            await asyncio.sleep(0.5)
+            assert 0 < fake.volume < 60
+            if action == "cancel":
+                timer.cancel()
+            else:
+                timer.start(minutes=10)
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            timer.cancel()
+
+        run_with_pool(fake, scenario)
+        assert fake.volume == 60
+        assert fake.state == "play" and sent(fake, "pause") == []
+
+
+def test_cancel_before_the_fade_sends_nothing():
+    with FakeMPD() as fake:
+        async def scenario(pool):
+            timer = SleepTimer(pool, VolumeFader(pool))
+            timer.start(minutes=1.0 / 60, fade_seconds=0.5)
+            await asyncio.sleep(0.1)
+            timer.cancel()
+            await asyncio.sleep(0.6)
+
+        run_with_pool(fake, scenario)
+        assert sent(fake, "setvol") == [] and sent(fake, "pause") == []
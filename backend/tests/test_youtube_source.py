@@ -0,0 +1,238 @@
+# tests/test_youtube_source.py
+import asyncio
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from my_package.database import Base, SessionLocal, engine
+from my_package.models import YouTubeVideo
+from my_package.mpd_events import MPDEventBroadcaster
+from my_package.mpd_pool import MPDConnectionPool
+from my_package.queue_cache import QueueCache
+from my_package.youtube_source import (
+    ResolveError, YouTubeSource, parse_expiry, parse_video_id, proxied_video_id, run_yt_dlp,
+)
+from tests.fake_mpd import FakeMPD
+
+VIDEO_IDS = ["dQw4w9WgXcQ", "9bZkp7q19f0", "kJQP7kiw5Fk", "OPf0YbXqDm0", "JGwWNGJdvx8", "RgKAFK5djSk"]
+
+
+class FakeResolver:
+    """Stands in for yt-dlp: answers after `delay` with a URL valid for `ttl` seconds."""
+
+    def __init__(self, delay=0.0, ttl=6 * 3600):
+        self.delay = delay
+        self.ttl = ttl
+        self.calls = []
+
+    async def __call__(self, target):
+        self.calls.append(target)
+        await asyncio.sleep(self.delay)
+        expire = int(time.time() + self.ttl)
+        return target, f"Title of {target}", f"https://rr1.googlevideo.com/videoplayback?id={target}&expire={expire}"
+
+
+def make_source(resolver, pool=None, queue_cache=None, keep_rows=False):
+    Base.metadata.create_all(bind=engine)
+    if not keep_rows:
+        with SessionLocal() as db:
+            db.query(YouTubeVideo).delete()
+            db.commit()
+    return YouTubeSource(SessionLocal, pool, queue_cache, resolver=resolver, proxy_base="http://pi:8001")
+
+
+@pytest.mark.parametrize("url, video_id", [
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42", "dQw4w9WgXcQ"),
+    ("https://youtu.be/dQw4w9WgXcQ?si=abc", "dQw4w9WgXcQ"),
+    ("https://music.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://m.youtube.com/shorts/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    (" dQw4w9WgXcQ ", "dQw4w9WgXcQ"),
+    ("https://soundcloud.com/artist/track", None),
+    ("https://www.youtube.com/playlist?list=PL123", None),
+    ("https://www.youtube.com/watch?v=short", None),
+])
+def test_parse_video_id(url, video_id):
+    assert parse_video_id(url) == video_id
+
+
+def test_parse_expiry_and_proxy_paths():
+    assert parse_expiry("https://x.googlevideo.com/videoplayback?expire=1700000000&id=1") == 1700000000
+    assert parse_expiry("https://x.googlevideo.com/videoplayback/expire/1700000000/id/1") == 1700000000
+    assert proxied_video_id("http://pi:8001/yt/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    assert proxied_video_id("https://example.com/stream.mp3") is None
+
+
+def test_streams_are_cached_in_memory_and_in_the_database():
+    resolver = FakeResolver()
+
+    async def scenario():
+        source = make_source(resolver)
+        first = await source.stream(VIDEO_IDS[0])
+        assert await source.stream(VIDEO_IDS[0]) is first
+        # A new instance, e.g. after a restart, reads the row
+        restarted = await make_source(resolver, keep_rows=True).stream(VIDEO_IDS[0])
+        return first, restarted
+
+    first, restarted = asyncio.run(scenario())
+    assert resolver.calls == [VIDEO_IDS[0]]
+    assert restarted.url == first.url and restarted.title == f"Title of {VIDEO_IDS[0]}"
+
+
+def test_stream_about_to_expire_is_resolved_again():
+    # Valid for 5 more minutes: inside the refresh margin
+    resolver = FakeResolver(ttl=5 * 60)
+
+    async def scenario():
+        source = make_source(resolver)
+        await source.stream(VIDEO_IDS[1])
+        await source.stream(VIDEO_IDS[1])
+
+    asyncio.run(scenario())
+    assert resolver.calls == [VIDEO_IDS[1]] * 2
+
+
+def test_concurrent_requests_share_one_resolve():
+    resolver = FakeResolver(delay=0.2)
+
+    async def scenario():
+        source = make_source(resolver)
+        return await asyncio.gather(*(source.stream(VIDEO_IDS[2]) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert resolver.calls == [VIDEO_IDS[2]]
+    assert len({id(result) for result in results}) == 1
+
+
+def test_non_youtube_url_is_refused():
+    resolver = FakeResolver()
+    with pytest.raises(ValueError):
+        asyncio.run(make_source(resolver).add("https://soundcloud.com/artist/track"))
+    assert resolver.calls == []
+
+
+@pytest.fixture
+def app(fake_mpd, monkeypatch):
+    pool = MPDConnectionPool(host=fake_mpd.host, port=fake_mpd.port, size=2)
+    resolver = FakeResolver()
+    monkeypatch.setattr(main, "mpd_pool", pool)
+    monkeypatch.setattr(main, "youtube", make_source(resolver, pool))
+    yield TestClient(main.app), resolver
+    pool.disconnect()
+
+
+def test_add_endpoint_stores_the_proxy_url(app, fake_mpd):
+    client, resolver = app
+    response = client.post("/playlist/add_youtube_song",
+                           json={"playlist_name": "mix", "youtube_url": f"https://youtu.be/{VIDEO_IDS[3]}"})
+    assert response.status_code == 200
+    assert response.json()["video_id"] == VIDEO_IDS[3]
+    assert fake_mpd.playlists["mix"] == [f"http://pi:8001/yt/{VIDEO_IDS[3]}"]
+
+    redirect = client.get(f"/yt/{VIDEO_IDS[3]}", follow_redirects=False)
+    assert redirect.status_code == 302
+    assert redirect.headers["location"].startswith("https://rr1.googlevideo.com/")
+    assert resolver.calls == [VIDEO_IDS[3]]
+
+
+def test_add_endpoint_refuses_other_sites(app, fake_mpd):
+    client, resolver = app
+    response = client.post("/playlist/add_youtube_song",
+                           json={"playlist_name": "mix", "youtube_url": "https://soundcloud.com/artist/track"})
+    assert response.status_code == 400
+    assert "mix" not in fake_mpd.playlists and resolver.calls == []
+    assert client.get("/yt/not-an-id").status_code == 404
+
+
+def test_redirect_only_resolves_added_videos(app, monkeypatch):
+    client, resolver = app
+    assert client.get(f"/yt/{VIDEO_IDS[0]}", follow_redirects=False).status_code == 404
+    assert client.head(f"/yt/{VIDEO_IDS[0]}").status_code == 404
+    assert resolver.calls == []
+
+    assert client.post("/playlist/add_youtube_song",
+                       json={"playlist_name": "mix", "youtube_url": VIDEO_IDS[0]}).status_code == 200
+    # Known from the youtube_videos table after a restart, too
+    monkeypatch.setattr(main, "youtube", make_source(resolver, main.mpd_pool, keep_rows=True))
+    assert client.get(f"/yt/{VIDEO_IDS[0]}", follow_redirects=False).status_code == 302
+    assert client.get(f"/yt/{VIDEO_IDS[1]}", follow_redirects=False).status_code == 404
+    assert resolver.calls == [VIDEO_IDS[0]]
+
+
+def test_prefetch_resolves_the_upcoming_entries():
+    queue = ["music/local.flac"] + [f"http://pi:8001/yt/{video_id}" for video_id in VIDEO_IDS]
+    with FakeMPD(songs=queue) as fake:
+        resolver = FakeResolver()
+
+        async def scenario():
+            pool = MPDConnectionPool(host=fake.host, port=fake.port, size=2)
+            await make_source(resolver, pool, QueueCache(pool)).prefetch_upcoming()
+            pool.disconnect()
+
+        asyncio.run(scenario())
+    # Current song 0, then the next three
+    assert sorted(resolver.calls) == sorted(VIDEO_IDS[:3])
+
+
+def test_prefetcher_listens_without_subscribing(fake_mpd):
+    fake_mpd.queue = [{"file": f"http://pi:8001/yt/{VIDEO_IDS[5]}"}]
+    resolver = FakeResolver()
+
+    async def scenario():
+        pool = MPDConnectionPool(host=fake_mpd.host, port=fake_mpd.port, size=2)
+        events = MPDEventBroadcaster(pool, QueueCache(pool), host=fake_mpd.host, port=fake_mpd.port)
+        built = []
+        build_event = events._build_event
+
+        async def counting(changed):
+            built.append(changed)
+            return await build_event(changed)
+
+        events._build_event = counting
+        source = make_source(resolver, pool, QueueCache(pool))
+        events.start()
+        source.start(events)
+        await asyncio.sleep(0.3)
+        before = len(resolver.calls)
+        # A new entry at the front becomes the current song
+        fake_mpd.queue.insert(0, {"file": f"http://pi:8001/yt/{VIDEO_IDS[4]}"})
+        # Reported as a player change
+        await pool.run("play")
+        await asyncio.sleep(0.5)
+        await source.stop()
+        await events.stop()
+        pool.disconnect()
+        return before, built
+
+    before, built = asyncio.run(scenario())
+    assert before == 1 and VIDEO_IDS[4] in resolver.calls
+    # Nobody subscribed, so the broadcaster read nothing for the prefetcher
+    assert built == []
+
+
+FAKE_YTDLP = """#!{python}
+import sys
+target = sys.argv[-1]
+if target == "broken":
+    sys.stderr.write("ERROR: Video unavailable\\n")
+    sys.exit(1)
+print(target)
+print("A title")
+print("https://rr1.googlevideo.com/videoplayback?expire=1700000000")
+"""
+
+
+def test_run_yt_dlp_with_a_stand_in_binary(tmp_path):
+    binary = tmp_path / "yt-dlp"
+    binary.write_text(FAKE_YTDLP.format(python=sys.executable))
+    binary.chmod(0o755)
+
+    assert asyncio.run(run_yt_dlp(VIDEO_IDS[0], binary=str(binary))) == (
+        VIDEO_IDS[0], "A title", "https://rr1.googlevideo.com/videoplayback?expire=1700000000")
+    with pytest.raises(ResolveError, match="Video unavailable"):
+        asyncio.run(run_yt_dlp("broken", binary=str(binary)))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(run_yt_dlp(VIDEO_IDS[0], binary=str(tmp_path / "missing")))